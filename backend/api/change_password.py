@@ -1,16 +1,12 @@
 from flask import Blueprint, request, jsonify, session, flash, redirect, url_for
 from models.imp import db
-from models.models_all_rout_imp import *
+from utils.auth import login_required, load_user_model
 
 change_password_bpp = Blueprint('change_password_bpp', __name__)
 
 @change_password_bpp.route('/change_password', methods=['POST'])
+@login_required
 def change_password():
-    if 'user_id' not in session:
-        flash("Пожалуйста, войдите в систему", "error")
-        return redirect(url_for("oauth_bpp.login"))
-    
-    user_id = session['user_id']
     old_password = request.form.get('old_password')
     new_password = request.form.get('new_password')
 
@@ -24,7 +20,7 @@ def change_password():
         flash("Новый пароль должен быть не менее 6 символов", "error")
         return redirect(url_for("profile_bpp.profile"))
 
-    user = User.query.get(user_id)
+    user = load_user_model()
 
     if not user:
         flash("Пользователь не найден", "error")
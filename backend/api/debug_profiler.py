@@ -0,0 +1,98 @@
+import math
+import time
+from flask import Blueprint, jsonify, request, Response, current_app
+from utils.auth import admin_required
+from utils.sampling_profiler import sampling_profiler
+
+debug_profiler_bpp = Blueprint('debug_profiler_bpp', __name__, url_prefix='/debug/profile')
+
+MAX_PROFILE_SECONDS = 120
+# Интервал семплирования: 0 крутил бы поток профайлера без пауз в каждом воркере
+MIN_INTERVAL_MS = 1
+MAX_INTERVAL_MS = 1000
+
+
+@debug_profiler_bpp.record_once
+def _init_profiler(state):
+    sampling_profiler.init_app(state.app)
+
+
+@debug_profiler_bpp.before_app_request
+def _join_profile_session():
+    """Воркер подключается к общей сессии профилирования на ближайшем запросе"""
+    sampling_profiler.sync()
+
+
+def _max_seconds():
+    # Не дольше таймаута воркера gunicorn: сессия не переживает зависший воркер
+    # и не оставляет профайлер работать надолго, если про него забыли
+    return max(min(MAX_PROFILE_SECONDS, current_app.config['WORKER_TIMEOUT'] - 1), 1)
+
+
+def _session_status():
+    control = sampling_profiler.read_control()
+    data = {'session': control, 'worker': sampling_profiler.status()}
+    if control:
+        data['running'] = control['until'] > time.time()
+        data['workers'] = sampling_profiler.merged(control['session'])[1]
+    return data
+
+
+@debug_profiler_bpp.route('/start', methods=['POST'])
+@admin_required
+def start_profile():
+    """Запустить семплирующий профайлер во всех воркерах. Ответ сразу, результат - GET /debug/profile"""
+    try:
+        interval_ms = float(request.args.get('interval_ms', 10))
+        seconds = float(request.args.get('seconds', 20))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'interval_ms and seconds must be numbers'}), 400
+    if not (math.isfinite(interval_ms) and math.isfinite(seconds)):
+        return jsonify({'success': False, 'error': 'interval_ms and seconds must be finite'}), 400
+    interval_ms = min(max(interval_ms, MIN_INTERVAL_MS), MAX_INTERVAL_MS)
+    seconds = min(max(seconds, 1), _max_seconds())
+
+    if not sampling_profiler.start_session(interval=interval_ms / 1000, duration=seconds):
+        return jsonify({'success': False, 'error': 'Profiler is already running'}), 409
+
+    sampling_profiler.cleanup(sampling_profiler.read_control()['session'])
+    return jsonify({'success': True, 'data': _session_status()}), 200
+
+
+@debug_profiler_bpp.route('/stop', methods=['POST'])
+@admin_required
+def stop_profile():
+    sampling_profiler.stop_session()
+    return jsonify({'success': True, 'data': _session_status()}), 200
+
+
+@debug_profiler_bpp.route('/status', methods=['GET'])
+@admin_required
+def profile_status():
+    return jsonify({'success': True, 'data': _session_status()}), 200
+
+
+@debug_profiler_bpp.route('', methods=['GET'])
+@admin_required
+def download_profile():
+    """Скачать профиль последней сессии, сложенный по всем воркерам (collapsed формат)"""
+    control = sampling_profiler.read_control()
+    if control is None:
+        return jsonify({'success': False, 'error': 'No profile session, POST /debug/profile/start first'}), 404
+
+    remaining = control['until'] - time.time()
+    if remaining > 0:
+        # Не ждем в потоке запроса - клиент придет за результатом позже
+        return jsonify({'success': False, 'error': 'Profiler is still running'}), 409, {
+            'Retry-After': str(int(remaining) + 1 + int(sampling_profiler.SYNC_INTERVAL))
+        }
+
+    collapsed, pids = sampling_profiler.merged(control['session'])
+    return Response(
+        collapsed,
+        mimetype='text/plain',
+        headers={
+            'Content-Disposition': f"attachment; filename=profile-{control['session']}.collapsed",
+            'X-Profile-Workers': ','.join(str(pid) for pid in pids)
+        }
+    )
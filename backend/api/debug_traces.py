@@ -0,0 +1,19 @@
+from flask import Blueprint, jsonify, request
+from utils.auth import admin_required
+from utils.tracing import get_recent_spans, is_tracing_enabled
+
+debug_traces_bpp = Blueprint('debug_traces_bpp', __name__)
+
+
+@debug_traces_bpp.route('/debug/traces', methods=['GET'])
+@admin_required
+def debug_traces():
+    """Последние медленные спаны этого воркера (только для администраторов)"""
+    min_ms = request.args.get('min_ms', 0, type=float)
+    limit = request.args.get('limit', 100, type=int)
+
+    return jsonify({
+        'success': True,
+        'enabled': is_tracing_enabled(),
+        'data': get_recent_spans(min_duration_ms=min_ms, limit=limit)
+    }), 200
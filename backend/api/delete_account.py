@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, session, redirect, url_for, flash
-from models.models_all_rout_imp import *
 from models.imp import db
+from utils.auth import load_user_model
+from utils.server_session import revoke_user_sessions
+from services.account_deletion_service import account_deletion_service
 import traceback
 
 delete_my_account_bpp = Blueprint('delete_my_account_bpp', __name__)
@@ -14,7 +16,7 @@ def delete_my_account():
         flash('You need to be logged in to delete your account', 'error')
         return redirect(url_for('oauth_bpp.login'))
     
-    user = User.query.get(user_id)
+    user = load_user_model()
     if not user:
         if request.is_json:
             return jsonify({'error': 'User not found'}), 404
@@ -47,25 +49,21 @@ def delete_my_account():
         return redirect(url_for('oauth_bpp.login'))
     
     try:
-        db.session.delete(user)
-        db.session.commit()        
-        check_user = User.query.get(user_id)
-        if check_user:
-            if request.is_json:
-                return jsonify({'error': 'Error deleting account. Please try again.'}), 500
-            else:
-                flash('Error deleting account. Please try again.', 'error')
-                return redirect(url_for('oauth_bpp.login'))
+        # Данные удаляются фоновым заданием пачками, здесь только отметка и выход из сессий
+        job = account_deletion_service.request_deletion(user)
 
         session.clear()
+        # Сессии удаляемого аккаунта на других устройствах
+        revoke_user_sessions(user_id)
 
         if request.is_json:
             return jsonify({
-                'message': 'Your account has been successfully deleted',
-                'status': 'success'
-            })
+                'message': 'Your account has been scheduled for deletion',
+                'status': 'success',
+                'deletion': job.to_dict()
+            }), 202
         else:
-            flash('Your account has been successfully deleted', 'success')
+            flash('Your account has been scheduled for deletion', 'success')
             return redirect(url_for('oauth_bpp.login'))
             
     except Exception as e:
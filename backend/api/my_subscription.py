@@ -1,5 +1,4 @@
 from flask import Blueprint, request, jsonify, session
-from models.models_all_rout_imp import *
 from models.imp import db
 from services.subscription_service import subscription_service
 from utils.logs_service import init_logger
@@ -1,9 +1,14 @@
 from flask import Blueprint, request, jsonify, current_app, session
-from models.models_all_rout_imp import *
+from models.models_all_rout_imp import SubscriptionHistory
 from models.users.main_user_db import User
 from services.subscription_service import subscription_service
 from services.transaction_service import transaction_service
 from utils.logs_service import init_logger
+from utils.db_routing import read_only
+from utils.auth import api_login_required
+from utils.rate_limit import limiter, user_key, plan_rate_limit, remember_plan_rate_limit
+from utils.pagination import decode_cursor, next_cursor, InvalidCursorError
+from utils.usage_batch import parse_usage_batch, UsageBatchError
 from datetime import datetime
 import traceback
 
@@ -11,10 +16,13 @@ import traceback
 
 
 subscriptions_bp = Blueprint('subscriptions', __name__)
+# Лимит запросов на пользователя по его плану подписки (проверяется до обращений к БД)
+limiter.limit(plan_rate_limit, key_func=user_key)(subscriptions_bp)
 logger = init_logger('subscriptions_api')
 
 
 @subscriptions_bp.route('/plans', methods=['GET'])
+@read_only
 def get_subscription_plans():
     """Получить список доступных планов подписок"""
     try:
@@ -42,6 +50,7 @@ def get_subscription_plans():
 
 
 @subscriptions_bp.route('/plans/<int:plan_id>', methods=['GET'])
+@read_only
 def get_subscription_plan(plan_id):
     """Получить детали конкретного плана подписки"""
     try:
@@ -69,16 +78,10 @@ def get_subscription_plan(plan_id):
 
 
 @subscriptions_bp.route('/my-subscription', methods=['GET'])
+@api_login_required
 def get_my_subscription():
     """Получить подписку текущего пользователя"""
     try:
-        # Получаем user_id из сессии вместо JWT
-        if 'user_id' not in session:
-            return jsonify({
-                'success': False,
-                'error': 'User not authenticated'
-            }), 401
-            
         user_id = session['user_id']
         
         # Проверить и обновить статус подписки
@@ -111,16 +114,10 @@ def get_my_subscription():
 
 
 @subscriptions_bp.route('/my-subscription/assign', methods=['POST'])
+@api_login_required
 def assign_subscription():
     """Назначить подписку пользователю"""
     try:
-        # Получаем user_id из сессии вместо JWT
-        if 'user_id' not in session:
-            return jsonify({
-                'success': False,
-                'error': 'User not authenticated'
-            }), 401
-            
         user_id = session['user_id']
         data = request.get_json()
         
@@ -147,6 +144,8 @@ def assign_subscription():
             start_trial=start_trial
         )
         
+        remember_plan_rate_limit(user_id)
+        
         return jsonify({
             'success': True,
             'data': subscription.to_dict(),
@@ -168,16 +167,10 @@ def assign_subscription():
 
 
 @subscriptions_bp.route('/my-subscription/cancel', methods=['POST'])
+@api_login_required
 def cancel_subscription():
     """Отменить подписку пользователя"""
     try:
-        # Получаем user_id из сессии вместо JWT
-        if 'user_id' not in session:
-            return jsonify({
-                'success': False,
-                'error': 'User not authenticated'
-            }), 401
-            
         user_id = session['user_id']
         data = request.get_json()
         
@@ -195,6 +188,8 @@ def cancel_subscription():
             reason=reason
         )
         
+        remember_plan_rate_limit(user_id)
+        
         return jsonify({
             'success': True,
             'data': cancelled_subscription.to_dict(),
@@ -216,16 +211,10 @@ def cancel_subscription():
 
 
 @subscriptions_bp.route('/my-subscription/renew', methods=['POST'])
+@api_login_required
 def renew_subscription():
     """Продлить подписку пользователя"""
     try:
-        # Получаем user_id из сессии вместо JWT
-        if 'user_id' not in session:
-            return jsonify({
-                'success': False,
-                'error': 'User not authenticated'
-            }), 401
-            
         user_id = session['user_id']
         
         subscription = subscription_service.get_user_subscription(user_id)
@@ -237,6 +226,8 @@ def renew_subscription():
         
         renewed_subscription = subscription_service.renew_subscription(subscription.id)
         
+        remember_plan_rate_limit(user_id)
+        
         return jsonify({
             'success': True,
             'data': renewed_subscription.to_dict(),
@@ -258,16 +249,10 @@ def renew_subscription():
 
 
 @subscriptions_bp.route('/my-limits', methods=['GET'])
+@api_login_required
 def get_my_limits():
     """Получить лимиты текущего пользователя"""
     try:
-        # Получаем user_id из сессии вместо JWT
-        if 'user_id' not in session:
-            return jsonify({
-                'success': False,
-                'error': 'User not authenticated'
-            }), 401
-            
         user_id = session['user_id']
         
         limits = subscription_service.get_user_limits(user_id)
@@ -286,16 +271,10 @@ def get_my_limits():
 
 
 @subscriptions_bp.route('/track-usage', methods=['POST'])
+@api_login_required
 def track_usage():
     """Отследить использование ресурсов"""
     try:
-        # Получаем user_id из сессии вместо JWT
-        if 'user_id' not in session:
-            return jsonify({
-                'success': False,
-                'error': 'User not authenticated'
-            }), 401
-            
         user_id = session['user_id']
         data = request.get_json()
         
@@ -343,27 +322,84 @@ def track_usage():
         }), 500
 
 
+@subscriptions_bp.route('/track-usage/batch', methods=['POST'])
+@api_login_required
+def track_usage_batch():
+    """Отследить пачку событий использования: JSON массив или NDJSON, можно с Content-Encoding: gzip"""
+    try:
+        user_id = session['user_id']
+        items = parse_usage_batch(
+            request.stream,
+            request.mimetype,
+            request.headers.get('Content-Encoding'),
+            current_app.config['USAGE_BATCH_MAX_BYTES'],
+            current_app.config['USAGE_BATCH_MAX_EVENTS']
+        )
+        
+        events = [event for event, error in items if error is None]
+        tracked = iter(subscription_service.track_usage_batch(
+            user_id, events, current_app.config['USAGE_BATCH_CHUNK_SIZE']
+        ) if events else [])
+        
+        results = []
+        for index, (event, error) in enumerate(items):
+            if error is None:
+                error = next(tracked)
+            result = {'index': index, 'success': error is None}
+            if error:
+                result['error'] = error
+            results.append(result)
+        
+        accepted = sum(1 for result in results if result['success'])
+        return jsonify({
+            'success': True,
+            'accepted': accepted,
+            'rejected': len(results) - accepted,
+            'results': results
+        }), 200
+        
+    except UsageBatchError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status
+        
+    except Exception as e:
+        logger.error(f"Error tracking usage batch: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+
 @subscriptions_bp.route('/history', methods=['GET'])
+@read_only
+@api_login_required
 def get_subscription_history():
     """Получить историю подписки текущего пользователя"""
     try:
-        # Получаем user_id из сессии вместо JWT
-        if 'user_id' not in session:
-            return jsonify({
-                'success': False,
-                'error': 'User not authenticated'
-            }), 401
-            
         user_id = session['user_id']
         limit = request.args.get('limit', 50, type=int)
+        offset = request.args.get('offset', 0, type=int)
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
         
-        history = SubscriptionHistory.get_user_history(user_id, limit=limit)
+        history = SubscriptionHistory.get_user_history(user_id, limit=limit, offset=offset, after=after)
         
         return jsonify({
             'success': True,
-            'data': [item.to_dict() for item in history]
+            'data': [item.to_dict() for item in history],
+            'pagination': {
+                'limit': limit,
+                'next_cursor': next_cursor(history, limit)
+            }
         }), 200
         
+    except InvalidCursorError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         logger.error(f"Error getting subscription history: {str(e)}")
         return jsonify({
@@ -374,39 +410,47 @@ def get_subscription_history():
 
 # Транзакции
 @subscriptions_bp.route('/transactions', methods=['GET'])
+@read_only
+@api_login_required
 def get_transactions():
     """Получить транзакции текущего пользователя"""
     try:
-        # Получаем user_id из сессии вместо JWT
-        if 'user_id' not in session:
-            return jsonify({
-                'success': False,
-                'error': 'User not authenticated'
-            }), 401
-            
         user_id = session['user_id']
         limit = request.args.get('limit', 20, type=int)
         offset = request.args.get('offset', 0, type=int)
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
         
         transactions = transaction_service.get_user_transactions(
             user_id=user_id,
             limit=limit,
-            offset=offset
+            offset=offset,
+            after=after
         )
         
-        stats = transaction_service.get_user_transaction_stats(user_id)
-        
-        return jsonify({
+        response = {
             'success': True,
             'data': [transaction.to_dict() for transaction in transactions],
-            'stats': stats,
             'pagination': {
                 'limit': limit,
                 'offset': offset,
-                'total': stats['total_transactions']
+                'next_cursor': next_cursor(transactions, limit)
             }
-        }), 200
+        }
+        
+        # Агрегаты считаем только для первой страницы, при листании курсором они не нужны
+        if after is None:
+            stats = transaction_service.get_user_transaction_stats(user_id)
+            response['stats'] = stats
+            response['pagination']['total'] = stats['total_transactions']
+        
+        return jsonify(response), 200
         
+    except InvalidCursorError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         logger.error(f"Error getting transactions: {str(e)}")
         return jsonify({
@@ -416,16 +460,10 @@ def get_transactions():
 
 
 @subscriptions_bp.route('/transactions', methods=['POST'])
+@api_login_required
 def create_transaction():
     """Создать транзакцию"""
     try:
-        # Получаем user_id из сессии вместо JWT
-        if 'user_id' not in session:
-            return jsonify({
-                'success': False,
-                'error': 'User not authenticated'
-            }), 401
-            
         user_id = session['user_id']
         data = request.get_json()
         
@@ -483,16 +521,10 @@ def create_transaction():
 
 
 @subscriptions_bp.route('/transactions/<int:transaction_id>', methods=['GET'])
+@api_login_required
 def get_transaction(transaction_id):
     """Получить детали транзакции"""
     try:
-        # Получаем user_id из сессии вместо JWT
-        if 'user_id' not in session:
-            return jsonify({
-                'success': False,
-                'error': 'User not authenticated'
-            }), 401
-            
         user_id = session['user_id']
         
         transaction = transaction_service.get_transaction(transaction_id)
@@ -516,16 +548,10 @@ def get_transaction(transaction_id):
 
 
 @subscriptions_bp.route('/transactions/<int:transaction_id>/process', methods=['POST'])
+@api_login_required
 def process_transaction(transaction_id):
     """Обработать транзакцию (оплатить)"""
     try:
-        # Получаем user_id из сессии вместо JWT
-        if 'user_id' not in session:
-            return jsonify({
-                'success': False,
-                'error': 'User not authenticated'
-            }), 401
-            
         user_id = session['user_id']
         data = request.get_json()
         
@@ -564,16 +590,10 @@ def process_transaction(transaction_id):
 
 
 @subscriptions_bp.route('/transactions/<int:transaction_id>/refund', methods=['POST'])
+@api_login_required
 def refund_transaction(transaction_id):
     """Вернуть транзакцию"""
     try:
-        # Получаем user_id из сессии вместо JWT
-        if 'user_id' not in session:
-            return jsonify({
-                'success': False,
-                'error': 'User not authenticated'
-            }), 401
-            
         user_id = session['user_id']
         data = request.get_json()
         
@@ -1,12 +1,102 @@
-from flask import Blueprint, jsonify, request
-from models.models_all_rout_imp import *
-from models.imp import db
+import hashlib
+import json
+import queue
+import threading
+import time
+from flask import Blueprint, jsonify, request, current_app, Response
+from utils.auth import get_current_user
+from utils.status_events import status_payload, status_broker
 
 user_status_bpp = Blueprint('user_status_bpp', __name__)
 
+# Сколько SSE соединений держит один процесс: каждое занимает поток gunicorn
+_stream_slots = None
+_stream_slots_lock = threading.Lock()
+
+# Через сколько клиент переподключается после закрытия потока
+STREAM_RETRY_MS = 5000
+
+
+def _etag(payload):
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+
+
 @user_status_bpp.route('/profile/status', methods=['GET'])
 def profile_status():
-    user = User.query.first()
-    if not user:
-        return jsonify({"is_active": False}), 200
-    return jsonify({"is_active": user.is_active}), 200
+    """Статус пользователя сессии. Пользователь берется из кэша, повторный запрос - 304"""
+    payload = status_payload(get_current_user())
+    response = jsonify(payload)
+    response.set_etag(_etag(payload))
+    # Браузер хранит ответ, но перед использованием всегда сверяет ETag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+
+def _stream_slot_limit():
+    """Сколько SSE соединений можно держать: под gunicorn на один меньше числа потоков воркера"""
+    limit = current_app.config['USER_STATUS_STREAM_MAX']
+    threads = current_app.config['WORKER_THREADS']
+    if threads:
+        limit = min(limit, threads - 1)
+    return max(limit, 0)
+
+
+def _acquire_stream_slot():
+    global _stream_slots
+    if _stream_slots is None:
+        with _stream_slots_lock:
+            if _stream_slots is None:
+                _stream_slots = threading.BoundedSemaphore(_stream_slot_limit())
+    return _stream_slots.acquire(blocking=False)
+
+
+def _sse(payload):
+    return f"event: status\ndata: {json.dumps(payload)}\n\n"
+
+
+@user_status_bpp.route('/profile/status/stream', methods=['GET'])
+def profile_status_stream():
+    """SSE поток изменений статуса вместо опроса. 204 - поток выключен или воркеру не хватает
+    потоков (sync), клиент не переподключается"""
+    user = get_current_user()
+    if not current_app.config['USER_STATUS_STREAM_ENABLED'] or user is None or not _stream_slot_limit():
+        return '', 204
+    if not _acquire_stream_slot():
+        return '', 503, {'Retry-After': '30'}
+
+    subscription = None
+
+    def release():
+        if subscription is not None:
+            status_broker.unsubscribe(user_id, subscription)
+        _stream_slots.release()
+
+    user_id = user.id
+    try:
+        initial = status_payload(user)
+        heartbeat = current_app.config['USER_STATUS_STREAM_HEARTBEAT']
+        lifetime = current_app.config['USER_STATUS_STREAM_TIMEOUT']
+        subscription = status_broker.subscribe(user_id)
+
+        def generate():
+            yield f"retry: {STREAM_RETRY_MS}\n" + _sse(initial)
+            deadline = time.monotonic() + lifetime
+            while time.monotonic() < deadline:
+                try:
+                    yield _sse(subscription.get(timeout=heartbeat))
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+            # Соединение не держится вечно - EventSource переподключится сам
+
+        response = Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # nginx не должен буферизовать поток
+        })
+        # Слот и подписка освобождаются при закрытии ответа сервером - в том числе
+        # если клиент ушел до первой итерации генератора (тогда его finally не выполнится)
+        response.call_on_close(release)
+    except Exception:
+        release()
+        raise
+    return response
@@ -1,51 +1,98 @@
-from flask import Flask, request, g
+from flask import Flask
 from config import Config
 from models.imp import db
-from models.models_all_rout_imp import *
+import models.models_all_rout_imp  # noqa: F401 - все модели в метаданных до первого запроса
 from flask_wtf import CSRFProtect
-from __init__ import *
+from blueprints.all_bpp import register_all_blueprints
+from blueprints.testing_errors_handlers import register_testing_error_handlers
+from blueprints.errors_handlers import register_error_handlers
+from blueprints.admin_bpp import register_admin_routes
+from blueprints.api_bpp import register_api_blueprints
 from utils.logs_service import init_logger
+from utils.access_log import access_log
+from utils.metrics import init_metrics
+from utils.sql_profiler import sql_profiler
+from utils.db_pool import build_engine_options
+from utils.db_routing import init_db_routing
+from utils.rate_limit import init_rate_limiting
+from utils.server_session import init_server_sessions
+from utils.activity_buffer import activity_buffer
+from utils.status_events import status_broker
+from utils.import_report import register_import_report_command
+from utils.user_import import register_user_import_command
+from services.account_deletion_service import deletion_worker, register_account_deletion_commands
+from services.quota_engine import quota_engine, register_quota_commands
+from migrations.runner import check_schema_version, register_migration_commands
 import os
-import time
 
-app = Flask(__name__, template_folder='../frontend/templates', static_folder='../frontend/static')
-app.config.from_object(Config)
-csrf = CSRFProtect(app)
-db.init_app(app)
 logger = init_logger('app')
+csrf = CSRFProtect()
 
-register_all_blueprints(app)
-register_testing_error_handlers(app)
-register_error_handlers(app)
-register_admin_routes(app)
-register_api_blueprints(app)
 
-if not os.path.exists('logs'):
-    os.makedirs('logs')
+def create_app(config=Config):
+    """Фабрика приложения: собирает Flask app для заданного конфига"""
+    app = Flask(__name__, template_folder='../frontend/templates', static_folder='../frontend/static')
+    app.config.from_object(config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(app.config)
+    init_server_sessions(app)
+    csrf.init_app(app)
+    db.init_app(app)
 
-# Middleware для детального логирования всех запросов (без дублирования)
-logger = init_logger('app')
+    # Rate limiting - первым before_request, до любых обращений к БД
+    init_rate_limiting(app)
+
+    register_all_blueprints(app)
+    register_testing_error_handlers(app)
+    register_error_handlers(app)
+    register_admin_routes(app)
+    register_api_blueprints(app)
+
+    if not os.path.exists('logs'):
+        os.makedirs('logs')
+
+    # Структурированный access-лог (JSON, с семплированием по статусу)
+    access_log.init_app(app)
+
+    # Prometheus метрики (/metrics)
+    init_metrics(app, db)
+
+    # Профилирование SQL на запрос (Server-Timing, поиск N+1)
+    sql_profiler.init_app(app, db)
+
+    # Чтения с реплики: переключение на primary при ошибках реплики
+    init_db_routing(app, db)
+
+    # last_login пишется пачками в фоне, а не в запросе входа
+    activity_buffer.init_app(app, db)
+
+    # Удаление аккаунтов в фоне: поток воркера и flask process-deletions / deletion-status
+    deletion_worker.init_app(app)
+    register_account_deletion_commands(app)
+
+    # Рассылка изменений статуса пользователя для /profile/status/stream
+    status_broker.init_app(app)
+
+    # Квоты сообщений в Redis и их сверка с БД (flask reconcile-quotas)
+    quota_engine.init_app(app)
+    register_quota_commands(app)
+
+    # flask import-report: время импорта по модулям
+    register_import_report_command(app)
+
+    # flask import-users: массовый импорт пользователей из CSV
+    register_user_import_command(app)
 
-@app.before_request
-def before_request():
-    g.start_time = time.time()
-    # Логируем только основную информацию о запросе
-    logger.info(f"REQUEST: {request.method} {request.url} from {request.remote_addr}")
+    # Удаляем универсальный обработчик - пусть работают кастомные
 
-@app.after_request
-def after_request(response):
-    if hasattr(g, 'start_time'):
-        execution_time = (time.time() - g.start_time) * 1000
-        logger.info(f"RESPONSE: {response.status_code} for {request.url} ({execution_time:.3f}ms)")
-    return response
+    # flask db-upgrade / db-version; при старте только сверяем версию схемы
+    register_migration_commands(app)
+    check_schema_version(app)
 
-# Удаляем универсальный обработчик - пусть работают кастомные
+    return app
 
-with app.app_context():
-    db.create_all()
-    logger.info("✅ Database initialized successfully")
 
 if __name__ == '__main__':
-    logger.info("🚀 Starting Flask application...")
+    # Только для локальной разработки, в проде используется gunicorn (см. gunicorn.conf.py)
+    logger.info("🚀 Starting Flask development server...")
     logger.info(f"🌐 Server will run on http://0.0.0.0:5000")
-    app.run(host='0.0.0.0', port=5000, debug=False)  # В проде debug=False!
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=5000, debug=False)  # В проде debug=False!
@@ -0,0 +1,11 @@
+from blueprints.lazy_loader import register_lazy_blueprints
+
+# Маршруты только для администраторов (/debug/*), включаются флагом DEBUG_ENDPOINTS_ENABLED
+ADMIN_BLUEPRINTS = [
+    ('api.debug_traces', 'debug_traces_bpp', {}, 'DEBUG_ENDPOINTS_ENABLED'),
+    ('api.debug_profiler', 'debug_profiler_bpp', {}, 'DEBUG_ENDPOINTS_ENABLED'),
+]
+
+
+def register_admin_routes(app):
+    register_lazy_blueprints(app, ADMIN_BLUEPRINTS)
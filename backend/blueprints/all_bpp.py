@@ -1,22 +1,18 @@
-from routers.home.main_home import home_bpp
-from routers.checks.oauth.login import oauth_bpp
-from routers.checks.oauth.register import oauth_register_bpp
-from routers.checks.oauth.logout import oauth_logout_bpp
-from routers.home.homes import homes_bpp
-from routers.home.profile import profile_bpp
-from routers.swagger_bp import swagger_bpp
-from routers.checks.oauth2.github import github_oauth_bp
-from routers.checks.oauth2.google import oauth2_bpp
+from blueprints.lazy_loader import register_lazy_blueprints
 
+# (модуль, блюпринт, опции регистрации, флаг конфига)
+BLUEPRINTS = [
+    ('routers.home.main_home', 'home_bpp', {}, None),
+    ('routers.checks.oauth.login', 'oauth_bpp', {}, None),
+    ('routers.checks.oauth.register', 'oauth_register_bpp', {'url_prefix': '/register'}, None),
+    ('routers.checks.oauth.logout', 'oauth_logout_bpp', {'url_prefix': '/logout'}, None),
+    ('routers.home.homes', 'homes_bpp', {}, None),
+    ('routers.home.profile', 'profile_bpp', {}, None),
+    ('routers.swagger_bp', 'swagger_bpp', {}, 'SWAGGER_ENABLED'),
+    ('routers.checks.oauth2.github', 'github_oauth_bp', {}, 'OAUTH_GITHUB_ENABLED'),
+    ('routers.checks.oauth2.google', 'oauth2_bpp', {}, 'OAUTH_GOOGLE_ENABLED'),
+]
 
 
 def register_all_blueprints(app):
-    app.register_blueprint(home_bpp)
-    app.register_blueprint(oauth_bpp)
-    app.register_blueprint(oauth_register_bpp, url_prefix='/register')
-    app.register_blueprint(oauth_logout_bpp, url_prefix='/logout')
-    app.register_blueprint(homes_bpp)
-    app.register_blueprint(profile_bpp)
-    app.register_blueprint(swagger_bpp)
-    app.register_blueprint(github_oauth_bp)
-    app.register_blueprint(oauth2_bpp)
\ No newline at end of file
+    register_lazy_blueprints(app, BLUEPRINTS)
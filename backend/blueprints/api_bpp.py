@@ -1,12 +1,13 @@
-from api.change_password import change_password_bpp
-from api.delete_account import delete_my_account_bpp
-from api.user_status import user_status_bpp
-from api.subscriptions import subscriptions_bp
+from blueprints.lazy_loader import register_lazy_blueprints
 
+# (модуль, блюпринт, опции регистрации, флаг конфига)
+API_BLUEPRINTS = [
+    ('api.change_password', 'change_password_bpp', {}, None),
+    ('api.delete_account', 'delete_my_account_bpp', {}, None),
+    ('api.user_status', 'user_status_bpp', {}, None),
+    ('api.subscriptions', 'subscriptions_bp', {'url_prefix': '/api/subscriptions'}, None),
+]
 
 
 def register_api_blueprints(app):
-    app.register_blueprint(change_password_bpp)
-    app.register_blueprint(delete_my_account_bpp)
-    app.register_blueprint(user_status_bpp)
-    app.register_blueprint(subscriptions_bp, url_prefix='/api/subscriptions')
\ No newline at end of file
+    register_lazy_blueprints(app, API_BLUEPRINTS)
@@ -3,7 +3,9 @@ from handlers.__init__403 import forbidden_error
 from handlers.__init__404 import not_found_error
 from handlers.__init__405 import method_not_allowed_error
 from handlers.__init__415 import unsupported_media_type_error
+from handlers.__init__429 import too_many_requests_error
 from handlers.__init__500 import internal_server_error
+from handlers.__init__503 import service_unavailable_error
 
 def register_error_handlers(app):
     app.register_error_handler(400, bad_request_error)
@@ -11,4 +13,6 @@ def register_error_handlers(app):
     app.register_error_handler(404, not_found_error)
     app.register_error_handler(405, method_not_allowed_error)
     app.register_error_handler(415, unsupported_media_type_error)
+    app.register_error_handler(429, too_many_requests_error)
     app.register_error_handler(500, internal_server_error)
+    app.register_error_handler(503, service_unavailable_error)
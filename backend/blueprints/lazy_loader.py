@@ -0,0 +1,20 @@
+import importlib
+from utils.logs_service import init_logger
+
+logger = init_logger('blueprints')
+
+
+def register_lazy_blueprints(app, specs):
+    """Зарегистрировать блюпринты по списку (модуль, атрибут, опции, флаг конфига).
+
+    Модуль блюпринта импортируется только если флаг в конфиге включен
+    (флаг None - блюпринт нужен всегда), поэтому выключенные провайдеры
+    (flask_dance, requests) не грузятся при старте воркера.
+    """
+    for module_path, attr, options, config_flag in specs:
+        if config_flag and not app.config.get(config_flag):
+            logger.info(f"Blueprint {module_path}.{attr} disabled by {config_flag}")
+            continue
+
+        module = importlib.import_module(module_path)
+        app.register_blueprint(getattr(module, attr), **options)
@@ -1,14 +1,15 @@
-from utils.testing.bad_request_error_400 import bad_request_error_bpp
-from utils.testing.forbidden_error_403 import forbidden_error_bpp
-from utils.testing.not_found_error_404 import not_found_error_bpp
-from utils.testing.method_not_allowed_error_405 import method_not_allowed_error_bpp
-from utils.testing.unsupported_media_type_error_415 import unsupported_media_type_error_bpp
-from utils.testing.internal_server_error_500 import internal_server_error_bpp
+from blueprints.lazy_loader import register_lazy_blueprints
+
+# Тестовые маршруты для страниц ошибок, включаются флагом TESTING_ERROR_ROUTES_ENABLED
+TESTING_ERROR_BLUEPRINTS = [
+    ('utils.testing.bad_request_error_400', 'bad_request_error_bpp', {}, 'TESTING_ERROR_ROUTES_ENABLED'),
+    ('utils.testing.forbidden_error_403', 'forbidden_error_bpp', {}, 'TESTING_ERROR_ROUTES_ENABLED'),
+    ('utils.testing.not_found_error_404', 'not_found_error_bpp', {}, 'TESTING_ERROR_ROUTES_ENABLED'),
+    ('utils.testing.method_not_allowed_error_405', 'method_not_allowed_error_bpp', {}, 'TESTING_ERROR_ROUTES_ENABLED'),
+    ('utils.testing.unsupported_media_type_error_415', 'unsupported_media_type_error_bpp', {}, 'TESTING_ERROR_ROUTES_ENABLED'),
+    ('utils.testing.internal_server_error_500', 'internal_server_error_bpp', {}, 'TESTING_ERROR_ROUTES_ENABLED'),
+]
+
 
 def register_testing_error_handlers(app):
-    app.register_blueprint(bad_request_error_bpp)
-    app.register_blueprint(forbidden_error_bpp)
-    app.register_blueprint(not_found_error_bpp)
-    app.register_blueprint(method_not_allowed_error_bpp)
-    app.register_blueprint(unsupported_media_type_error_bpp)
-    app.register_blueprint(internal_server_error_bpp)
+    register_lazy_blueprints(app, TESTING_ERROR_BLUEPRINTS)
@@ -5,7 +5,7 @@ load_dotenv()
 
 class Config:
     SECRET_KEY = 'your_secret_key'
-    SQLALCHEMY_DATABASE_URI = 'postgresql://your_db_user:your_db_password@db:5432/your_db_name'
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'postgresql://your_db_user:your_db_password@db:5432/your_db_name')
     #SQLALCHEMY_DATABASE_URI = 'sqlite:///site.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
@@ -27,4 +27,148 @@ class Config:
     GITHUB_EMAILS_URL = os.getenv('GITHUB_EMAILS_URL')
 
     GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
-    GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
\ No newline at end of file
+    GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
+
+    # Очередь логов: запись на диск идет в фоновом потоке пачками
+    LOG_QUEUE_MAXSIZE = int(os.getenv('LOG_QUEUE_MAXSIZE', 10000))
+    LOG_QUEUE_POLICY = os.getenv('LOG_QUEUE_POLICY', 'drop')  # drop, block
+    LOG_QUEUE_BLOCK_TIMEOUT = float(os.getenv('LOG_QUEUE_BLOCK_TIMEOUT', 0.05))
+    LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', 256))
+    LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', 0.5))
+
+    # Access-лог: доля записываемых запросов по классу статуса
+    ACCESS_LOG_SAMPLE_RATES = {
+        '1xx': 0.01,
+        '2xx': float(os.getenv('ACCESS_LOG_SAMPLE_2XX', 0.01)),
+        '3xx': float(os.getenv('ACCESS_LOG_SAMPLE_3XX', 0.01)),
+        '4xx': float(os.getenv('ACCESS_LOG_SAMPLE_4XX', 1.0)),
+        '5xx': 1.0
+    }
+    ACCESS_LOG_EXCLUDE_PATHS = ('/static/', '/metrics', '/health')
+    ACCESS_LOG_REQUEST_ID_HEADER = 'X-Request-ID'
+
+    # Профилирование SQL запросов (Server-Timing заголовок, предупреждения о N+1)
+    SQL_PROFILER_ENABLED = os.getenv('SQL_PROFILER_ENABLED', 'true').lower() == 'true'
+    SQL_PROFILER_REPEAT_THRESHOLD = int(os.getenv('SQL_PROFILER_REPEAT_THRESHOLD', 5))
+
+    # Какие блюпринты подключать. Провайдеры OAuth грузятся только если настроены
+    OAUTH_GITHUB_ENABLED = os.getenv('OAUTH_GITHUB_ENABLED', 'true' if GITHUB_CLIENT_ID else 'false').lower() == 'true'
+    OAUTH_GOOGLE_ENABLED = os.getenv('OAUTH_GOOGLE_ENABLED', 'true' if GOOGLE_CLIENT_ID else 'false').lower() == 'true'
+    SWAGGER_ENABLED = os.getenv('SWAGGER_ENABLED', 'true').lower() == 'true'
+    TESTING_ERROR_ROUTES_ENABLED = os.getenv('TESTING_ERROR_ROUTES_ENABLED', 'true').lower() == 'true'
+
+    # Миграции: при старте только проверяется версия схемы, обновление - flask db-upgrade
+    SCHEMA_CHECK_STRICT = os.getenv('SCHEMA_CHECK_STRICT', 'false').lower() == 'true'
+
+    # Трассировка (@traced) и отладочные эндпоинты для администраторов (/debug/*)
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'false').lower() == 'true'
+    TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', 2048))
+    DEBUG_ENDPOINTS_ENABLED = os.getenv('DEBUG_ENDPOINTS_ENABLED', 'false').lower() == 'true'
+    # /debug/profile: общая папка воркеров одной машины для сессии профилирования и результатов
+    PROFILE_DIR = os.getenv('PROFILE_DIR', '/tmp/app-profiles')
+    WORKER_TIMEOUT = int(os.getenv('GUNICORN_TIMEOUT', 30))  # как timeout в gunicorn.conf.py
+
+    # Ротация логов: по размеру и по времени, старые сегменты сжимаются в фоне
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 256 * 1024 * 1024))
+    LOG_ROTATE_INTERVAL = int(os.getenv('LOG_ROTATE_INTERVAL', 24 * 3600))  # секунды, 0 - выключить
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 30))
+    LOG_INDEX_CHUNK_BYTES = int(os.getenv('LOG_INDEX_CHUNK_BYTES', 1024 * 1024))
+    LOG_COMPRESS_DELAY = float(os.getenv('LOG_COMPRESS_DELAY', 5))
+
+    # Пул соединений с БД (на каждый воркер). DB_POOL_MODE: queue или pgbouncer
+    DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'queue')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    # Прямое подключение к PostgreSQL для flask db-upgrade (мимо pgbouncer): advisory lock
+    # миграций держится на сессии, а pgbouncer в режиме transaction ее не сохраняет
+    DATABASE_MIGRATION_URL = os.getenv('DATABASE_MIGRATION_URL')
+
+
+    # Реплика для чтения: @read_only код читает с нее, пока она здорова и не отстает
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = {'replica': DATABASE_REPLICA_URL} if DATABASE_REPLICA_URL else {}
+    DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 5))  # секунды
+    DB_REPLICA_HEALTH_INTERVAL = float(os.getenv('DB_REPLICA_HEALTH_INTERVAL', 5))
+    DB_REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS', 0))  # 0 - только в пределах запроса
+
+    # Кэш неизменяемых полей пользователя (id, имя, email, роль) на процесс. 0 - выключить
+    USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 30))
+    USER_CACHE_MAXSIZE = int(os.getenv('USER_CACHE_MAXSIZE', 1024))
+
+    # Хеширование паролей: метод werkzeug и пул процессов на каждый воркер
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 1))  # 0 - в потоке запроса
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv('PASSWORD_HASH_QUEUE_LIMIT', 1))  # держать меньше GUNICORN_THREADS
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 5))
+    PASSWORD_HASH_NICE = int(os.getenv('PASSWORD_HASH_NICE', 5))
+
+    # Redis (сервис regis в docker-compose)
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://regis:6379/0')
+
+    # Rate limiting (flask_limiter): общие для всех воркеров и машин счетчики в Redis
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    RATELIMIT_STORAGE_URI = os.getenv('RATELIMIT_STORAGE_URI', REDIS_URL)  # memory:// - для тестов
+    RATELIMIT_STRATEGY = 'moving-window'
+    RATELIMIT_KEY_PREFIX = 'rl'
+    RATELIMIT_HEADERS_ENABLED = True
+    RATELIMIT_SWALLOW_ERRORS = True  # Redis недоступен - не отказывать всем подряд
+    RATELIMIT_IN_MEMORY_FALLBACK_ENABLED = True
+    LOGIN_RATE_LIMIT = os.getenv('LOGIN_RATE_LIMIT', '10/minute;100/hour')
+    REGISTER_RATE_LIMIT = os.getenv('REGISTER_RATE_LIMIT', '5/minute;50/day')
+    API_RATE_LIMIT_DEFAULT = int(os.getenv('API_RATE_LIMIT_DEFAULT', 60))  # в минуту, если у плана нет своего
+    API_RATE_LIMIT_REFRESH_SECONDS = int(os.getenv('API_RATE_LIMIT_REFRESH_SECONDS', 300))
+    PROXY_FIX_X_FOR = int(os.getenv('PROXY_FIX_X_FOR', 1))  # сколько прокси (nginx) перед приложением
+
+    # /metrics: Prometheus ходит в backend напрямую из внутренней сети, снаружи (через nginx) - 404.
+    # METRICS_TOKEN задан - вместо проверки сети нужен заголовок Authorization: Bearer <token>
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    METRICS_ALLOWED_NETWORKS = os.getenv(
+        'METRICS_ALLOWED_NETWORKS', '127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16'
+    )
+
+    # Сессии: redis - данные на сервере, в cookie только id; memory - для тестов; cookie - подписанная cookie Flask
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'redis')
+    SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL', REDIS_URL)
+    SESSION_KEY_PREFIX = 'sess:'
+    PERMANENT_SESSION_LIFETIME = timedelta(seconds=int(os.getenv('SESSION_LIFETIME', 14 * 24 * 3600)))
+
+    # Отложенная запись last_login: не чаще раза в ACTIVITY_FLUSH_INTERVAL секунд одним UPDATE
+    ACTIVITY_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', 10))
+    ACTIVITY_MAX_PENDING = int(os.getenv('ACTIVITY_MAX_PENDING', 5000))
+
+    # Фоновое удаление аккаунтов пачками (поток в каждом воркере или flask process-deletions)
+    ACCOUNT_DELETION_WORKER_ENABLED = os.getenv('ACCOUNT_DELETION_WORKER_ENABLED', 'true').lower() == 'true'
+    ACCOUNT_DELETION_CHUNK_SIZE = int(os.getenv('ACCOUNT_DELETION_CHUNK_SIZE', 1000))
+    ACCOUNT_DELETION_CHUNK_PAUSE = float(os.getenv('ACCOUNT_DELETION_CHUNK_PAUSE', 0.05))
+    ACCOUNT_DELETION_POLL_INTERVAL = float(os.getenv('ACCOUNT_DELETION_POLL_INTERVAL', 60))
+    ACCOUNT_DELETION_LEASE_SECONDS = int(os.getenv('ACCOUNT_DELETION_LEASE_SECONDS', 300))
+    # Упавшее задание повторяется с удвоением паузы (60с, 120с, ...), не больше MAX_ATTEMPTS попыток
+    ACCOUNT_DELETION_MAX_ATTEMPTS = int(os.getenv('ACCOUNT_DELETION_MAX_ATTEMPTS', 5))
+    ACCOUNT_DELETION_RETRY_DELAY = float(os.getenv('ACCOUNT_DELETION_RETRY_DELAY', 60))
+
+    # /profile/status/stream (SSE): каждое соединение держит поток воркера, поэтому выключено по умолчанию
+    USER_STATUS_STREAM_ENABLED = os.getenv('USER_STATUS_STREAM_ENABLED', 'false').lower() == 'true'
+    USER_STATUS_STREAM_BACKEND = os.getenv('USER_STATUS_STREAM_BACKEND', 'redis')  # redis, memory
+    USER_STATUS_STREAM_MAX = int(os.getenv('USER_STATUS_STREAM_MAX', 20))  # соединений на процесс
+    # Потоков на воркер gunicorn (выставляет gunicorn.conf.py), 0 - не gunicorn (flask run).
+    # Потоков под SSE всегда на один меньше, чтобы воркер продолжал отвечать на обычные запросы
+    WORKER_THREADS = int(os.getenv('GUNICORN_THREADS', 0))
+    USER_STATUS_STREAM_HEARTBEAT = float(os.getenv('USER_STATUS_STREAM_HEARTBEAT', 15))
+    USER_STATUS_STREAM_TIMEOUT = float(os.getenv('USER_STATUS_STREAM_TIMEOUT', 300))
+
+    # Квоты сообщений в Redis: redis, memory - для тестов, off - проверка через БД на каждое событие
+    QUOTA_BACKEND = os.getenv('QUOTA_BACKEND', 'redis')
+    QUOTA_REDIS_URL = os.getenv('QUOTA_REDIS_URL', REDIS_URL)
+    QUOTA_REDIS_TIMEOUT = float(os.getenv('QUOTA_REDIS_TIMEOUT', 0.1))  # дольше - сразу в БД
+    QUOTA_RETRY_SECONDS = float(os.getenv('QUOTA_RETRY_SECONDS', 5))  # пауза перед повторным обращением к Redis
+    QUOTA_KEY_PREFIX = 'quota:'
+    QUOTA_KEY_TTL = int(os.getenv('QUOTA_KEY_TTL', 7 * 24 * 3600))
+    QUOTA_RECONCILE_INTERVAL = float(os.getenv('QUOTA_RECONCILE_INTERVAL', 30))  # запись списанного в БД
+
+    # POST /api/subscriptions/track-usage/batch
+    USAGE_BATCH_MAX_EVENTS = int(os.getenv('USAGE_BATCH_MAX_EVENTS', 1000))
+    USAGE_BATCH_MAX_BYTES = int(os.getenv('USAGE_BATCH_MAX_BYTES', 1024 * 1024))  # и после распаковки gzip
+    USAGE_BATCH_CHUNK_SIZE = int(os.getenv('USAGE_BATCH_CHUNK_SIZE', 500))  # строк трекера в одном INSERT
@@ -0,0 +1,78 @@
+# Конфигурация gunicorn для продакшна.
+# Запуск: gunicorn -c gunicorn.conf.py wsgi:app (из папки backend)
+# Плавная перезагрузка воркеров с новым кодом: kill -HUP <pid мастера> (только без preload, см. ниже)
+import multiprocessing
+import os
+import shutil
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Воркеры и потоки считаются от количества ядер, переопределяются через env
+workers = int(os.getenv('WEB_CONCURRENCY', cpu_count * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 2 if cpu_count > 1 else 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+# Приложение ограничивает SSE потоки числом потоков воркера (Config.WORKER_THREADS):
+# при threads=2 на процесс остается один поток под /profile/status/stream
+os.environ['GUNICORN_THREADS'] = str(threads)
+
+# GUNICORN_PRELOAD=true: приложение импортируется в мастере один раз, воркеры получают его
+# через fork (быстрее старт, меньше памяти). Но тогда SIGHUP форкает воркеров из уже
+# загруженного мастера и новый код не подхватывается - нужен полный перезапуск
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() == 'true'
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Перезапуск воркеров после N запросов, чтобы не копить утечки памяти
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = None  # access-лог пишет само приложение (utils/access_log.py)
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+# Очистить mmap-файлы метрик от прошлого запуска. Делается при загрузке конфига,
+# до preload приложения, и только один раз (конфиг перечитывается на SIGHUP)
+_multiproc_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+if _multiproc_dir and not os.getenv('_PROMETHEUS_MULTIPROC_CLEARED'):
+    shutil.rmtree(_multiproc_dir, ignore_errors=True)
+    os.makedirs(_multiproc_dir, exist_ok=True)
+    os.environ['_PROMETHEUS_MULTIPROC_CLEARED'] = '1'
+
+
+def post_fork(server, worker):
+    """Соединения с БД, открытые в мастере при preload, не должны делиться между воркерами"""
+    if preload_app:
+        from models.imp import db
+        from wsgi import app
+
+        with app.app_context():
+            # close=False: не закрывать сокеты родителя, просто забыть их в пуле воркера
+            db.engine.dispose(close=False)
+
+
+def when_ready(server):
+    """При preload мастер сам запросов не обслуживает: его livesum gauge (пул БД после
+    проверки схемы) не должны суммироваться с воркерами"""
+    if preload_app:
+        from utils.metrics import mark_process_dead
+        mark_process_dead(os.getpid())
+
+
+def child_exit(server, worker):
+    from utils.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    """Дописать отложенные last_login и остановить пул хеширования паролей вместе с воркером"""
+    from utils.activity_buffer import activity_buffer
+    from utils.password_hasher import password_hasher
+    try:
+        activity_buffer.flush()
+    except Exception as e:
+        server.log.error(f"Failed to flush user activity on exit: {e}")
+    password_hasher.shutdown()
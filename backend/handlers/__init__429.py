@@ -0,0 +1,6 @@
+from flask import render_template, request, jsonify
+
+def too_many_requests_error(error):
+    if request.is_json or request.path.startswith('/api/'):
+        return jsonify({'success': False, 'error': 'Too many requests'}), 429
+    return render_template('errors/429.html'), 429
@@ -0,0 +1,10 @@
+from flask import render_template, request, jsonify
+
+def service_unavailable_error(error):
+    if request.is_json or request.path.startswith('/api/'):
+        response = jsonify({'success': False, 'error': 'Service temporarily unavailable'})
+    else:
+        response = render_template('errors/503.html')
+    retry_after = getattr(error, 'retry_after', None)
+    headers = {'Retry-After': str(retry_after)} if retry_after else {}
+    return response, 503, headers
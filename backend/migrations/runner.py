@@ -0,0 +1,188 @@
+import importlib
+import os
+import re
+from datetime import datetime
+import click
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import NullPool
+from models.imp import db
+from utils.logs_service import init_logger
+
+logger = init_logger('migrations')
+
+VERSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'versions')
+VERSION_TABLE = 'schema_version'
+
+# Ключ advisory lock, чтобы миграции не запускались параллельно с нескольких машин
+MIGRATION_LOCK_KEY = 7300118
+
+_module_re = re.compile(r'^v(\d{4})_\w+\.py$')
+
+
+class SchemaVersionError(RuntimeError):
+    """Схема БД отстает от кода - нужно выполнить flask db-upgrade"""
+
+
+def load_migrations():
+    """Найти модули миграций в versions/ и отсортировать по номеру"""
+    migrations = []
+    for filename in sorted(os.listdir(VERSIONS_DIR)):
+        match = _module_re.match(filename)
+        if not match:
+            continue
+        module = importlib.import_module(f'migrations.versions.{filename[:-3]}')
+        if module.VERSION != int(match.group(1)):
+            raise ValueError(f"Migration {filename} declares VERSION={module.VERSION}")
+        migrations.append(module)
+    return migrations
+
+
+def latest_version():
+    migrations = load_migrations()
+    return migrations[-1].VERSION if migrations else 0
+
+
+def ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+            "version INTEGER PRIMARY KEY, "
+            "description VARCHAR(200) NOT NULL, "
+            "applied_at TIMESTAMP NOT NULL)"
+        ))
+
+
+def get_current_version(engine):
+    """Текущая версия схемы - один дешевый запрос. None если таблицы версий нет"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text(f"SELECT MAX(version) FROM {VERSION_TABLE}")).scalar() or 0
+    except Exception:
+        return None
+
+
+def check_schema_version(app):
+    """Проверка при старте воркера: только сравнить версию, ничего не создавать"""
+    with app.app_context():
+        current = get_current_version(db.engine)
+    expected = latest_version()
+
+    if current is not None and current >= expected:
+        logger.info(f"Database schema is up to date (version {current})")
+        return current
+
+    message = (f"Database schema version is {current if current is not None else 'missing'}, "
+               f"code expects {expected}. Run 'flask db-upgrade'.")
+    # Команды flask (и сама db-upgrade) загружают это же приложение - им схема заранее не нужна
+    if app.config.get('SCHEMA_CHECK_STRICT', False) and click.get_current_context(silent=True) is None:
+        raise SchemaVersionError(message)
+    logger.warning(message)
+    return current
+
+
+def _apply(engine, migration):
+    if getattr(migration, 'TRANSACTIONAL', True):
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            _record(conn, migration)
+    else:
+        # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            migration.upgrade(conn)
+            _record(conn, migration)
+
+
+def _record(conn, migration):
+    conn.execute(
+        text(f"INSERT INTO {VERSION_TABLE} (version, description, applied_at) VALUES (:v, :d, :t)"),
+        {'v': migration.VERSION, 'd': migration.DESCRIPTION, 't': datetime.utcnow()}
+    )
+
+
+def upgrade(engine, target=None):
+    """Применить все миграции новее текущей версии (до target включительно)"""
+    ensure_version_table(engine)
+    is_postgres = engine.dialect.name == 'postgresql'
+
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as lock_conn:
+        if is_postgres:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:k)"), {'k': MIGRATION_LOCK_KEY})
+        try:
+            current = get_current_version(engine) or 0
+            applied = []
+            for migration in load_migrations():
+                if migration.VERSION <= current:
+                    continue
+                if target is not None and migration.VERSION > target:
+                    break
+                logger.info(f"Applying migration {migration.VERSION}: {migration.DESCRIPTION}")
+                _apply(engine, migration)
+                applied.append(migration.VERSION)
+            return applied
+        finally:
+            if is_postgres:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {'k': MIGRATION_LOCK_KEY})
+
+
+def add_column(conn, table, column, column_type):
+    """Добавить колонку, если ее еще нет (ADD COLUMN IF NOT EXISTS не поддерживает SQLite)"""
+    if column in {c['name'] for c in inspect(conn).get_columns(table)}:
+        return
+    quote = conn.dialect.identifier_preparer.quote
+    conn.execute(text(f"ALTER TABLE {quote(table)} ADD COLUMN {quote(column)} {column_type}"))
+
+
+def create_index_concurrently(conn, name, table, columns, unique=False, where=None):
+    """Создать индекс без блокировки записи в таблицу (на PostgreSQL)"""
+    unique_sql = 'UNIQUE ' if unique else ''
+    where_sql = f' WHERE {where}' if where else ''
+    columns_sql = ', '.join(columns)
+
+    if conn.dialect.name != 'postgresql':
+        conn.execute(text(
+            f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({columns_sql}){where_sql}"
+        ))
+        return
+
+    # Прерванный CREATE INDEX CONCURRENTLY оставляет невалидный индекс - пересоздаем его
+    is_valid = conn.execute(text(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+    ), {'name': name}).scalar()
+    if is_valid:
+        return
+    if is_valid is False:
+        logger.warning(f"Index {name} is invalid, rebuilding")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+    conn.execute(text(
+        f"CREATE {unique_sql}INDEX CONCURRENTLY {name} ON {table} ({columns_sql}){where_sql}"
+    ))
+
+
+def migration_engine(app):
+    """Engine для миграций: DATABASE_MIGRATION_URL (прямое подключение) или основной"""
+    url = app.config.get('DATABASE_MIGRATION_URL')
+    if url:
+        return create_engine(url, poolclass=NullPool)
+    if app.config.get('DB_POOL_MODE') == 'pgbouncer' and db.engine.dialect.name == 'postgresql':
+        # Сессионный advisory lock через pgbouncer (transaction) попадет на чужое соединение
+        raise click.UsageError("DB_POOL_MODE=pgbouncer: set DATABASE_MIGRATION_URL to a direct PostgreSQL URL")
+    return db.engine
+
+
+def register_migration_commands(app):
+    """flask db-upgrade / flask db-version"""
+
+    @app.cli.command('db-upgrade')
+    @click.option('--target', type=int, default=None, help='Версия, до которой обновить схему')
+    def db_upgrade(target):
+        applied = upgrade(migration_engine(app), target)
+        if applied:
+            click.echo(f"Applied migrations: {', '.join(str(v) for v in applied)}")
+        else:
+            click.echo("Schema is already up to date")
+
+    @app.cli.command('db-version')
+    def db_version():
+        current = get_current_version(db.engine)
+        click.echo(f"Current: {current if current is not None else 'not initialized'}, latest: {latest_version()}")
@@ -0,0 +1,245 @@
+# Базовая схема на момент перехода на миграции (то, что раньше делал db.create_all() при старте).
+# Таблицы зафиксированы здесь, а не берутся из моделей: иначе на новой БД базовая миграция
+# создавала бы и колонки/индексы, которые добавляют следующие миграции
+from sqlalchemy import (
+    MetaData, Table, Column, ForeignKey, Integer, BigInteger, String, Text, Boolean,
+    DateTime, Numeric, Float, Enum, JSON
+)
+
+VERSION = 1
+DESCRIPTION = 'Initial schema'
+TRANSACTIONAL = True
+
+metadata = MetaData()
+
+Table(
+    'subscription_plans', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(100), nullable=False, unique=True),
+    Column('display_name', String(200), nullable=False),
+    Column('description', Text),
+    Column('price', Numeric(10, 2), nullable=False),
+    Column('currency', String(3)),
+    Column('billing_cycle', String(20), nullable=False),
+    Column('is_active', Boolean),
+    Column('is_public', Boolean),
+    Column('sort_order', Integer),
+    Column('max_bots', Integer),
+    Column('max_messages_per_month', Integer),
+    Column('max_storage_mb', Integer),
+    Column('max_team_members', Integer),
+    Column('has_api_access', Boolean),
+    Column('has_webhook_access', Boolean),
+    Column('has_advanced_analytics', Boolean),
+    Column('has_priority_support', Boolean),
+    Column('has_custom_branding', Boolean),
+    Column('has_white_label', Boolean),
+    Column('trial_days', Integer),
+    Column('grace_period_days', Integer),
+    Column('created_at', DateTime),
+    Column('updated_at', DateTime),
+)
+
+Table(
+    'user', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('username', String(150), nullable=False, unique=True),
+    Column('email', String(150), nullable=False, unique=True),
+    Column('password_hash', String(256), nullable=False),
+    Column('created_at', DateTime),
+    Column('is_active', Boolean),
+    Column('last_login', DateTime),
+    Column('role', String(20)),
+    Column('subscription_type', String(20)),
+    Column('subscription_expires', DateTime),
+)
+
+Table(
+    'limit', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('subscription_type', String(20)),
+    Column('subscription_expires', DateTime),
+    Column('amount', Float, nullable=False),
+    Column('currency', String(3), nullable=False),
+    Column('status', String(120), nullable=False),
+    Column('created_at', DateTime, nullable=False),
+)
+
+Table(
+    'subscription_features', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('plan_id', Integer, ForeignKey('subscription_plans.id'), nullable=False),
+    Column('feature_key', String(100), nullable=False),
+    Column('display_name', String(200), nullable=False),
+    Column('description', Text),
+    Column('is_enabled', Boolean),
+    Column('value', String(500)),
+    Column('limit_value', Integer),
+    Column('unit', String(50)),
+    Column('category', String(50)),
+    Column('priority', Integer),
+    Column('icon_class', String(100)),
+    Column('color', String(20)),
+    Column('created_at', DateTime),
+    Column('updated_at', DateTime),
+)
+
+Table(
+    'user_subscriptions', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('plan_id', Integer, ForeignKey('subscription_plans.id'), nullable=False),
+    Column('status', Enum(
+        'ACTIVE', 'TRIAL', 'EXPIRED', 'CANCELLED', 'SUSPENDED', 'PENDING', 'GRACE_PERIOD',
+        name='subscriptionstatus'
+    )),
+    Column('start_date', DateTime),
+    Column('end_date', DateTime),
+    Column('trial_end_date', DateTime),
+    Column('grace_period_end', DateTime),
+    Column('cancelled_at', DateTime),
+    Column('suspended_at', DateTime),
+    Column('reactivated_at', DateTime),
+    Column('auto_renew', Boolean),
+    Column('billing_cycle', String(20)),
+    Column('currency', String(3)),
+    Column('price_paid', Numeric(10, 2)),
+    Column('bots_created', Integer),
+    Column('messages_used_this_cycle', Integer),
+    Column('storage_used_mb', Integer),
+    Column('notes', Text),
+    Column('created_at', DateTime),
+    Column('updated_at', DateTime),
+)
+
+Table(
+    'subscription_history', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('subscription_id', Integer, ForeignKey('user_subscriptions.id')),
+    Column('action', Enum(
+        'CREATED', 'ACTIVATED', 'CANCELLED', 'SUSPENDED', 'REACTIVATED', 'EXPIRED', 'UPGRADED',
+        'DOWNGRADED', 'RENEWED', 'PAYMENT_SUCCESS', 'PAYMENT_FAILED', 'TRIAL_STARTED', 'TRIAL_ENDED',
+        'GRACE_PERIOD_STARTED', 'GRACE_PERIOD_ENDED',
+        name='historyaction'
+    ), nullable=False),
+    Column('old_plan_id', Integer, ForeignKey('subscription_plans.id')),
+    Column('old_status', String(50)),
+    Column('old_end_date', DateTime),
+    Column('new_plan_id', Integer, ForeignKey('subscription_plans.id')),
+    Column('new_status', String(50)),
+    Column('new_end_date', DateTime),
+    Column('description', Text),
+    Column('extra_data', JSON),
+    Column('ip_address', String(45)),
+    Column('user_agent', String(500)),
+    Column('created_at', DateTime),
+)
+
+Table(
+    'transactions', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('subscription_id', Integer, ForeignKey('user_subscriptions.id')),
+    Column('transaction_type', Enum(
+        'SUBSCRIPTION_PAYMENT', 'SUBSCRIPTION_RENEWAL', 'SUBSCRIPTION_UPGRADE', 'SUBSCRIPTION_DOWNGRADE',
+        'REFUND', 'TRIAL_TO_PAID', 'MANUAL_PAYMENT',
+        name='transactiontype'
+    ), nullable=False),
+    Column('status', Enum(
+        'PENDING', 'PROCESSING', 'COMPLETED', 'FAILED', 'CANCELLED', 'REFUNDED', 'PARTIALLY_REFUNDED',
+        'DISPUTED', 'CHARGEBACK',
+        name='transactionstatus'
+    )),
+    Column('amount', Numeric(10, 2), nullable=False),
+    Column('currency', String(3)),
+    Column('tax_amount', Numeric(10, 2)),
+    Column('discount_amount', Numeric(10, 2)),
+    Column('total_amount', Numeric(10, 2), nullable=False),
+    Column('plan_id', Integer, ForeignKey('subscription_plans.id')),
+    Column('billing_cycle', String(20)),
+    Column('payment_method', Enum(
+        'CREDIT_CARD', 'PAYPAL', 'BANK_TRANSFER', 'CRYPTOCURRENCY', 'APPLE_PAY', 'GOOGLE_PAY', 'MANUAL',
+        name='paymentmethod'
+    )),
+    Column('payment_provider', String(50)),
+    Column('payment_provider_transaction_id', String(100)),
+    Column('invoice_id', String(100)),
+    Column('receipt_id', String(100)),
+    Column('created_at', DateTime),
+    Column('processed_at', DateTime),
+    Column('completed_at', DateTime),
+    Column('refunded_at', DateTime),
+    Column('description', Text),
+    Column('failure_reason', Text),
+    Column('notes', Text),
+    Column('extra_data', JSON),
+)
+
+Table(
+    'usage_limits', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('subscription_id', Integer, ForeignKey('user_subscriptions.id')),
+    Column('plan_id', Integer, ForeignKey('subscription_plans.id')),
+    Column('limit_type', Enum(
+        'MESSAGES_PER_MONTH', 'MESSAGES_PER_DAY', 'BOTS_COUNT', 'STORAGE_MB', 'TEAM_MEMBERS',
+        'API_CALLS_PER_MONTH', 'API_CALLS_PER_DAY', 'WEBHOOKS_COUNT', 'ANALYTICS_DAYS', 'BACKUP_DAYS',
+        'CUSTOM_TEMPLATES',
+        name='limittype'
+    ), nullable=False),
+    Column('limit_period', Enum('DAILY', 'MONTHLY', 'YEARLY', 'LIFETIME', 'CUSTOM', name='limitperiod')),
+    Column('limit_value', Integer, nullable=False),
+    Column('current_usage', Integer),
+    Column('warning_threshold', Integer),
+    Column('period_start', DateTime, nullable=False),
+    Column('period_end', DateTime, nullable=False),
+    Column('is_hard_limit', Boolean),
+    Column('auto_reset', Boolean),
+    Column('rollover_enabled', Boolean),
+    Column('rollover_percentage', Integer),
+    Column('is_active', Boolean),
+    Column('last_reset_at', DateTime),
+    Column('description', String(500)),
+    Column('notes', Text),
+    Column('created_at', DateTime),
+    Column('updated_at', DateTime),
+)
+
+Table(
+    'usage_trackers', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('subscription_id', Integer, ForeignKey('user_subscriptions.id')),
+    Column('limit_id', Integer, ForeignKey('usage_limits.id')),
+    Column('usage_type', Enum(
+        'MESSAGE', 'BOT_CREATION', 'BOT_UPDATE', 'BOT_DELETION', 'API_CALL', 'WEBHOOK_CALL',
+        'STORAGE_UPLOAD', 'STORAGE_DOWNLOAD', 'TEMPLATE_CREATION', 'TEMPLATE_USAGE', 'ANALYTICS_QUERY',
+        'BACKUP_CREATION', 'TEAM_MEMBER_ADDED', 'TEAM_MEMBER_REMOVED', 'EXPORT_DATA', 'IMPORT_DATA',
+        name='usagetype'
+    ), nullable=False),
+    Column('resource_id', String(100)),
+    Column('resource_type', String(50)),
+    Column('action', String(100)),
+    Column('quantity', Integer),
+    Column('cost', Numeric(10, 4)),
+    Column('size_bytes', BigInteger),
+    Column('extra_data', JSON),
+    Column('tags', String(500)),
+    Column('ip_address', String(45)),
+    Column('user_agent', String(500)),
+    Column('country', String(2)),
+    Column('city', String(100)),
+    Column('execution_time_ms', Integer),
+    Column('memory_usage_mb', Integer),
+    Column('status', String(50)),
+    Column('error_message', Text),
+    Column('created_at', DateTime),
+    Column('processed_at', DateTime),
+)
+
+
+def upgrade(conn):
+    # checkfirst: на БД, созданной до миграций, таблицы уже есть
+    metadata.create_all(bind=conn, checkfirst=True)
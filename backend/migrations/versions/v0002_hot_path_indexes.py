@@ -0,0 +1,20 @@
+# Составные индексы для горячих запросов подписок и использования.
+# CREATE INDEX CONCURRENTLY не блокирует запись в большие таблицы usage_trackers и transactions
+from migrations.runner import create_index_concurrently
+
+VERSION = 2
+DESCRIPTION = 'Composite indexes for subscription and usage hot paths'
+TRANSACTIONAL = False
+
+INDEXES = [
+    ('ix_usage_trackers_user_type_created', 'usage_trackers', ['user_id', 'usage_type', 'created_at']),
+    ('ix_transactions_user_created', 'transactions', ['user_id', 'created_at']),
+    ('ix_subscription_history_user_created', 'subscription_history', ['user_id', 'created_at']),
+    ('ix_usage_limits_user_active_type', 'usage_limits', ['user_id', 'is_active', 'limit_type']),
+    ('ix_user_subscriptions_user_status', 'user_subscriptions', ['user_id', 'status']),
+]
+
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        create_index_concurrently(conn, name, table, columns)
@@ -0,0 +1,10 @@
+# Лимит запросов к API в минуту для плана подписки (используется rate limiting'ом /api/subscriptions)
+from migrations.runner import add_column
+
+VERSION = 3
+DESCRIPTION = 'API rate limit per subscription plan'
+TRANSACTIONAL = True
+
+
+def upgrade(conn):
+    add_column(conn, 'subscription_plans', 'api_requests_per_minute', 'INTEGER')
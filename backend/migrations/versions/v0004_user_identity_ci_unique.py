@@ -0,0 +1,30 @@
+# Регистронезависимая уникальность username и email: регистрация делает один INSERT,
+# а гонку параллельных регистраций решает уникальный индекс
+from sqlalchemy import text
+from migrations.runner import create_index_concurrently
+
+VERSION = 4
+DESCRIPTION = 'Case-insensitive unique indexes on user username and email'
+TRANSACTIONAL = False
+
+INDEXES = [
+    ('ux_user_username_lower', '"user"', ['lower(username)']),
+    ('ux_user_email_lower', '"user"', ['lower(email)']),
+]
+
+
+def _find_duplicates(conn, column):
+    return conn.execute(text(
+        f'SELECT lower({column}) FROM "user" GROUP BY lower({column}) HAVING count(*) > 1 LIMIT 10'
+    )).scalars().all()
+
+
+def upgrade(conn):
+    for column in ('username', 'email'):
+        duplicates = _find_duplicates(conn, column)
+        if duplicates:
+            raise RuntimeError(
+                f"Users with {column} differing only by case must be merged first: {', '.join(duplicates)}"
+            )
+    for name, table, columns in INDEXES:
+        create_index_concurrently(conn, name, table, columns, unique=True)
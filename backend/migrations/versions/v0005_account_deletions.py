@@ -0,0 +1,29 @@
+# Фоновое удаление аккаунтов: отметка на пользователе и таблица заданий с прогрессом.
+# Таблица описана здесь, а не берется из модели, чтобы миграция не менялась вместе с ней
+from sqlalchemy import MetaData, Table, Column, Integer, String, Text, DateTime
+from migrations.runner import add_column
+
+VERSION = 5
+DESCRIPTION = 'Account deletion jobs'
+TRANSACTIONAL = True
+
+metadata = MetaData()
+
+account_deletions = Table(
+    'account_deletions', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, nullable=False, unique=True),
+    Column('status', String(20), nullable=False, index=True),
+    Column('current_table', String(100)),
+    Column('rows_deleted', Integer, nullable=False),
+    Column('attempts', Integer, nullable=False),
+    Column('error', Text),
+    Column('requested_at', DateTime, nullable=False),
+    Column('updated_at', DateTime, nullable=False),
+    Column('finished_at', DateTime),
+)
+
+
+def upgrade(conn):
+    add_column(conn, 'user', 'deletion_requested_at', 'TIMESTAMP')
+    account_deletions.create(bind=conn, checkfirst=True)
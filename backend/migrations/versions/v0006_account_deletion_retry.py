@@ -0,0 +1,10 @@
+# Повтор упавших заданий удаления аккаунтов: время следующей попытки
+from migrations.runner import add_column
+
+VERSION = 6
+DESCRIPTION = 'Account deletion retry time'
+TRANSACTIONAL = True
+
+
+def upgrade(conn):
+    add_column(conn, 'account_deletions', 'retry_at', 'TIMESTAMP')
@@ -1,3 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from utils.db_routing import RoutingSession
 
-db = SQLAlchemy()
\ No newline at end of file
+# RoutingSession отправляет чтения из @read_only кода на реплику (если она настроена)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
\ No newline at end of file
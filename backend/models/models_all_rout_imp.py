@@ -1,4 +1,5 @@
 from models.users.main_user_db import User
+from models.users.account_deletion import AccountDeletion
 
 # Импорты всех моделей подписок
 from models.subscription.subscription_plan import SubscriptionPlan
@@ -1,4 +1,5 @@
 from models.imp import db
+from utils.pagination import apply_keyset
 from datetime import datetime
 import enum
 
@@ -25,6 +26,10 @@ class HistoryAction(enum.Enum):
 class SubscriptionHistory(db.Model):
     """Модель истории изменений подписки"""
     __tablename__ = 'subscription_history'
+    __table_args__ = (
+        # История подписки пользователя, сортировка по дате
+        db.Index('ix_subscription_history_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -110,11 +115,15 @@ class SubscriptionHistory(db.Model):
         return history_entry
     
     @staticmethod
-    def get_user_history(user_id, limit=50, offset=0):
-        """Получить историю подписок пользователя"""
-        return SubscriptionHistory.query.filter_by(user_id=user_id)\
-            .order_by(SubscriptionHistory.created_at.desc())\
-            .limit(limit).offset(offset).all()
+    def get_user_history(user_id, limit=50, offset=0, after=None):
+        """Получить историю подписок пользователя.
+
+        after=(created_at, id) - keyset пагинация вместо offset
+        """
+        query = apply_keyset(SubscriptionHistory.query.filter_by(user_id=user_id), SubscriptionHistory, after)
+        if after is None and offset:
+            query = query.offset(offset)
+        return query.limit(limit).all()
     
     @staticmethod
     def get_subscription_history(subscription_id, limit=50, offset=0):
@@ -25,6 +25,7 @@ class SubscriptionPlan(db.Model):
     max_messages_per_month = db.Column(db.Integer, default=100)
     max_storage_mb = db.Column(db.Integer, default=100)  # Максимальный объем хранилища в МБ
     max_team_members = db.Column(db.Integer, default=1)
+    api_requests_per_minute = db.Column(db.Integer)  # Лимит запросов к API, NULL - API_RATE_LIMIT_DEFAULT
     
     # Функции
     has_api_access = db.Column(db.Boolean, default=False)
@@ -63,6 +64,7 @@ class SubscriptionPlan(db.Model):
             'max_messages_per_month': self.max_messages_per_month,
             'max_storage_mb': self.max_storage_mb,
             'max_team_members': self.max_team_members,
+            'api_requests_per_minute': self.api_requests_per_minute,
             'has_api_access': self.has_api_access,
             'has_webhook_access': self.has_webhook_access,
             'has_advanced_analytics': self.has_advanced_analytics,
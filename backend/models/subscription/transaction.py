@@ -1,4 +1,5 @@
 from models.imp import db
+from utils.pagination import apply_keyset
 from datetime import datetime
 import enum
 
@@ -41,6 +42,10 @@ class PaymentMethod(enum.Enum):
 class Transaction(db.Model):
     """Расширенная модель транзакций"""
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # История транзакций пользователя, сортировка по дате
+        db.Index('ix_transactions_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -196,8 +201,8 @@ class Transaction(db.Model):
         return float(self.total_amount)
     
     @staticmethod
-    def get_user_transactions(user_id, limit=50, offset=0, status=None, transaction_type=None):
-        """Получить транзакции пользователя"""
+    def get_user_transactions(user_id, limit=50, offset=0, status=None, transaction_type=None, after=None):
+        """Получить транзакции пользователя (after=(created_at, id) - keyset пагинация)"""
         query = Transaction.query.filter_by(user_id=user_id)
         
         if status:
@@ -210,7 +215,10 @@ class Transaction(db.Model):
                 transaction_type = TransactionType(transaction_type)
             query = query.filter_by(transaction_type=transaction_type)
         
-        return query.order_by(Transaction.created_at.desc()).limit(limit).offset(offset).all()
+        query = apply_keyset(query, Transaction, after)
+        if after is None and offset:
+            query = query.offset(offset)
+        return query.limit(limit).all()
     
     @staticmethod
     def get_subscription_transactions(subscription_id, limit=50, offset=0):
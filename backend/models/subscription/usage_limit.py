@@ -30,6 +30,10 @@ class LimitPeriod(enum.Enum):
 class UsageLimit(db.Model):
     """Модель лимитов использования"""
     __tablename__ = 'usage_limits'
+    __table_args__ = (
+        # get_user_limits / get_user_limit_for_subscription
+        db.Index('ix_usage_limits_user_active_type', 'user_id', 'is_active', 'limit_type'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
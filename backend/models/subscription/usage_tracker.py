@@ -27,6 +27,10 @@ class UsageType(enum.Enum):
 class UsageTracker(db.Model):
     """Модель отслеживания использования"""
     __tablename__ = 'usage_trackers'
+    __table_args__ = (
+        # _track_free_user_usage и get_user_usage_stats: фильтр по пользователю, типу и дате
+        db.Index('ix_usage_trackers_user_type_created', 'user_id', 'usage_type', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -132,8 +136,8 @@ class UsageTracker(db.Model):
     def track_usage(user_id, usage_type, quantity=1, cost=0, resource_id=None, 
                    resource_type=None, action=None, extra_data=None, subscription_id=None,
                    limit_id=None, ip_address=None, user_agent=None, execution_time_ms=None,
-                   status='success', error_message=None):
-        """Статический метод для отслеживания использования"""
+                   status='success', error_message=None, commit=True):
+        """Статический метод для отслеживания использования (commit=False - в транзакции вызывающего)"""
         
         tracker = UsageTracker(
             user_id=user_id,
@@ -164,7 +168,8 @@ class UsageTracker(db.Model):
                 pass
         
         db.session.add(tracker)
-        db.session.commit()
+        if commit:
+            db.session.commit()
         
         return tracker
     
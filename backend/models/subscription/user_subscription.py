@@ -18,6 +18,10 @@ class SubscriptionStatus(enum.Enum):
 class UserSubscription(db.Model):
     """Модель подписки пользователя"""
     __tablename__ = 'user_subscriptions'
+    __table_args__ = (
+        # Поиск активной подписки пользователя
+        db.Index('ix_user_subscriptions_user_status', 'user_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
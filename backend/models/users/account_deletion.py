@@ -0,0 +1,45 @@
+from models.imp import db
+from datetime import datetime
+
+
+class AccountDeletion(db.Model):
+    """Задание на удаление аккаунта: выполняется в фоне пачками, переживает перезапуски.
+
+    user_id без внешнего ключа - запись остается после удаления пользователя
+    """
+    __tablename__ = 'account_deletions'
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, unique=True)
+    status = db.Column(db.String(20), nullable=False, default=PENDING, index=True)
+    current_table = db.Column(db.String(100))
+    rows_deleted = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    requested_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    retry_at = db.Column(db.DateTime)  # когда повторить упавшее задание (None - попытки исчерпаны)
+
+    def __repr__(self):
+        return f'<AccountDeletion user={self.user_id} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'status': self.status,
+            'current_table': self.current_table,
+            'rows_deleted': self.rows_deleted,
+            'attempts': self.attempts,
+            'error': self.error,
+            'requested_at': self.requested_at.isoformat() if self.requested_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'retry_at': self.retry_at.isoformat() if self.retry_at else None
+        }
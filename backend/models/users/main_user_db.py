@@ -1,6 +1,8 @@
 from models.imp import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from utils.password_hasher import password_hasher
+from utils.activity_buffer import activity_buffer
 from datetime import datetime
+import os
 
 
 class User(db.Model):
@@ -15,6 +17,13 @@ class User(db.Model):
 
     subscription_type = db.Column(db.String(20), default='free')  # free, premium, business
     subscription_expires = db.Column(db.DateTime)
+    deletion_requested_at = db.Column(db.DateTime)  # Аккаунт ждет фонового удаления (см. AccountDeletion)
+
+    # Регистронезависимая уникальность (миграция 0004): Admin и admin - один пользователь
+    __table_args__ = (
+        db.Index('ux_user_username_lower', db.func.lower(username), unique=True),
+        db.Index('ux_user_email_lower', db.func.lower(email), unique=True),
+    )
 
     # Связь с транзакциями
     transactions = db.relationship('Transaction', backref='user', lazy=True)
@@ -26,15 +35,26 @@ class User(db.Model):
         return f"<User {self.username}>"
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def set_unusable_password(self):
+        """Пароль, с которым нельзя войти (аккаунты OAuth) - без дорогого хеширования"""
+        self.password_hash = '!' + os.urandom(16).hex()
+
+    def rehash_password_if_needed(self, password):
+        """После успешного входа перехешировать пароль с текущими параметрами (без commit)"""
+        if password_hasher.needs_rehash(self.password_hash):
+            self.set_password(password)
+            return True
+        return False
     
     def activate(self):
         self.is_active = True
-        self.last_login = datetime.utcnow()
         db.session.commit()
+        activity_buffer.record_login(self.id)
 
     def deactivate(self):
         self.is_active = False
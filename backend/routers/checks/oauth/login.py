@@ -1,12 +1,13 @@
 from models.models_all_rout_imp import User
 from models.imp import db
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app
+from utils.rate_limit import limiter, remember_plan_rate_limit
+from utils.activity_buffer import activity_buffer
 
 oauth_bpp = Blueprint('oauth_bpp', __name__, url_prefix='/')
 
 @oauth_bpp.route('/login', methods=['GET', 'POST'])
+@limiter.limit(lambda: current_app.config['LOGIN_RATE_LIMIT'], methods=['POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
@@ -15,8 +16,10 @@ def login():
         if user and user.check_password(password):
             if user.is_active:
                 session['user_id'] = user.id
-                user.last_login = datetime.utcnow()
-                db.session.commit()
+                remember_plan_rate_limit(user.id)
+                if user.rehash_password_if_needed(password):
+                    db.session.commit()
+                activity_buffer.record_login(user.id)
                 flash('Успешный вход в систему!', 'success')
                 return redirect(url_for('homes_bpp.home'))
             else:
@@ -1,28 +1,49 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app
+from sqlalchemy.exc import IntegrityError
 from models.models_all_rout_imp import User
 from models.imp import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from utils.rate_limit import limiter
 
 oauth_register_bpp = Blueprint('oauth_register_bpp', __name__, url_prefix='/register')
 
+# Какое поле заняло место, по имени нарушенного ограничения
+DUPLICATE_MESSAGES = {
+    'username': 'Имя пользователя уже занято.',
+    'email': 'Пользователь с таким email уже зарегистрирован.',
+}
+
+
+def _duplicate_field(error):
+    """username или email по IntegrityError уникальных индексов user"""
+    diag = getattr(error.orig, 'diag', None)
+    text = getattr(diag, 'constraint_name', None) or str(error.orig)
+    for field in DUPLICATE_MESSAGES:
+        if field in text:
+            return field
+    return None
+
+
 @oauth_register_bpp.route('/', methods=['GET', 'POST'])
+@limiter.limit(lambda: current_app.config['REGISTER_RATE_LIMIT'], methods=['POST'])
 def register():
     if request.method == 'POST':
-        username = request.form['username']
-        email = request.form['email']
+        username = request.form['username'].strip()
+        email = request.form['email'].strip().lower()
         password = request.form['password']
         
-        existing_user = User.query.filter((User.username == username) | (User.email == email)).first()
-        if existing_user:
-            flash('Имя пользователя или email уже существуют.', 'danger')
-            return redirect(url_for('oauth_register_bpp.register'))
-        
+        # Без предварительной проверки: один INSERT, дубликаты ловит уникальный индекс
         new_user = User(username=username, email=email)
         new_user.set_password(password)
         db.session.add(new_user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            field = _duplicate_field(e)
+            flash(DUPLICATE_MESSAGES.get(field, 'Имя пользователя или email уже существуют.'), 'danger')
+            return redirect(url_for('oauth_register_bpp.register'))
         
         flash('Регистрация прошла успешно! Теперь вы можете войти.', 'success')
         return redirect(url_for('oauth_bpp.login'))
     
-    return render_template('register.html')
\ No newline at end of file
+    return render_template('register.html')
@@ -1,9 +1,8 @@
 from flask import Blueprint, flash, redirect, url_for, request, session, jsonify, current_app
-from models.models_all_rout_imp import *
+from models.models_all_rout_imp import User
 from models.imp import db
-from datetime import datetime
-import requests
-import os
+from utils.rate_limit import remember_plan_rate_limit
+from utils.activity_buffer import activity_buffer
 import secrets
 from config import Config
 from urllib.parse import urlencode
@@ -52,6 +51,9 @@ def github_login():
 @github_oauth_bp.route('/auth/github/callback')
 def github_callback():
     """Обработка callback от GitHub"""
+    # requests грузим только когда реально идем в GitHub, а не при старте воркера
+    import requests
+
     current_app.logger.info(f'GitHub OAuth: Callback received, state: {request.args.get("state")}, session state: {session.get("github_state")}')
     
     # Проверяем state для безопасности
@@ -147,6 +149,11 @@ def github_callback():
         
         # Получаем действие (login или register) из сессии
         action = session.pop('github_action', 'login')
+
+        # Деактивированный аккаунт (в том числе ожидающий удаления) не авторизуем, как и в login
+        if user and not user.is_active:
+            flash('Ваш аккаунт деактивирован. Пожалуйста, свяжитесь с администратором.', 'danger')
+            return redirect(url_for('oauth_bpp.login'))
         
         if not user:
             # Создаем нового пользователя
@@ -162,7 +169,7 @@ def github_callback():
                 email=primary_email
             )
             # Устанавливаем случайный пароль (пользователь не будет его знать)
-            user.set_password(os.urandom(32).hex())
+            user.set_unusable_password()
             
             db.session.add(user)
             db.session.commit()
@@ -182,13 +189,10 @@ def github_callback():
         # Авторизуем пользователя
         session.permanent = True
         session['user_id'] = user.id
-        session['username'] = user.username
-        session['email'] = user.email
-        user.last_login = datetime.utcnow()
-        db.session.commit()
+        remember_plan_rate_limit(user.id)
+        activity_buffer.record_login(user.id)
         
         current_app.logger.info(f'GitHub OAuth: User {user.username} logged in successfully, user_id: {user.id}')
-        current_app.logger.info(f'GitHub OAuth: Session data - user_id: {session.get("user_id")}, username: {session.get("username")}')
         
         # Проверяем, куда перенаправляем
         redirect_url = url_for('homes_bpp.home')
@@ -1,9 +1,9 @@
 from flask_dance.contrib.google import make_google_blueprint, google
 from flask import Blueprint, flash, redirect, url_for, request, session
-from models.models_all_rout_imp import *
-from datetime import datetime
+from models.models_all_rout_imp import User
 from models.imp import db
-import os
+from utils.rate_limit import remember_plan_rate_limit
+from utils.activity_buffer import activity_buffer
 from config import Config
 
 
@@ -67,6 +67,11 @@ def google_callback():
     action = session.pop('google_action', 'login')
     
     user = User.query.filter_by(email=email).first()
+
+    # Деактивированный аккаунт (в том числе ожидающий удаления) не авторизуем, как и в login
+    if user and not user.is_active:
+        flash('Ваш аккаунт деактивирован. Пожалуйста, свяжитесь с администратором.', 'danger')
+        return redirect(url_for('oauth_bpp.login'))
     
     if not user:
         # Проверяем, не занят ли username
@@ -77,7 +82,7 @@ def google_callback():
             counter += 1
         
         user = User(username=username, email=email)
-        user.set_password(os.urandom(32).hex())
+        user.set_unusable_password()
         db.session.add(user)
         db.session.commit()
         
@@ -93,9 +98,7 @@ def google_callback():
 
     session.permanent = True
     session['user_id'] = user.id
-    session['username'] = user.username
-    session['email'] = user.email
-    user.last_login = datetime.utcnow()
-    db.session.commit()
+    remember_plan_rate_limit(user.id)
+    activity_buffer.record_login(user.id)
 
     return redirect(url_for('homes_bpp.home'))
\ No newline at end of file
@@ -1,14 +1,9 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from models.models_all_rout_imp import User
+from flask import Blueprint, render_template
+from utils.auth import login_required, get_current_user
 
 homes_bpp = Blueprint('homes_bpp', __name__)
 
 @homes_bpp.route('/home')
+@login_required
 def home():
-    if 'user_id' not in session:
-        flash('Пожалуйста, войдите в систему, чтобы получить доступ к этой странице.')
-        return redirect(url_for('oauth_bpp.login'))
-    
-    user = User.query.get(session['user_id'])
-    
-    return render_template('home.html', user=user)
\ No newline at end of file
+    return render_template('home.html', user=get_current_user())
@@ -1,11 +1,8 @@
-from flask import Blueprint, render_template, session
-from models.models_all_rout_imp import User
+from flask import Blueprint, render_template
+from utils.auth import get_current_user
 
 home_bpp = Blueprint('home_bpp', __name__)
 
 @home_bpp.route('/')
 def index():
-    user = None
-    if 'user_id' in session:
-        user = User.query.get(session['user_id'])
-    return render_template('index.html', user=user)
\ No newline at end of file
+    return render_template('index.html', user=get_current_user())
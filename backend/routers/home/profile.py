@@ -1,26 +1,22 @@
 # routers/home/profile.py
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from flask_wtf.csrf import CSRFProtect
-from models.models_all_rout_imp import User
-from models.imp import db
+from services.account_deletion_service import account_deletion_service
+from utils.auth import login_required, get_current_user, load_user_model
+from utils.server_session import revoke_user_sessions
 
 profile_bpp = Blueprint('profile_bpp', __name__)
 
 @profile_bpp.route('/profile', methods=['GET', 'POST'])
+@login_required
 def profile():
-    if 'user_id' not in session:
-        flash('Пожалуйста, войдите в систему.', 'danger')
-        return redirect(url_for('oauth_bpp.login'))
-
-    user = User.query.get(session['user_id'])
-
     if request.method == 'POST':
         # Обработка удаления аккаунта
         if request.form.get('confirm_delete') == 'yes':
-            db.session.delete(user)
-            db.session.commit()
+            user = load_user_model()
+            account_deletion_service.request_deletion(user)
             session.clear()
-            flash('Аккаунт удалён навсегда.', 'success')
+            revoke_user_sessions(user.id)
+            flash('Аккаунт будет удалён в ближайшее время.', 'success')
             return redirect(url_for('home_bpp.index'))
 
-    return render_template('profile.html', user=user)
\ No newline at end of file
+    return render_template('profile.html', user=get_current_user())
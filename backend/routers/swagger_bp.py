@@ -1,10 +1,4 @@
 from flask import Blueprint, jsonify, render_template, current_app
-import json
-import sys
-import os
-
-# Добавляем путь к utils в sys.path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from utils.swagger_generator import create_swagger_spec, auto_swagger
 
 swagger_bpp = Blueprint('swagger_bpp', __name__, url_prefix='/api')
@@ -0,0 +1,224 @@
+from models.models_all_rout_imp import (
+    User, AccountDeletion, UsageTracker, SubscriptionHistory, Transaction, UsageLimit, UserSubscription, Limit
+)
+from models.imp import db
+from utils.logs_service import init_logger
+from utils.auth import user_cache
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, or_, and_
+import click
+import os
+import threading
+import time
+
+# Порядок удаления: сначала строки, которые ссылаются на другие зависимые таблицы
+DEPENDENT_TABLES = [
+    UsageTracker.__table__,
+    SubscriptionHistory.__table__,
+    Transaction.__table__,
+    UsageLimit.__table__,
+    UserSubscription.__table__,
+    Limit.__table__,
+]
+
+
+class AccountDeletionService:
+    """Удаление аккаунтов: запрос только помечает аккаунт, данные удаляются в фоне пачками.
+
+    Каждая пачка - отдельная короткая транзакция DELETE ... WHERE id IN (SELECT ... LIMIT n),
+    после нее в задании обновляется прогресс. Прерванное задание подхватывается
+    заново после истечения аренды и продолжает с оставшихся строк. Упавшее задание
+    повторяется через retry_delay * 2^(попытка - 1), всего не больше max_attempts попыток.
+    """
+
+    def __init__(self):
+        self.logger = init_logger('account_deletion_service')
+
+    def request_deletion(self, user):
+        """Пометить аккаунт на удаление и создать задание. Вход в аккаунт сразу блокируется"""
+        now = datetime.utcnow()
+        user.is_active = False
+        user.deletion_requested_at = now
+
+        job = AccountDeletion.query.filter_by(user_id=user.id).first()
+        if job is None:
+            job = AccountDeletion(user_id=user.id, status=AccountDeletion.PENDING, requested_at=now, updated_at=now)
+            db.session.add(job)
+        elif job.status == AccountDeletion.FAILED:
+            job.status = AccountDeletion.PENDING
+            job.retry_at = None
+            job.updated_at = now
+        db.session.commit()
+
+        self.logger.info(f"Account deletion requested for user {user.id}")
+        deletion_worker.wake()
+        return job
+
+    def _claim(self, conn, lease_seconds):
+        """Взять следующее задание: новое, брошенное упавшим воркером (аренда истекла)
+        или упавшее, у которого подошло время повтора"""
+        table = AccountDeletion.__table__
+        now = datetime.utcnow()
+        candidate = select(table.c.id).where(or_(
+            table.c.status == AccountDeletion.PENDING,
+            and_(table.c.status == AccountDeletion.RUNNING,
+                 table.c.updated_at < now - timedelta(seconds=lease_seconds)),
+            and_(table.c.status == AccountDeletion.FAILED, table.c.retry_at <= now)
+        )).order_by(table.c.id).limit(1)
+        if conn.dialect.name == 'postgresql':
+            candidate = candidate.with_for_update(skip_locked=True)
+
+        return conn.execute(
+            update(table)
+            .where(table.c.id == candidate.scalar_subquery())
+            .values(status=AccountDeletion.RUNNING, updated_at=now, retry_at=None, attempts=table.c.attempts + 1)
+            .returning(table.c.id, table.c.user_id, table.c.attempts)
+        ).first()
+
+    def _progress(self, conn, job_id, **values):
+        table = AccountDeletion.__table__
+        conn.execute(update(table).where(table.c.id == job_id).values(updated_at=datetime.utcnow(), **values))
+
+    def _delete_chunk(self, engine, table, user_id, chunk_size):
+        ids = select(table.c.id).where(table.c.user_id == user_id).limit(chunk_size)
+        with engine.begin() as conn:
+            return conn.execute(delete(table).where(table.c.id.in_(ids.scalar_subquery()))).rowcount
+
+    def process_job(self, engine, job_id, user_id, chunk_size, pause=0.0):
+        """Удалить зависимые строки пачками, затем самого пользователя"""
+        jobs = AccountDeletion.__table__
+        for table in DEPENDENT_TABLES:
+            while True:
+                deleted = self._delete_chunk(engine, table, user_id, chunk_size)
+                with engine.begin() as conn:
+                    self._progress(conn, job_id, current_table=table.name,
+                                   rows_deleted=jobs.c.rows_deleted + deleted)
+                if deleted < chunk_size:
+                    break
+                if pause:
+                    time.sleep(pause)
+
+        users = User.__table__
+        with engine.begin() as conn:
+            conn.execute(delete(users).where(users.c.id == user_id))
+            self._progress(conn, job_id, status=AccountDeletion.DONE, current_table=None,
+                           finished_at=datetime.utcnow(), error=None)
+        user_cache.invalidate(user_id)
+        self.logger.info(f"Account {user_id} deleted (job {job_id})")
+
+    def run_pending(self, engine, chunk_size, lease_seconds, pause=0.0, max_jobs=None,
+                    max_attempts=5, retry_delay=60.0):
+        """Обработать задания, пока они есть. Возвращает число завершенных"""
+        done = 0
+        while max_jobs is None or done < max_jobs:
+            with engine.begin() as conn:
+                claimed = self._claim(conn, lease_seconds)
+            if claimed is None:
+                break
+            job_id, user_id, attempts = claimed
+            try:
+                self.process_job(engine, job_id, user_id, chunk_size, pause)
+                done += 1
+            except Exception as e:
+                # Аккаунт уже деактивирован и запросить удаление повторно нельзя - повторяем сами
+                retry_at = None
+                if attempts < max_attempts:
+                    retry_at = datetime.utcnow() + timedelta(seconds=retry_delay * 2 ** (attempts - 1))
+                self.logger.error(f"Account deletion job {job_id} for user {user_id} failed "
+                                  f"(attempt {attempts}/{max_attempts}): {e}")
+                with engine.begin() as conn:
+                    self._progress(conn, job_id, status=AccountDeletion.FAILED, error=str(e), retry_at=retry_at)
+        return done
+
+    def retry_failed(self, engine):
+        """Вернуть в очередь упавшие задания, в том числе исчерпавшие попытки. Возвращает их число"""
+        table = AccountDeletion.__table__
+        with engine.begin() as conn:
+            return conn.execute(
+                update(table).where(table.c.status == AccountDeletion.FAILED)
+                .values(status=AccountDeletion.PENDING, attempts=0, retry_at=None, updated_at=datetime.utcnow())
+            ).rowcount
+
+
+class AccountDeletionWorker:
+    """Фоновый поток воркера: просыпается по запросу на удаление или раз в poll_interval"""
+
+    def __init__(self, service):
+        self.service = service
+        self.app = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        if app.config['ACCOUNT_DELETION_WORKER_ENABLED']:
+            # Запуск при первом запросе: поток мастера gunicorn не переживает fork
+            app.before_request(self.ensure_started)
+
+    def ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='account-deletion', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _run(self):
+        config = self.app.config
+        while True:
+            self._wakeup.wait(config['ACCOUNT_DELETION_POLL_INTERVAL'])
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    self.service.run_pending(db.engine, config['ACCOUNT_DELETION_CHUNK_SIZE'],
+                                             config['ACCOUNT_DELETION_LEASE_SECONDS'],
+                                             config['ACCOUNT_DELETION_CHUNK_PAUSE'],
+                                             max_attempts=config['ACCOUNT_DELETION_MAX_ATTEMPTS'],
+                                             retry_delay=config['ACCOUNT_DELETION_RETRY_DELAY'])
+            except Exception as e:
+                self.service.logger.error(f"Account deletion worker error: {e}")
+
+
+account_deletion_service = AccountDeletionService()
+deletion_worker = AccountDeletionWorker(account_deletion_service)
+
+
+def register_account_deletion_commands(app):
+    """flask process-deletions / flask deletion-status"""
+
+    @app.cli.command('process-deletions')
+    @click.option('--chunk-size', type=int, default=None, help='Строк в одном DELETE')
+    @click.option('--max-jobs', type=int, default=None, help='Сколько заданий обработать')
+    @click.option('--retry-failed', is_flag=True, help='Сначала вернуть в очередь все упавшие задания')
+    def process_deletions(chunk_size, max_jobs, retry_failed):
+        if retry_failed:
+            click.echo(f"Requeued {account_deletion_service.retry_failed(db.engine)} failed jobs")
+        done = account_deletion_service.run_pending(
+            db.engine,
+            chunk_size or app.config['ACCOUNT_DELETION_CHUNK_SIZE'],
+            app.config['ACCOUNT_DELETION_LEASE_SECONDS'],
+            app.config['ACCOUNT_DELETION_CHUNK_PAUSE'],
+            max_jobs,
+            max_attempts=app.config['ACCOUNT_DELETION_MAX_ATTEMPTS'],
+            retry_delay=app.config['ACCOUNT_DELETION_RETRY_DELAY']
+        )
+        click.echo(f"Completed {done} account deletion jobs")
+
+    @app.cli.command('deletion-status')
+    def deletion_status():
+        jobs = AccountDeletion.query.filter(AccountDeletion.status != AccountDeletion.DONE)\
+            .order_by(AccountDeletion.id).all()
+        if not jobs:
+            click.echo("No pending account deletions")
+        for job in jobs:
+            click.echo(f"#{job.id} user={job.user_id} {job.status} table={job.current_table or '-'} "
+                       f"rows={job.rows_deleted} attempts={job.attempts} updated={job.updated_at:%Y-%m-%d %H:%M:%S}"
+                       f"{f' retry={job.retry_at:%Y-%m-%d %H:%M:%S}' if job.retry_at else ''}"
+                       f"{' error=' + job.error if job.error else ''}")
@@ -0,0 +1,628 @@
+from models.models_all_rout_imp import (
+    UserSubscription, SubscriptionPlan, SubscriptionStatus, UsageLimit, LimitType, UsageTracker, UsageType
+)
+from models.imp import db
+from utils.db_routing import RoutingSession
+from utils.logs_service import init_logger
+from utils.metrics import quota_checks_total
+from datetime import datetime
+from sqlalchemy import event, inspect, select, update, func, or_
+import click
+import os
+import threading
+import time
+
+logger = init_logger('quota_engine')
+
+ACTIVE_STATUSES = [SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIAL]
+
+# Состояние квоты пользователя - hash: limit, used (списано), synced (уже записано в БД),
+# sub (id подписки, 0 - бесплатный), cycle (месяц для бесплатных, '' - цикл подписки).
+# Списываются по порядку события, которые еще помещаются в лимит (ARGV[4..] - количества).
+# Пустой ответ - квоты нет в Redis (или сменился месяц), ее нужно загрузить из БД
+CONSUME_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'limit', 'used', 'sub', 'cycle')
+if not state[1] then
+    return nil
+end
+if state[4] ~= '' and state[4] ~= ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return nil
+end
+local limit = tonumber(state[1])
+local used = tonumber(state[2])
+local accepted = {}
+local total = 0
+for i = 4, #ARGV do
+    local quantity = tonumber(ARGV[i])
+    if used + total + quantity <= limit then
+        total = total + quantity
+        accepted[#accepted + 1] = 1
+    else
+        accepted[#accepted + 1] = 0
+    end
+end
+if total > 0 then
+    redis.call('HINCRBY', KEYS[1], 'used', total)
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    if state[3] ~= '0' then
+        redis.call('SADD', KEYS[2], ARGV[3])
+    end
+end
+return {state[3], accepted}
+"""
+
+SEED_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('HSET', KEYS[1], 'limit', ARGV[1], 'used', ARGV[2], 'synced', ARGV[2], 'sub', ARGV[3], 'cycle', ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ARGV[5])
+end
+return 1
+"""
+
+# Забрать несверенную разницу: synced догоняет used, разница уходит в БД
+TAKE_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'used', 'synced', 'sub')
+if not state[1] then
+    return nil
+end
+redis.call('HSET', KEYS[1], 'synced', state[1])
+return {tonumber(state[1]) - tonumber(state[2]), state[3]}
+"""
+
+# После записи в БД: подтянуть списанное мимо Redis (путь через БД, пока Redis лежал) и лимит
+SYNC_SCRIPT = """
+local synced = redis.call('HGET', KEYS[1], 'synced')
+if not synced then
+    return 0
+end
+local missing = tonumber(ARGV[1]) - tonumber(synced)
+if missing > 0 then
+    redis.call('HINCRBY', KEYS[1], 'used', missing)
+    redis.call('HINCRBY', KEYS[1], 'synced', missing)
+end
+redis.call('HSET', KEYS[1], 'limit', ARGV[2])
+return missing
+"""
+
+# Запись в БД не удалась - разница снова считается несверенной
+RESTORE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'synced', -tonumber(ARGV[1]))
+redis.call('SADD', KEYS[2], ARGV[2])
+return 1
+"""
+
+# Удалить квоту (сменилась подписка или лимиты), вернув несверенную разницу
+DRAIN_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'used', 'synced', 'sub')
+redis.call('DEL', KEYS[1])
+redis.call('SREM', KEYS[2], ARGV[1])
+if not state[1] then
+    return nil
+end
+return {tonumber(state[1]) - tonumber(state[2]), state[3]}
+"""
+
+REFUND_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HINCRBY', KEYS[1], 'used', -tonumber(ARGV[1]))
+end
+return 1
+"""
+
+
+class QuotaStoreUnavailable(Exception):
+    """Хранилище квот не отвечает - проверка идет через БД"""
+
+
+class RedisQuotaStore:
+    """Квоты в Redis: quota:<user_id> -> hash состояния, quota:dirty -> кого сверить с БД.
+
+    Проверка и списание - один Lua скрипт, атомарно для всех воркеров и машин.
+    """
+
+    def __init__(self, client, prefix='quota:', ttl=86400):
+        import redis
+
+        self.redis = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.dirty_key = f'{prefix}dirty'
+        self._errors = redis.RedisError
+        self._consume = client.register_script(CONSUME_SCRIPT)
+        self._seed = client.register_script(SEED_SCRIPT)
+        self._take = client.register_script(TAKE_SCRIPT)
+        self._sync = client.register_script(SYNC_SCRIPT)
+        self._restore = client.register_script(RESTORE_SCRIPT)
+        self._drain = client.register_script(DRAIN_SCRIPT)
+        self._refund = client.register_script(REFUND_SCRIPT)
+
+    def _call(self, script, user_id, *args, dirty=False):
+        keys = [f'{self.prefix}{user_id}'] + ([self.dirty_key] if dirty else [])
+        try:
+            return script(keys=keys, args=list(args))
+        except self._errors as e:
+            raise QuotaStoreUnavailable(str(e)) from e
+
+    def consume(self, user_id, quantities, cycle):
+        """(id подписки, [списано ли событие]) или None - квота не загружена"""
+        result = self._call(self._consume, user_id, cycle, self.ttl, user_id, *quantities, dirty=True)
+        if result is None:
+            return None
+        sub, accepted = result
+        return int(sub), [bool(flag) for flag in accepted]
+
+    def seed(self, user_id, limit, used, sub, cycle):
+        self._call(self._seed, user_id, limit, used, sub, cycle, self.ttl)
+
+    def take(self, user_id):
+        result = self._call(self._take, user_id)
+        return None if result is None else (int(result[0]), int(result[1]))
+
+    def sync(self, user_id, db_used, limit):
+        return int(self._call(self._sync, user_id, db_used, limit))
+
+    def restore(self, user_id, delta):
+        return bool(self._call(self._restore, user_id, delta, user_id, dirty=True))
+
+    def drain(self, user_id):
+        result = self._call(self._drain, user_id, user_id, dirty=True)
+        return None if result is None else (int(result[0]), int(result[1]))
+
+    def refund(self, user_id, quantity):
+        self._call(self._refund, user_id, quantity)
+
+    def mark_dirty(self, user_ids):
+        try:
+            self.redis.sadd(self.dirty_key, *user_ids)
+        except self._errors as e:
+            raise QuotaStoreUnavailable(str(e)) from e
+
+    def pop_dirty(self, count):
+        try:
+            return [int(user_id) for user_id in self.redis.spop(self.dirty_key, count) or []]
+        except self._errors as e:
+            raise QuotaStoreUnavailable(str(e)) from e
+
+
+class MemoryQuotaStore:
+    """Квоты в памяти процесса с той же семантикой, что у скриптов Redis (тесты, локальный запуск).
+
+    TTL не учитывается.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def consume(self, user_id, quantities, cycle):
+        with self._lock:
+            state = self._data.get(user_id)
+            if state is None:
+                return None
+            if state['cycle'] and state['cycle'] != cycle:
+                del self._data[user_id]
+                return None
+            accepted = []
+            for quantity in quantities:
+                accepted.append(state['used'] + quantity <= state['limit'])
+                if accepted[-1]:
+                    state['used'] += quantity
+            if state['sub'] and any(accepted):
+                self._dirty.add(user_id)
+            return state['sub'], accepted
+
+    def seed(self, user_id, limit, used, sub, cycle):
+        with self._lock:
+            self._data.setdefault(user_id, {'limit': limit, 'used': used, 'synced': used, 'sub': sub, 'cycle': cycle})
+
+    def take(self, user_id):
+        with self._lock:
+            state = self._data.get(user_id)
+            if state is None:
+                return None
+            delta, state['synced'] = state['used'] - state['synced'], state['used']
+            return delta, state['sub']
+
+    def sync(self, user_id, db_used, limit):
+        with self._lock:
+            state = self._data.get(user_id)
+            if state is None:
+                return 0
+            missing = db_used - state['synced']
+            if missing > 0:
+                state['used'] += missing
+                state['synced'] += missing
+            state['limit'] = limit
+            return missing
+
+    def restore(self, user_id, delta):
+        with self._lock:
+            state = self._data.get(user_id)
+            if state is None:
+                return False
+            state['synced'] -= delta
+            self._dirty.add(user_id)
+            return True
+
+    def drain(self, user_id):
+        with self._lock:
+            self._dirty.discard(user_id)
+            state = self._data.pop(user_id, None)
+            return None if state is None else (state['used'] - state['synced'], state['sub'])
+
+    def refund(self, user_id, quantity):
+        with self._lock:
+            state = self._data.get(user_id)
+            if state is not None:
+                state['used'] -= quantity
+
+    def mark_dirty(self, user_ids):
+        with self._lock:
+            self._dirty.update(user_ids)
+
+    def pop_dirty(self, count):
+        with self._lock:
+            popped = [self._dirty.pop() for _ in range(min(count, len(self._dirty)))]
+        return popped
+
+
+def current_cycle():
+    """Цикл бесплатной квоты - календарный месяц"""
+    return datetime.utcnow().strftime('%Y%m')
+
+
+def cycle_start():
+    """Начало текущего цикла бесплатной квоты (UTC)"""
+    return datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+class QuotaEngine:
+    """Квота сообщений без обращения к БД на каждое событие.
+
+    Счетчики лежат в Redis, проверка и списание - один скрипт. Квота загружается из
+    SubscriptionPlan и UsageLimit при первом обращении, списанное записывается в
+    UserSubscription.messages_used_this_cycle и UsageLimit.current_usage фоновой
+    сверкой раз в reconcile_interval секунд. Пока Redis недоступен, consume возвращает
+    None и проверка идет прежним путем через БД; такие пользователи сверяются
+    заново, когда Redis вернется.
+    """
+
+    def __init__(self):
+        self.store = None
+        self.app = None
+        self.retry_seconds = 5.0
+        self.reconcile_interval = 30.0
+        self.reconcile_batch = 1000
+        self._down_until = 0.0
+        self._stale = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        backend = app.config['QUOTA_BACKEND']
+        if backend == 'redis':
+            import redis
+            client = redis.Redis.from_url(app.config['QUOTA_REDIS_URL'],
+                                          socket_timeout=app.config['QUOTA_REDIS_TIMEOUT'],
+                                          socket_connect_timeout=app.config['QUOTA_REDIS_TIMEOUT'])
+            self.store = RedisQuotaStore(client, app.config['QUOTA_KEY_PREFIX'], app.config['QUOTA_KEY_TTL'])
+        elif backend == 'memory':
+            self.store = MemoryQuotaStore()
+        elif backend != 'off':
+            raise ValueError(f"Unknown QUOTA_BACKEND: {backend}")
+        self.app = app
+        self.retry_seconds = app.config['QUOTA_RETRY_SECONDS']
+        self.reconcile_interval = app.config['QUOTA_RECONCILE_INTERVAL']
+
+    def _available(self):
+        return self.store is not None and time.monotonic() >= self._down_until
+
+    def _store_failed(self, user_id, error):
+        if time.monotonic() >= self._down_until:
+            logger.warning(f"Quota store unavailable, falling back to the database for {self.retry_seconds}s: {error}")
+        self._down_until = time.monotonic() + self.retry_seconds
+        with self._lock:
+            self._stale.add(user_id)
+
+    def consume(self, user_id, quantity):
+        """Проверить и списать квоту сообщений.
+
+        Возвращает id подписки (0 - бесплатный пользователь) или None, если хранилище
+        недоступно и проверять нужно через БД. Квота исчерпана - ValueError.
+        """
+        result = self.consume_many(user_id, [quantity])
+        if result is None:
+            return None
+        sub, accepted = result
+        if not accepted[0]:
+            raise ValueError("Monthly message limit exceeded" if sub else "Free user monthly message limit exceeded")
+        return sub
+
+    def consume_many(self, user_id, quantities):
+        """Списать квоту для нескольких событий за одно обращение к Redis.
+
+        События проверяются по порядку, как при отдельных вызовах consume. Возвращает
+        (id подписки, [списано ли событие]) или None, если проверять нужно через БД.
+        """
+        if not self._available():
+            if self.store is not None:
+                with self._lock:
+                    self._stale.add(user_id)
+                quota_checks_total.labels('fallback').inc(len(quantities))
+            return None
+
+        cycle = current_cycle()
+        try:
+            result = self.store.consume(user_id, quantities, cycle)
+            if result is None:
+                limit, used, sub, seed_cycle = self._load(user_id)
+                self.store.seed(user_id, limit, used, sub, seed_cycle)
+                result = self.store.consume(user_id, quantities, cycle)
+        except QuotaStoreUnavailable as e:
+            self._store_failed(user_id, e)
+            quota_checks_total.labels('fallback').inc(len(quantities))
+            return None
+        self._ensure_thread()
+
+        sub, accepted = result
+        allowed = sum(accepted)
+        if allowed:
+            quota_checks_total.labels('allowed').inc(allowed)
+        if allowed < len(accepted):
+            quota_checks_total.labels('exceeded').inc(len(accepted) - allowed)
+        return result
+
+    def refund(self, user_id, quantity):
+        """Вернуть списанное, если событие не записалось"""
+        try:
+            self.store.refund(user_id, quantity)
+        except QuotaStoreUnavailable as e:
+            self._store_failed(user_id, e)
+
+    def _load(self, user_id):
+        """(лимит, использовано, id подписки, цикл) из БД"""
+        subscriptions = UserSubscription.__table__
+        plans = SubscriptionPlan.__table__
+        # Чтение с primary: на реплике использование может отставать
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                select(subscriptions.c.id, subscriptions.c.messages_used_this_cycle,
+                       subscriptions.c.plan_id, plans.c.max_messages_per_month)
+                .join_from(subscriptions, plans, plans.c.id == subscriptions.c.plan_id)
+                .where(subscriptions.c.user_id == user_id, subscriptions.c.status.in_(ACTIVE_STATUSES))
+                .order_by(subscriptions.c.id).limit(1)
+            ).first()
+            if row is None:
+                from services.subscription_service import subscription_service
+
+                trackers = UsageTracker.__table__
+                # Та же единица, что и в consume: сумма quantity, а не число строк
+                used = conn.execute(
+                    select(func.coalesce(func.sum(trackers.c.quantity), 0)).where(
+                        trackers.c.user_id == user_id,
+                        trackers.c.usage_type == UsageType.MESSAGE,
+                        trackers.c.created_at >= cycle_start()
+                    )
+                ).scalar()
+                return subscription_service._get_free_user_limits()['messages']['limit'], used, 0, current_cycle()
+
+            subscription_id, used, plan_id, plan_limit = row
+            limit = self.message_limit(conn, user_id, subscription_id, plan_id, plan_limit)
+            return limit, used or 0, subscription_id, ''
+
+    def message_limit(self, conn, user_id, subscription_id, plan_id, plan_limit):
+        """Лимит плана с учетом индивидуальных лимитов пользователя (берется меньший).
+
+        Тот же лимит проверяет track_usage, пока Redis недоступен
+        """
+        limits = UsageLimit.__table__
+        result = plan_limit or 0
+        for value, is_hard in conn.execute(
+            select(limits.c.limit_value, limits.c.is_hard_limit)
+            .where(*self._usage_limit_filter(user_id, subscription_id, plan_id))
+        ):
+            if value == -1:
+                continue
+            # Мягкий лимит можно превысить на 10% (как в UsageLimit.is_limit_reached)
+            result = min(result, value if is_hard else int(value * 1.1))
+        return result
+
+    def _usage_limit_filter(self, user_id, subscription_id, plan_id):
+        # Лимиты, созданные для прежнего плана подписки, после смены плана не действуют
+        limits = UsageLimit.__table__
+        return (
+            limits.c.user_id == user_id,
+            limits.c.is_active.is_(True),
+            limits.c.limit_type == LimitType.MESSAGES_PER_MONTH,
+            or_(limits.c.subscription_id == subscription_id, limits.c.subscription_id.is_(None)),
+            or_(limits.c.plan_id == plan_id, limits.c.plan_id.is_(None))
+        )
+
+    def _apply(self, conn, user_id, subscription_id, delta):
+        """Записать списанное в БД. Возвращает (использовано, статус, id плана, лимит плана) подписки"""
+        subscriptions = UserSubscription.__table__
+        plans = SubscriptionPlan.__table__
+        now = datetime.utcnow()
+        if delta:
+            conn.execute(
+                update(subscriptions).where(subscriptions.c.id == subscription_id)
+                .values(messages_used_this_cycle=func.coalesce(subscriptions.c.messages_used_this_cycle, 0) + delta,
+                        updated_at=now)
+            )
+        row = conn.execute(
+            select(subscriptions.c.messages_used_this_cycle, subscriptions.c.status,
+                   subscriptions.c.plan_id, plans.c.max_messages_per_month)
+            .join_from(subscriptions, plans, plans.c.id == subscriptions.c.plan_id)
+            .where(subscriptions.c.id == subscription_id)
+        ).first()
+        if delta and row is not None:
+            self.apply_limit_usage(conn, user_id, subscription_id, row.plan_id, delta, now)
+        return row
+
+    def apply_limit_usage(self, conn, user_id, subscription_id, plan_id, delta, now=None):
+        """Увеличить UsageLimit.current_usage лимитов сообщений подписки"""
+        limits = UsageLimit.__table__
+        conn.execute(
+            update(limits).where(*self._usage_limit_filter(user_id, subscription_id, plan_id))
+            .values(current_usage=func.coalesce(limits.c.current_usage, 0) + delta,
+                    updated_at=now or datetime.utcnow())
+        )
+
+    def invalidate(self, user_id, apply=True):
+        """Сбросить квоту пользователя в Redis, записав несверенное в БД (apply=False - отбросить)"""
+        if self.store is None:
+            return
+        try:
+            drained = self.store.drain(user_id)
+        except QuotaStoreUnavailable as e:
+            self._store_failed(user_id, e)
+            return
+        if drained is None:
+            return
+        delta, subscription_id = drained
+        if apply and delta and subscription_id:
+            with db.engine.begin() as conn:
+                self._apply(conn, user_id, subscription_id, delta)
+
+    def reconcile(self, batch=None):
+        """Записать списанное в БД для пользователей из quota:dirty. Возвращает число сверенных"""
+        if not self._available():
+            return 0
+        with self._lock:
+            stale, self._stale = self._stale, set()
+        try:
+            if stale:
+                self.store.mark_dirty(stale)
+            user_ids = self.store.pop_dirty(batch or self.reconcile_batch)
+        except QuotaStoreUnavailable as e:
+            with self._lock:
+                self._stale.update(stale)
+            self._down_until = time.monotonic() + self.retry_seconds
+            logger.warning(f"Quota reconciliation skipped: {e}")
+            return 0
+
+        done = 0
+        for user_id in user_ids:
+            try:
+                self._reconcile_user(user_id)
+                done += 1
+            except QuotaStoreUnavailable as e:
+                self._store_failed(user_id, e)
+                break
+            except Exception as e:
+                logger.error(f"Failed to reconcile quota for user {user_id}: {e}")
+        return done
+
+    def _reconcile_user(self, user_id):
+        taken = self.store.take(user_id)
+        if taken is None:
+            return
+        delta, subscription_id = taken
+        if not subscription_id:
+            # Бесплатная квота считается по строкам трекера - просто перечитать ее из БД
+            self.store.drain(user_id)
+            return
+
+        try:
+            with db.engine.begin() as conn:
+                row = self._apply(conn, user_id, subscription_id, delta)
+                if row is not None:
+                    used, status, plan_id, plan_limit = row
+                    limit = self.message_limit(conn, user_id, subscription_id, plan_id, plan_limit)
+        except Exception:
+            self.store.restore(user_id, delta)
+            raise
+
+        if row is None or status not in ACTIVE_STATUSES:
+            self.invalidate(user_id)
+        else:
+            self.store.sync(user_id, used or 0, limit)
+
+    def _ensure_thread(self):
+        # Поток сверки свой в каждом воркере (после fork его нет)
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='quota-reconcile', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.reconcile_interval)
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    while self.reconcile() >= self.reconcile_batch:
+                        pass
+            except Exception as e:
+                logger.error(f"Quota reconciliation error: {e}")
+
+
+quota_engine = QuotaEngine()
+
+
+# Подписка или лимиты изменились - квота в Redis перечитывается из БД после коммита
+@event.listens_for(UserSubscription, 'after_insert')
+@event.listens_for(UserSubscription, 'after_update')
+def _collect_subscription_change(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes()
+               for name in ('status', 'plan_id', 'messages_used_this_cycle')):
+        return
+    session = state.session
+    if session is not None:
+        # Счетчик сброшен (продление) - несверенное списание относится к прошлому циклу
+        reset = state.attrs.messages_used_this_cycle.history.has_changes()
+        pending = session.info.setdefault('quota_changed', {})
+        pending[target.user_id] = pending.get(target.user_id, True) and not reset
+
+
+@event.listens_for(UsageLimit, 'after_insert')
+@event.listens_for(UsageLimit, 'after_update')
+@event.listens_for(UsageLimit, 'after_delete')
+def _collect_limit_change(mapper, connection, target):
+    if target.limit_type != LimitType.MESSAGES_PER_MONTH:
+        return
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault('quota_changed', {}).setdefault(target.user_id, True)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _invalidate_quotas(session):
+    changed = session.info.pop('quota_changed', None)
+    for user_id, apply in (changed or {}).items():
+        try:
+            quota_engine.invalidate(user_id, apply)
+        except Exception as e:
+            logger.error(f"Failed to invalidate quota for user {user_id}: {e}")
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _drop_quota_changes(session):
+    session.info.pop('quota_changed', None)
+
+
+def register_quota_commands(app):
+    """flask reconcile-quotas - записать списанные в Redis квоты в БД"""
+
+    @app.cli.command('reconcile-quotas')
+    @click.option('--batch', type=int, default=None, help='Пользователей за проход')
+    def reconcile_quotas(batch):
+        total = 0
+        while True:
+            done = quota_engine.reconcile(batch)
+            total += done
+            if done < (batch or quota_engine.reconcile_batch):
+                break
+        click.echo(f"Reconciled quotas for {total} users")
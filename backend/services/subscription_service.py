@@ -1,11 +1,32 @@
-from models.models_all_rout_imp import *
+from models.models_all_rout_imp import (
+    SubscriptionPlan, UserSubscription, SubscriptionStatus, SubscriptionFeature, SubscriptionHistory, HistoryAction,
+    UsageLimit, LimitType, UsageTracker, UsageType
+)
 from models.users.main_user_db import User
 from utils.logs_service import init_logger
+from utils.tracing import traced
+from utils.metrics import usage_tracked_total
+from services.quota_engine import quota_engine, cycle_start
 from datetime import datetime, timedelta
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, select, insert, update, func, text
 import traceback
 from models.imp import db
 
+# usage_type -> (счетчик в user_subscriptions, лимит в subscription_plans, тип трекера, ошибка)
+USAGE_COUNTERS = {
+    'messages': ('messages_used_this_cycle', 'max_messages_per_month', UsageType.MESSAGE, "Monthly message limit exceeded"),
+    'bots': ('bots_created', 'max_bots', UsageType.BOT_CREATION, "Bot creation limit exceeded"),
+    'storage': ('storage_used_mb', 'max_storage_mb', UsageType.STORAGE_UPLOAD, "Storage limit exceeded"),
+}
+TRACKER_TYPES = {usage_type: counter[2] for usage_type, counter in USAGE_COUNTERS.items()}
+FREE_USAGE_ERRORS = {
+    'messages': "Free user monthly message limit exceeded",
+    'bots': "Free user bot creation limit exceeded",
+}
+
+# Ключ advisory lock для подсчета использования бесплатных пользователей
+FREE_USAGE_LOCK_KEY = 7300119
+
 
 class SubscriptionService:
     """Сервис для управления подписками"""
@@ -46,6 +67,7 @@ class SubscriptionService:
         
         return query.order_by(SubscriptionPlan.sort_order, SubscriptionPlan.price).all()
     
+    @traced()
     def assign_subscription_to_user(self, user_id, plan_id, billing_cycle='monthly', start_trial=False):
         """Назначить подписку пользователю"""
         try:
@@ -202,6 +224,7 @@ class SubscriptionService:
             self.logger.error(f"Error renewing subscription: {str(e)}")
             raise
     
+    @traced()
     def check_and_update_subscription_status(self, user_id):
         """Проверить и обновить статус подписки пользователя"""
         try:
@@ -236,45 +259,92 @@ class SubscriptionService:
             self.logger.error(f"Error checking subscription status: {str(e)}")
             raise
     
+    def _active_subscription_id(self, user_id):
+        """Подзапрос id активной подписки - та же строка, что вернет get_user_active_subscription"""
+        subscriptions = UserSubscription.__table__
+        return select(subscriptions.c.id).where(
+            subscriptions.c.user_id == user_id,
+            subscriptions.c.status.in_([SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIAL])
+        ).order_by(subscriptions.c.id).limit(1).scalar_subquery()
+    
+    @traced()
     def track_usage(self, user_id, usage_type, quantity=1, resource_id=None, metadata=None):
-        """Отследить использование ресурсов"""
+        """Отследить использование ресурсов.
+
+        Проверка лимита и увеличение счетчика - один условный UPDATE ... RETURNING,
+        запись в трекер - в той же транзакции. Параллельные запросы не могут
+        превысить лимит: строка подписки блокируется на время UPDATE.
+        """
         try:
-            subscription = self.get_user_active_subscription(user_id)
-            if not subscription:
-                # Проверить лимиты для бесплатного пользователя
-                return self._track_free_user_usage(user_id, usage_type, quantity, resource_id, metadata)
-            
-            # Проверить лимиты подписки
-            plan = subscription.plan
-            
             if usage_type == 'messages':
-                if subscription.messages_used_this_cycle + quantity > plan.max_messages_per_month:
-                    raise ValueError("Monthly message limit exceeded")
-                subscription.update_usage('messages', quantity)
-            
-            elif usage_type == 'bots':
-                if subscription.bots_created >= plan.max_bots:
-                    raise ValueError("Bot creation limit exceeded")
-                subscription.update_usage('bots', quantity)
-            
-            elif usage_type == 'storage':
-                if subscription.storage_used_mb + quantity > plan.max_storage_mb:
-                    raise ValueError("Storage limit exceeded")
-                subscription.update_usage('storage', quantity)
-            
-            # Записать в трекер использования
+                # Квота сообщений проверяется в Redis; None - Redis недоступен, проверка в БД ниже
+                subscription_id = quota_engine.consume(user_id, quantity)
+                if subscription_id is not None:
+                    return self._track_consumed_usage(user_id, subscription_id, usage_type, quantity,
+                                                      resource_id, metadata)
+            
+            usage = USAGE_COUNTERS.get(usage_type)
+            if usage is None:
+                # Для прочих типов лимитов нет - только запись в трекер
+                subscription = self.get_user_active_subscription(user_id)
+                if not subscription:
+                    return self._track_free_user_usage(user_id, usage_type, quantity, resource_id, metadata)
+                subscription_id = subscription.id
+            else:
+                counter, plan_limit, tracker_type, error = usage
+                subscriptions = UserSubscription.__table__
+                plans = SubscriptionPlan.__table__
+                used = subscriptions.c[counter]
+                subscription_filter = subscriptions.c.id == self._active_subscription_id(user_id)
+                limit = plans.c[plan_limit]
+                if usage_type == 'messages':
+                    # Тот же лимит, что в quota_engine: меньший из плана и UsageLimit пользователя
+                    active = db.session.execute(
+                        select(subscriptions.c.id, subscriptions.c.plan_id, plans.c.max_messages_per_month)
+                        .join_from(subscriptions, plans, plans.c.id == subscriptions.c.plan_id)
+                        .where(subscriptions.c.id == self._active_subscription_id(user_id))
+                    ).first()
+                    if active is not None:
+                        subscription_filter = subscriptions.c.id == active.id
+                        limit = quota_engine.message_limit(db.session, user_id, *active)
+                row = db.session.execute(
+                    update(subscriptions)
+                    .where(
+                        subscription_filter,
+                        plans.c.id == subscriptions.c.plan_id,
+                        func.coalesce(used, 0) + quantity <= limit
+                    )
+                    .values({counter: func.coalesce(used, 0) + quantity, 'updated_at': datetime.utcnow()})
+                    .returning(subscriptions.c.id, subscriptions.c.plan_id)
+                ).first()
+
+                if row is None:
+                    db.session.rollback()
+                    # Лимит исчерпан или подписки нет - различаем только на этом, редком, пути
+                    if not self.get_user_active_subscription(user_id):
+                        return self._track_free_user_usage(user_id, usage_type, quantity, resource_id, metadata)
+                    raise ValueError(error)
+                subscription_id = row.id
+                if usage_type == 'messages':
+                    # Счетчики те же, что пишет сверка quota_engine
+                    quota_engine.apply_limit_usage(db.session, user_id, subscription_id, row.plan_id, quantity)
+
             UsageTracker.track_usage(
                 user_id=user_id,
-                subscription_id=subscription.id,
-                usage_type=UsageType.MESSAGE if usage_type == 'messages' else UsageType.BOT_CREATION,
+                subscription_id=subscription_id,
+                usage_type=TRACKER_TYPES.get(usage_type, UsageType.BOT_CREATION),
                 quantity=quantity,
                 resource_id=resource_id,
-                metadata=metadata
+                extra_data=metadata,
+                commit=False
             )
+            db.session.commit()
             
+            usage_tracked_total.labels(usage_type).inc(quantity)
             return True
             
         except Exception as e:
+            db.session.rollback()
             self.logger.error(f"Error tracking usage: {str(e)}")
             raise
     
@@ -391,42 +461,178 @@ class SubscriptionService:
         
         db.session.commit()
     
+    @traced()
+    def track_usage_batch(self, user_id, events, chunk_size=500):
+        """Отследить пачку событий одного пользователя.
+
+        Квота проверяется один раз на тип использования для всех событий сразу (в Redis
+        или под одной блокировкой строки подписки), события проверяются по порядку, как
+        при отдельных вызовах track_usage. Строки трекера вставляются по chunk_size
+        одним INSERT, все в одной транзакции со счетчиками подписки.
+        Возвращает для каждого события None (записано) или текст ошибки.
+        """
+        errors = [None] * len(events)
+        by_type = {}
+        for index, event in enumerate(events):
+            by_type.setdefault(event['usage_type'], []).append(index)
+        
+        rows = []
+        tracked = {}
+        consumed = 0  # списано в Redis - вернуть, если запись не удалась
+        try:
+            for usage_type, indices in by_type.items():
+                quantities = [events[index]['quantity'] for index in indices]
+                subscription_id, accepted, in_quota_engine = self._reserve_usage(user_id, usage_type, quantities)
+                if in_quota_engine:
+                    consumed += sum(quantity for quantity, ok in zip(quantities, accepted) if ok)
+                
+                for index, ok in zip(indices, accepted):
+                    if not ok:
+                        errors[index] = USAGE_COUNTERS[usage_type][3] if subscription_id else FREE_USAGE_ERRORS[usage_type]
+                        continue
+                    event = events[index]
+                    tracked[usage_type] = tracked.get(usage_type, 0) + event['quantity']
+                    rows.append({
+                        'user_id': user_id,
+                        'subscription_id': subscription_id or None,
+                        'usage_type': TRACKER_TYPES[usage_type],
+                        'quantity': event['quantity'],
+                        'resource_id': event.get('resource_id'),
+                        'extra_data': event.get('metadata'),
+                    })
+            
+            for start in range(0, len(rows), chunk_size):
+                db.session.execute(insert(UsageTracker.__table__), rows[start:start + chunk_size])
+            db.session.commit()
+            
+        except Exception as e:
+            db.session.rollback()
+            if consumed:
+                quota_engine.refund(user_id, consumed)
+            self.logger.error(f"Error tracking usage batch: {str(e)}")
+            raise
+        
+        for usage_type, quantity in tracked.items():
+            usage_tracked_total.labels(usage_type).inc(quantity)
+        return errors
+    
+    def _reserve_usage(self, user_id, usage_type, quantities):
+        """Списать лимит для событий одного типа. Возвращает (id подписки или 0, [списано ли], списано ли в Redis)"""
+        if usage_type == 'messages':
+            reserved = quota_engine.consume_many(user_id, quantities)
+            if reserved is not None:
+                return reserved + (True,)
+        
+        counter, plan_limit = USAGE_COUNTERS[usage_type][:2]
+        subscriptions = UserSubscription.__table__
+        plans = SubscriptionPlan.__table__
+        # Строка подписки заблокирована до коммита пачки - параллельные запросы ждут
+        row = db.session.execute(
+            select(subscriptions.c.id, subscriptions.c[counter], plans.c[plan_limit])
+            .join_from(subscriptions, plans, plans.c.id == subscriptions.c.plan_id)
+            .where(
+                subscriptions.c.user_id == user_id,
+                subscriptions.c.status.in_([SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIAL])
+            )
+            .order_by(subscriptions.c.id).limit(1)
+            .with_for_update(of=subscriptions)
+        ).first()
+        if row is None:
+            return 0, self._reserve_free_usage(user_id, usage_type, quantities), False
+        
+        subscription_id, used, limit = row
+        used = used or 0
+        accepted = []
+        for quantity in quantities:
+            accepted.append(limit is not None and used + quantity <= limit)
+            if accepted[-1]:
+                used += quantity
+        
+        total = sum(quantity for quantity, ok in zip(quantities, accepted) if ok)
+        if total:
+            db.session.execute(
+                update(subscriptions).where(subscriptions.c.id == subscription_id)
+                .values({counter: func.coalesce(subscriptions.c[counter], 0) + total, 'updated_at': datetime.utcnow()})
+            )
+        return subscription_id, accepted, False
+    
+    def _track_consumed_usage(self, user_id, subscription_id, usage_type, quantity, resource_id, metadata):
+        """Записать событие, квота которого уже списана в Redis. Счетчик подписки обновит сверка"""
+        try:
+            UsageTracker.track_usage(
+                user_id=user_id,
+                subscription_id=subscription_id or None,
+                usage_type=TRACKER_TYPES[usage_type],
+                quantity=quantity,
+                resource_id=resource_id,
+                extra_data=metadata
+            )
+        except Exception:
+            db.session.rollback()
+            quota_engine.refund(user_id, quantity)
+            raise
+        
+        usage_tracked_total.labels(usage_type).inc(quantity)
+        return True
+    
     def _track_free_user_usage(self, user_id, usage_type, quantity, resource_id, metadata):
         """Отследить использование для бесплатного пользователя"""
+        if not self._reserve_free_usage(user_id, usage_type, [quantity])[0]:
+            raise ValueError(FREE_USAGE_ERRORS[usage_type])
+        
+        # Записать использование
+        UsageTracker.track_usage(
+            user_id=user_id,
+            usage_type=TRACKER_TYPES.get(usage_type, UsageType.BOT_CREATION),
+            quantity=quantity,
+            resource_id=resource_id,
+            extra_data=metadata,
+            commit=False
+        )
+        db.session.commit()
+        
+        usage_tracked_total.labels(usage_type).inc(quantity)
+        return True
+    
+    def _reserve_free_usage(self, user_id, usage_type, quantities):
+        """Проверить лимиты бесплатного пользователя для событий по порядку. Возвращает [проходит ли событие]"""
         free_limits = self._get_free_user_limits()
         
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # Подсчет и вставка для одного пользователя идут по очереди до конца транзакции
+            db.session.execute(text("SELECT pg_advisory_xact_lock(:key, :user_id)"),
+                               {'key': FREE_USAGE_LOCK_KEY, 'user_id': user_id})
+        
         if usage_type == 'messages':
+            # Сообщения считаются суммой quantity - как в quota_engine
             limit = free_limits['messages']['limit']
-            used = UsageTracker.query.filter_by(
-                user_id=user_id,
-                usage_type=UsageType.MESSAGE
-            ).filter(
-                UsageTracker.created_at >= datetime.utcnow().replace(day=1, hour=0, minute=0, second=0)
-            ).count()
-            
-            if used + quantity > limit:
-                raise ValueError("Free user monthly message limit exceeded")
+            used = db.session.query(func.coalesce(func.sum(UsageTracker.quantity), 0)).filter(
+                UsageTracker.user_id == user_id,
+                UsageTracker.usage_type == UsageType.MESSAGE,
+                UsageTracker.created_at >= cycle_start()
+            ).scalar()
+            exceeded = lambda quantity: used + quantity > limit
+            step = lambda quantity: quantity
         
         elif usage_type == 'bots':
+            # Боты считаются по строкам трекера (одна строка - одно создание)
             limit = free_limits['bots']['limit']
             used = UsageTracker.query.filter_by(
                 user_id=user_id,
                 usage_type=UsageType.BOT_CREATION
             ).count()
-            
-            if used + quantity >= limit:
-                raise ValueError("Free user bot creation limit exceeded")
+            exceeded = lambda quantity: used + quantity >= limit
+            step = lambda quantity: 1
         
-        # Записать использование
-        UsageTracker.track_usage(
-            user_id=user_id,
-            usage_type=UsageType.MESSAGE if usage_type == 'messages' else UsageType.BOT_CREATION,
-            quantity=quantity,
-            resource_id=resource_id,
-            metadata=metadata
-        )
+        else:
+            return [True] * len(quantities)
         
-        return True
+        accepted = []
+        for quantity in quantities:
+            accepted.append(not exceeded(quantity))
+            if accepted[-1]:
+                used += step(quantity)
+        return accepted
     
     def _get_free_user_limits(self):
         """Получить лимиты для бесплатного пользователя"""
@@ -1,6 +1,9 @@
 from models.models_all_rout_imp import Transaction, TransactionStatus, TransactionType, PaymentMethod
 from models.users.main_user_db import User
 from utils.logs_service import init_logger
+from utils.tracing import traced
+from utils.db_routing import read_only
+from utils.metrics import transactions_processed_total
 from datetime import datetime, timedelta
 from sqlalchemy import and_, or_
 import uuid
@@ -13,6 +16,7 @@ class TransactionService:
     def __init__(self):
         self.logger = init_logger('transaction_service')
     
+    @traced()
     def create_transaction(self, user_id, subscription_plan_id, amount, currency='USD', 
                           billing_cycle='monthly', payment_method=PaymentMethod.CREDIT_CARD,
                           metadata=None):
@@ -48,6 +52,7 @@ class TransactionService:
             self.logger.error(f"Error creating transaction: {str(e)}")
             raise
     
+    @traced()
     def process_transaction(self, transaction_id, payment_data=None):
         """Обработать транзакцию"""
         try:
@@ -80,10 +85,12 @@ class TransactionService:
                     start_trial=False
                 )
                 
+                transactions_processed_total.labels('completed').inc()
                 self.logger.info(f"Transaction {transaction_id} completed successfully")
                 
             else:
                 transaction.set_failed("Payment processing failed")
+                transactions_processed_total.labels('failed').inc()
                 self.logger.warning(f"Transaction {transaction_id} failed")
             
             return transaction
@@ -93,6 +100,7 @@ class TransactionService:
             self.logger.error(f"Error processing transaction: {str(e)}")
             raise
     
+    @traced()
     def refund_transaction(self, transaction_id, amount=None, reason=None):
         """Вернуть транзакцию"""
         try:
@@ -155,11 +163,9 @@ class TransactionService:
         """Получить транзакцию по внешнему ID"""
         return Transaction.query.filter_by(external_id=external_id).first()
     
-    def get_user_transactions(self, user_id, limit=50, offset=0):
-        """Получить транзакции пользователя"""
-        return Transaction.query.filter_by(user_id=user_id).order_by(
-            Transaction.created_at.desc()
-        ).limit(limit).offset(offset).all()
+    def get_user_transactions(self, user_id, limit=50, offset=0, after=None):
+        """Получить транзакции пользователя (after=(created_at, id) - keyset пагинация)"""
+        return Transaction.get_user_transactions(user_id, limit=limit, offset=offset, after=after)
     
     def get_user_transaction_stats(self, user_id):
         """Получить статистику транзакций пользователя"""
@@ -167,11 +173,12 @@ class TransactionService:
         
         stats = db.session.query(
             func.count(Transaction.id).label('total_transactions'),
-            func.sum(case([(Transaction.status == TransactionStatus.COMPLETED, Transaction.amount)], else_=0)).label('total_spent'),
-            func.sum(case([(Transaction.status == TransactionStatus.REFUNDED, Transaction.refund_amount)], else_=0)).label('total_refunded'),
-            func.count(case([(Transaction.status == TransactionStatus.COMPLETED, 1)])).label('successful_transactions'),
-            func.count(case([(Transaction.status == TransactionStatus.FAILED, 1)])).label('failed_transactions'),
-            func.count(case([(Transaction.status == TransactionStatus.REFUNDED, 1)])).label('refunded_transactions')
+            func.sum(case((Transaction.status == TransactionStatus.COMPLETED, Transaction.amount), else_=0)).label('total_spent'),
+            # Возврат всегда на всю сумму транзакции (mark_as_refunded), отдельной колонки суммы возврата нет
+            func.sum(case((Transaction.status == TransactionStatus.REFUNDED, Transaction.amount), else_=0)).label('total_refunded'),
+            func.count(case((Transaction.status == TransactionStatus.COMPLETED, 1))).label('successful_transactions'),
+            func.count(case((Transaction.status == TransactionStatus.FAILED, 1))).label('failed_transactions'),
+            func.count(case((Transaction.status == TransactionStatus.REFUNDED, 1))).label('refunded_transactions')
         ).filter_by(user_id=user_id).first()
         
         return {
@@ -198,6 +205,7 @@ class TransactionService:
         
         return query.order_by(Transaction.created_at.desc()).limit(limit).all()
     
+    @read_only
     def get_revenue_stats(self, start_date, end_date):
         """Получить статистику доходов"""
         from sqlalchemy import func
@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Config читает окружение при импорте, поэтому оно выставляется до импорта приложения:
+# SQLite вместо PostgreSQL и хранилища в памяти вместо Redis
+TEST_DIR = tempfile.mkdtemp(prefix='backend-tests-')
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}",
+    'SESSION_BACKEND': 'memory',
+    'QUOTA_BACKEND': 'memory',
+    'RATELIMIT_STORAGE_URI': 'memory://',
+    'USER_STATUS_STREAM_BACKEND': 'memory',
+    'ACCOUNT_DELETION_WORKER_ENABLED': 'false',
+    'PASSWORD_HASH_WORKERS': '0',
+    'PROFILE_DIR': os.path.join(TEST_DIR, 'profiles'),
+})
+os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+os.environ.pop('DATABASE_REPLICA_URL', None)
+
+# logs/ создается в текущей папке при импорте utils.logs_service - не засоряем backend/
+os.chdir(TEST_DIR)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from wsgi import app as wsgi_app
+    from models.imp import db
+
+    wsgi_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with wsgi_app.app_context():
+        db.create_all()
+    return wsgi_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Создать пользователя с уникальным именем: make_user(role='admin') -> id"""
+    from models.imp import db
+    from models.users.main_user_db import User
+
+    def _make_user(**fields):
+        name = f"user_{uuid.uuid4().hex[:12]}"
+        with app.app_context():
+            user = User(username=name, email=f"{name}@example.com")
+            user.set_unusable_password()
+            for key, value in fields.items():
+                setattr(user, key, value)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+
+    return _make_user
+
+
+@pytest.fixture
+def login(client):
+    def _login(user_id):
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+        return client
+
+    return _login
+
+
+@pytest.fixture
+def make_subscription(app):
+    """Создать план и активную подписку: make_subscription(user_id, max_messages_per_month=10) -> id"""
+    from models.imp import db
+    from models.subscription.subscription_plan import SubscriptionPlan
+    from models.subscription.user_subscription import SubscriptionStatus, UserSubscription
+
+    def _make_subscription(user_id, status=SubscriptionStatus.ACTIVE, **plan_fields):
+        with app.app_context():
+            name = f"plan_{uuid.uuid4().hex[:12]}"
+            plan = SubscriptionPlan(name=name, display_name=name, price=10, billing_cycle='monthly', **plan_fields)
+            db.session.add(plan)
+            db.session.flush()
+            subscription = UserSubscription(user_id=user_id, plan_id=plan.id, status=status)
+            db.session.add(subscription)
+            db.session.commit()
+            return subscription.id
+
+    return _make_subscription
@@ -0,0 +1,60 @@
+import json
+import logging
+
+import pytest
+
+from utils.access_log import AccessLog, LazyJsonRecord, access_logger
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def access_records(app, monkeypatch):
+    handler = ListHandler()
+    access_logger.addHandler(handler)
+    monkeypatch.setattr(app.extensions['access_log'], 'sample_rates', {'2xx': 1.0})
+    yield handler.records
+    access_logger.removeHandler(handler)
+
+
+def test_should_log_by_status_class():
+    log = AccessLog()
+    log.sample_rates = {'2xx': 0.0, '5xx': 1.0}
+    log.exclude_prefixes = ('/static/', '/metrics')
+    assert not log.should_log('/login', 200)
+    assert log.should_log('/login', 500)
+    assert log.should_log('/login', 404)  # класс без настройки пишется всегда
+    assert not log.should_log('/static/app.js', 500)
+    assert not log.should_log('/metrics', 500)
+
+
+def test_lazy_json_record():
+    record = LazyJsonRecord({'path': '/login', 'status': 200})
+    assert json.loads(str(record)) == {'path': '/login', 'status': 200}
+
+
+def test_request_logged_as_json(client, access_records):
+    response = client.get('/login', headers={'X-Request-ID': 'req-1'})
+    assert response.headers['X-Request-ID'] == 'req-1'
+
+    fields = json.loads(access_records[-1].getMessage())
+    assert fields['request_id'] == 'req-1'
+    assert (fields['method'], fields['path'], fields['status']) == ('GET', '/login', 200)
+    assert fields['duration_ms'] >= 0
+
+
+def test_request_id_generated(client, access_records):
+    response = client.get('/login')
+    assert len(response.headers['X-Request-ID']) == 32
+
+
+def test_excluded_path_not_logged(client, access_records):
+    client.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'})
+    assert access_records == []
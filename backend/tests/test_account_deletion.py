@@ -0,0 +1,193 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.password_hasher import PasswordHasher
+
+PASSWORD_HASH = PasswordHasher('pbkdf2:sha256:1000', 0, 0, 5).hash('secret')
+
+
+@pytest.fixture
+def deletion(app):
+    from models.imp import db
+    from services.account_deletion_service import account_deletion_service
+
+    def run(chunk_size=3, lease_seconds=300, **options):
+        with app.app_context():
+            return account_deletion_service.run_pending(db.engine, chunk_size, lease_seconds, **options)
+
+    return run
+
+
+def make_deletable_user(make_user, **fields):
+    user_id = make_user(**fields)
+    # SQLite отдает id удаленной последней строки следующему пользователю, а задание
+    # на удаление с этим user_id остается - удаляемый пользователь не должен быть последним
+    make_user()
+    return user_id
+
+
+def get_job(app, user_id):
+    from models.users.account_deletion import AccountDeletion
+
+    with app.app_context():
+        return AccountDeletion.query.filter_by(user_id=user_id).one()
+
+
+def add_usage(app, user_id, count):
+    from models.imp import db
+    from models.subscription.usage_tracker import UsageTracker, UsageType
+
+    with app.app_context():
+        db.session.execute(UsageTracker.__table__.insert(), [
+            {'user_id': user_id, 'usage_type': UsageType.MESSAGE, 'quantity': 1} for _ in range(count)
+        ])
+        db.session.commit()
+
+
+def test_request_and_process_deletion(app, make_user, make_subscription, login, deletion):
+    from models.imp import db
+    from models.subscription.usage_tracker import UsageTracker
+    from models.users.account_deletion import AccountDeletion
+    from models.users.main_user_db import User
+
+    user_id = make_deletable_user(make_user, password_hash=PASSWORD_HASH)
+    make_subscription(user_id)
+    add_usage(app, user_id, 7)
+    client = login(user_id)
+
+    assert client.delete('/delete-account', json={'password': 'wrong'}).status_code == 400
+    response = client.delete('/delete-account', json={'password': 'secret'})
+    assert response.status_code == 202
+    assert response.get_json()['deletion']['status'] == AccountDeletion.PENDING
+
+    # Запрос только помечает аккаунт: данные на месте, но войти уже нельзя
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        assert not user.is_active
+        assert user.deletion_requested_at is not None
+    with client.session_transaction() as session:
+        assert 'user_id' not in session
+
+    assert deletion(chunk_size=3) == 1
+    job = get_job(app, user_id)
+    assert job.status == AccountDeletion.DONE
+    assert job.rows_deleted == 8  # 7 строк трекера и подписка
+    assert job.attempts == 1
+    with app.app_context():
+        assert db.session.get(User, user_id) is None
+        assert UsageTracker.query.filter_by(user_id=user_id).count() == 0
+
+
+def test_abandoned_job_is_reclaimed(app, make_user, deletion):
+    from models.imp import db
+    from models.users.account_deletion import AccountDeletion
+
+    user_id = make_deletable_user(make_user)
+    long_ago = datetime.utcnow() - timedelta(hours=1)
+    with app.app_context():
+        # Воркер взял задание и упал
+        db.session.add(AccountDeletion(user_id=user_id, status=AccountDeletion.RUNNING, attempts=1,
+                                       requested_at=long_ago, updated_at=long_ago))
+        db.session.commit()
+
+    assert deletion(lease_seconds=300) == 1
+    job = get_job(app, user_id)
+    assert (job.status, job.attempts) == (AccountDeletion.DONE, 2)
+
+
+def fail_once(monkeypatch):
+    from services.account_deletion_service import account_deletion_service
+
+    delete_chunk = account_deletion_service._delete_chunk
+    calls = []
+
+    def flaky(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise RuntimeError('connection reset')
+        return delete_chunk(*args)
+
+    monkeypatch.setattr(account_deletion_service, '_delete_chunk', flaky)
+
+
+def test_failed_job_retried_after_backoff(app, make_user, deletion, monkeypatch):
+    from models.imp import db
+    from models.users.account_deletion import AccountDeletion
+    from models.users.main_user_db import User
+    from services.account_deletion_service import account_deletion_service
+
+    user_id = make_deletable_user(make_user)
+    with app.app_context():
+        account_deletion_service.request_deletion(db.session.get(User, user_id))
+    fail_once(monkeypatch)
+
+    assert deletion(retry_delay=60) == 0
+    job = get_job(app, user_id)
+    assert (job.status, job.attempts, job.error) == (AccountDeletion.FAILED, 1, 'connection reset')
+    assert job.retry_at > datetime.utcnow() + timedelta(seconds=50)
+
+    # Пауза перед повтором еще не прошла
+    assert deletion() == 0
+    with app.app_context():
+        db.session.execute(AccountDeletion.__table__.update().where(AccountDeletion.id == job.id)
+                           .values(retry_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+
+    assert deletion() == 1
+    job = get_job(app, user_id)
+    assert (job.status, job.attempts, job.retry_at) == (AccountDeletion.DONE, 2, None)
+    with app.app_context():
+        assert db.session.get(User, user_id) is None
+
+
+def test_exhausted_job_requeued_manually(app, make_user, deletion, monkeypatch):
+    from models.imp import db
+    from models.users.account_deletion import AccountDeletion
+    from models.users.main_user_db import User
+    from services.account_deletion_service import account_deletion_service
+
+    user_id = make_deletable_user(make_user)
+    with app.app_context():
+        account_deletion_service.request_deletion(db.session.get(User, user_id))
+    fail_once(monkeypatch)
+
+    assert deletion(max_attempts=1) == 0
+    job = get_job(app, user_id)
+    assert (job.status, job.retry_at) == (AccountDeletion.FAILED, None)
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['process-deletions', '--retry-failed'])
+    assert 'Requeued 1 failed jobs' in result.output
+    assert get_job(app, user_id).status == AccountDeletion.DONE
+
+
+def test_running_job_not_taken_twice(app, make_user, deletion):
+    from models.imp import db
+    from models.users.account_deletion import AccountDeletion
+
+    user_id = make_user()
+    with app.app_context():
+        db.session.add(AccountDeletion(user_id=user_id, status=AccountDeletion.RUNNING, attempts=1))
+        db.session.commit()
+
+    assert deletion(lease_seconds=300) == 0
+    assert get_job(app, user_id).status == AccountDeletion.RUNNING
+
+
+def test_login_blocked_after_deletion_request(app, client, make_user, login):
+    from models.imp import db
+    from models.users.main_user_db import User
+    from utils.rate_limit import limiter
+
+    limiter.reset()
+    user_id = make_deletable_user(make_user, password_hash=PASSWORD_HASH)
+    login(user_id).delete('/delete-account', json={'password': 'secret'})
+    with app.app_context():
+        username = db.session.get(User, user_id).username
+
+    response = client.post('/login', data={'username': username, 'password': 'secret'})
+    assert response.status_code == 200
+    assert 'Ваш аккаунт деактивирован' in response.text
+    with client.session_transaction() as session:
+        assert 'user_id' not in session
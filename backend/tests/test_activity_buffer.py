@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from utils.activity_buffer import ActivityBuffer
+
+T0 = datetime(2026, 10, 17, 10, 0, 0)
+
+
+@pytest.fixture
+def buffer(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'activity.db'}")
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE "user" (id INTEGER PRIMARY KEY, last_login DATETIME)'))
+        conn.execute(text('INSERT INTO "user" (id, last_login) VALUES (1, NULL), (2, :ts)'), {'ts': T0})
+    buffer = ActivityBuffer(flush_interval=3600)
+    buffer.engine = engine
+    return buffer
+
+
+def last_logins(buffer):
+    with buffer.engine.connect() as conn:
+        return dict(conn.execute(text('SELECT id, last_login FROM "user" ORDER BY id')).all())
+
+
+def test_flush_coalesces_logins(buffer):
+    buffer.record(1, when=T0 + timedelta(minutes=1))
+    buffer.record(1, when=T0 + timedelta(minutes=3))
+    buffer.record(1, when=T0 + timedelta(minutes=2))
+    assert buffer.flush() == 1
+    assert last_logins(buffer)[1] == str(T0 + timedelta(minutes=3))
+    assert buffer.flush() == 0
+
+
+def test_flush_does_not_move_time_back(buffer):
+    # Другой воркер уже записал более поздний вход
+    buffer.record(2, when=T0 - timedelta(minutes=5))
+    buffer.flush()
+    assert last_logins(buffer)[2] == str(T0)
+
+
+def test_failed_flush_keeps_pending(buffer):
+    buffer.record(1, when=T0)
+    with buffer.engine.begin() as conn:
+        conn.execute(text('ALTER TABLE "user" RENAME TO user_old'))
+    with pytest.raises(Exception):
+        buffer.flush()
+
+    with buffer.engine.begin() as conn:
+        conn.execute(text('ALTER TABLE user_old RENAME TO "user"'))
+    assert buffer.flush() == 1
+    assert last_logins(buffer)[1] == str(T0)
+
+
+def test_unsupported_column(buffer):
+    with pytest.raises(ValueError):
+        buffer.record(1, column='password_hash')
+
+
+def test_login_records_activity_and_rehashes(app, client, make_user):
+    from models.imp import db
+    from models.users.main_user_db import User
+    from utils.activity_buffer import activity_buffer
+    from utils.password_hasher import PasswordHasher, password_hasher
+    from utils.rate_limit import limiter
+
+    limiter.reset()
+    user_id = make_user(password_hash=PasswordHasher('pbkdf2:sha256:1000', 0, 0, 5).hash('secret'))
+    with app.app_context():
+        username = db.session.get(User, user_id).username
+
+    response = client.post('/login', data={'username': username, 'password': 'secret'})
+    assert response.status_code == 302
+    activity_buffer.flush()
+
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        assert user.last_login is not None
+        # Хеш со старыми параметрами заменен при входе
+        assert not password_hasher.needs_rehash(user.password_hash)
+        assert user.check_password('secret')
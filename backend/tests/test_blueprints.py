@@ -0,0 +1,40 @@
+from flask import Blueprint, Flask
+
+from blueprints.lazy_loader import register_lazy_blueprints
+from utils.import_report import parse_importtime
+
+
+def test_disabled_blueprint_not_imported():
+    app = Flask(__name__)
+    app.config['FEATURE_ENABLED'] = False
+    # Модуля нет: при выключенном флаге его импорт даже не пробуется
+    register_lazy_blueprints(app, [('missing.module', 'bp', {}, 'FEATURE_ENABLED')])
+    assert app.blueprints == {}
+
+
+def test_enabled_blueprints_registered():
+    app = Flask(__name__)
+    app.config['FEATURE_ENABLED'] = True
+    register_lazy_blueprints(app, [
+        ('tests.test_blueprints', 'sample_bp', {'url_prefix': '/sample'}, 'FEATURE_ENABLED'),
+    ])
+    assert 'sample_bp' in app.blueprints
+    assert app.test_client().get('/sample/').data == b'sample'
+
+
+def test_parse_importtime():
+    output = '\n'.join([
+        'import time: self [us] | cumulative | imported package',
+        'import time:       120 |        120 |   _io',
+        'import time:      1500 |      42000 | flask',
+        'something else',
+    ])
+    assert parse_importtime(output) == [('   _io', 120, 120), (' flask', 1500, 42000)]
+
+
+sample_bp = Blueprint('sample_bp', __name__)
+
+
+@sample_bp.route('/')
+def sample():
+    return 'sample'
@@ -0,0 +1,62 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool
+
+from utils.db_pool import InstrumentedQueuePool, build_engine_options
+from utils.metrics import instrument_engine_pool
+
+POSTGRES_URI = 'postgresql://app@db/app'
+
+
+def sample(name):
+    return REGISTRY.get_sample_value(name) or 0
+
+
+def test_sqlite_keeps_default_options():
+    assert build_engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///app.db'}) == {}
+
+
+def test_queue_mode_options():
+    options = build_engine_options({
+        'SQLALCHEMY_DATABASE_URI': POSTGRES_URI,
+        'SQLALCHEMY_ENGINE_OPTIONS': {'echo': True},
+        'DB_POOL_MODE': 'queue',
+        'DB_POOL_SIZE': 3,
+    })
+    assert options['poolclass'] is InstrumentedQueuePool
+    assert options['pool_size'] == 3
+    assert options['max_overflow'] == 10
+    assert options['pool_use_lifo'] is True
+    assert options['echo'] is True
+
+
+def test_pgbouncer_mode_uses_null_pool():
+    options = build_engine_options({'SQLALCHEMY_DATABASE_URI': POSTGRES_URI, 'DB_POOL_MODE': 'pgbouncer'})
+    assert options == {'poolclass': NullPool}
+
+
+def test_pool_metrics(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05
+    )
+    instrument_engine_pool(engine)
+    checked_out = sample('db_pool_checked_out_connections')
+    timeouts = sample('db_pool_checkout_timeouts_total')
+    waits = sample('db_pool_checkout_wait_seconds_count')
+
+    connection = engine.connect()
+    assert sample('db_pool_size') == 1
+    assert sample('db_pool_checked_out_connections') == checked_out + 1
+
+    # Единственное соединение занято - второй checkout ждет и падает по таймауту
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    assert sample('db_pool_checkout_timeouts_total') == timeouts + 1
+    assert sample('db_pool_checkout_wait_seconds_count') == waits + 2
+
+    connection.close()
+    assert sample('db_pool_checked_out_connections') == checked_out
+    engine.dispose()
@@ -0,0 +1,91 @@
+import time
+
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine, insert
+
+from config import Config
+from utils.db_routing import REPLICA_BIND, ReplicaHealth, RoutingSession, read_only, replica_health
+
+routing_db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+class Note(routing_db.Model):
+    __tablename__ = 'routing_notes'
+    id = routing_db.Column(routing_db.Integer, primary_key=True)
+    text = routing_db.Column(routing_db.String(50))
+
+
+@pytest.fixture
+def routing_app(tmp_path, monkeypatch):
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY='test',
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'primary.db'}",
+        SQLALCHEMY_BINDS={REPLICA_BIND: f"sqlite:///{tmp_path / 'replica.db'}"},
+    )
+    routing_db.init_app(app)
+    monkeypatch.setattr(replica_health, 'healthy', True)
+    monkeypatch.setattr(replica_health, 'checked_at', time.monotonic())
+
+    with app.app_context():
+        # Одна таблица в обеих базах с разными данными - видно, откуда пришло чтение
+        for engine, text in ((routing_db.engine, 'primary'), (routing_db.engines[REPLICA_BIND], 'replica')):
+            Note.__table__.create(engine)
+            with engine.begin() as conn:
+                conn.execute(insert(Note.__table__).values(text=text))
+
+    @app.route('/read')
+    @read_only
+    def read():
+        return routing_db.session.execute(routing_db.select(Note.text).order_by(Note.id)).scalar()
+
+    @app.route('/read-primary')
+    def read_primary():
+        return routing_db.session.execute(routing_db.select(Note.text).order_by(Note.id)).scalar()
+
+    @app.route('/write-then-read')
+    @read_only
+    def write_then_read():
+        routing_db.session.add(Note(text='new'))
+        routing_db.session.commit()
+        return routing_db.session.execute(routing_db.select(Note.text).order_by(Note.id)).scalar()
+
+    return app
+
+
+def test_read_only_goes_to_replica(routing_app):
+    client = routing_app.test_client()
+    assert client.get('/read').text == 'replica'
+    assert client.get('/read-primary').text == 'primary'
+
+
+def test_reads_after_write_stay_on_primary(routing_app):
+    assert routing_app.test_client().get('/write-then-read').text == 'primary'
+
+
+def test_sticky_primary_after_write(routing_app, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_REPLICA_STICKY_SECONDS', 60)
+    client = routing_app.test_client()
+    client.get('/write-then-read')
+    assert client.get('/read').text == 'primary'
+    assert routing_app.test_client().get('/read').text == 'replica'
+
+
+def test_unhealthy_replica_falls_back_to_primary(routing_app):
+    replica_health.mark_failed()
+    assert routing_app.test_client().get('/read').text == 'primary'
+
+
+def test_replica_health_check(tmp_path):
+    health = ReplicaHealth(max_lag=5, check_interval=60)
+    assert health.is_healthy(create_engine(f"sqlite:///{tmp_path / 'replica.db'}"))
+
+    # Результат кэшируется на check_interval
+    health.mark_failed()
+    assert not health.is_healthy(create_engine(f"sqlite:///{tmp_path / 'replica.db'}"))
+
+    health.checked_at = 0
+    broken = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    assert not health.is_healthy(broken)
@@ -0,0 +1,56 @@
+"""Конфиг gunicorn: число воркеров и потоков от ядер, переопределение через env"""
+import multiprocessing
+import os
+import runpy
+
+import pytest
+
+CONF_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py')
+
+
+@pytest.fixture
+def load_conf(monkeypatch):
+    for name in ('WEB_CONCURRENCY', 'GUNICORN_THREADS', 'GUNICORN_PRELOAD'):
+        monkeypatch.delenv(name, raising=False)
+
+    def load(cpus, **env):
+        monkeypatch.setattr(multiprocessing, 'cpu_count', lambda: cpus)
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        return runpy.run_path(CONF_PATH)
+    return load
+
+
+def test_defaults_from_cpu_count(load_conf):
+    conf = load_conf(4)
+    assert conf['workers'] == 9
+    assert conf['threads'] == 2
+    assert conf['worker_class'] == 'gthread'
+    assert conf['preload_app'] is False
+    # Приложение видит число потоков воркера (лимит SSE потоков)
+    assert os.environ['GUNICORN_THREADS'] == '2'
+
+
+def test_single_core_gets_more_threads(load_conf):
+    conf = load_conf(1)
+    assert conf['workers'] == 3
+    assert conf['threads'] == 4
+
+
+def test_env_overrides(load_conf):
+    conf = load_conf(8, WEB_CONCURRENCY='2', GUNICORN_THREADS='1', GUNICORN_PRELOAD='true')
+    assert conf['workers'] == 2
+    assert conf['threads'] == 1
+    assert conf['worker_class'] == 'sync'
+    assert conf['preload_app'] is True
+
+
+def test_gunicorn_accepts_config(load_conf):
+    gunicorn_config = pytest.importorskip('gunicorn.config')
+
+    cfg = gunicorn_config.Config()
+    for name, value in load_conf(2).items():
+        if name in cfg.settings:
+            cfg.set(name, value)
+    assert cfg.workers == 5
+    assert callable(cfg.post_fork)
@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from migrations.runner import upgrade
+from migrations.versions.v0002_hot_path_indexes import INDEXES
+
+
+@pytest.fixture(scope='module')
+def engine(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('indexes') / 'app.db'}")
+    upgrade(engine)
+    # Соединения пула помнят подготовленные PRAGMA до создания таблиц - инспектор
+    # должен читать схему через новые
+    engine.dispose()
+    return engine
+
+
+def test_model_indexes_created_by_migrations(app, engine):
+    from models.imp import db
+
+    # Через sqlite_master: индексы по выражению (lower(email)) инспектор не отражает
+    with engine.connect() as conn:
+        existing = set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            assert index.name in existing, f"{table.name}.{index.name}"
+
+
+@pytest.mark.parametrize('name, table, columns', INDEXES)
+def test_hot_path_index_columns(engine, name, table, columns):
+    indexes = {index['name']: index['column_names'] for index in inspect(engine).get_indexes(table)}
+    assert indexes[name] == columns
+
+
+def test_transactions_listing_uses_index(engine):
+    with engine.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM transactions WHERE user_id = 1 "
+            "ORDER BY created_at DESC, id DESC LIMIT 20"
+        )).fetchall()
+    assert any('ix_transactions_user_created' in row[-1] for row in plan)
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.log_search import (
+    INDEX_SUFFIX, compress_segment, parse_line_timestamp, read_index, search, search_compressed, search_plain
+)
+
+BASE = datetime(2026, 10, 17, 10, 0, 0)
+
+
+def ms(dt):
+    return int(dt.timestamp() * 1000)
+
+
+def line(seconds, text):
+    stamp = (BASE + timedelta(seconds=seconds)).strftime('%Y-%m-%d %H:%M:%S.%f')[:23]
+    return f"{stamp} - app - INFO - {text}"
+
+
+def interleaved_lines():
+    # Два воркера пишут пачками: время в файле идет не строго по порядку
+    lines = []
+    for batch in range(10):
+        start = batch * 10
+        lines += [line(start + 5 + i, f"worker-b {start + 5 + i}") for i in range(5)]
+        lines += [line(start + i, f"worker-a {start + i}") for i in range(5)]
+        lines.append('Traceback (most recent call last):')
+    return lines
+
+
+def write_log(path, lines):
+    path.write_text(''.join(text + '\n' for text in lines))
+    return str(path)
+
+
+def expected(lines, since, until):
+    result = []
+    current = None
+    for text in lines:
+        ts = parse_line_timestamp(text.encode())
+        current = ts if ts is not None else current
+        if ms(BASE + timedelta(seconds=since)) <= current <= ms(BASE + timedelta(seconds=until)):
+            result.append(text.encode())
+    return result
+
+
+def test_parse_line_timestamp():
+    assert parse_line_timestamp(line(1.5, 'x').encode()) == ms(BASE) + 1500
+    assert parse_line_timestamp(b'Traceback (most recent call last):') is None
+
+
+@pytest.mark.parametrize('since, until', [(0, 99), (12, 37), (47, 52), (95, 200), (200, 300)])
+def test_search_plain_interleaved(tmp_path, since, until):
+    lines = interleaved_lines()
+    path = write_log(tmp_path / 'app.log', lines)
+    found = list(search_plain(path, ms(BASE + timedelta(seconds=since)), ms(BASE + timedelta(seconds=until))))
+    assert found == expected(lines, since, until)
+
+
+def test_compressed_index_has_block_ranges(tmp_path):
+    lines = interleaved_lines()
+    gz_path = compress_segment(write_log(tmp_path / 'app-1.log', lines), chunk_bytes=200)
+    entries = read_index(gz_path + INDEX_SUFFIX)
+    assert len(entries) > 1
+    assert entries[0][2] == 0
+    assert all(low <= high for low, high, _ in entries)
+    assert min(low for low, _, _ in entries) == ms(BASE)
+    assert max(high for _, high, _ in entries) == ms(BASE + timedelta(seconds=99))
+    assert not (tmp_path / 'app-1.log').exists()
+
+
+@pytest.mark.parametrize('since, until', [(0, 99), (12, 37), (47, 52), (95, 200)])
+def test_search_compressed_interleaved(tmp_path, since, until):
+    lines = interleaved_lines()
+    gz_path = compress_segment(write_log(tmp_path / 'app-1.log', lines), chunk_bytes=200)
+    found = list(search_compressed(gz_path, ms(BASE + timedelta(seconds=since)), ms(BASE + timedelta(seconds=until))))
+    assert found == expected(lines, since, until)
+
+
+def test_search_all_segments(tmp_path):
+    lines = interleaved_lines()
+    compress_segment(write_log(tmp_path / 'app-1.log', lines[:33]), chunk_bytes=200)
+    write_log(tmp_path / 'app.log', lines[33:])
+    found = list(search(str(tmp_path), ms(BASE), ms(BASE + timedelta(seconds=99)), pattern='worker-a'))
+    assert found == [text.encode() for text in lines if 'worker-a' in text]
@@ -0,0 +1,166 @@
+import io
+import logging
+import os
+import queue
+import sys
+
+from prometheus_client import REGISTRY
+
+from utils.logs_service import BatchingQueueListener, BoundedQueueHandler, LogQueueStats, RotatingBufferedFileHandler
+
+
+class RecordingCompressor:
+    def __init__(self):
+        self.segments = []
+
+    def submit(self, path):
+        self.segments.append(path)
+
+
+def make_record(message):
+    return logging.makeLogRecord({'msg': message, 'levelno': logging.INFO, 'levelname': 'INFO'})
+
+
+def read_lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+def test_batch_written_on_flush(tmp_path):
+    path = str(tmp_path / 'app.log')
+    handler = RotatingBufferedFileHandler(path, 0, 0, RecordingCompressor())
+    try:
+        handler.emit(make_record('first'))
+        handler.emit(make_record('second'))
+        assert read_lines(path) == []
+        handler.flush()
+        assert read_lines(path) == ['first', 'second']
+    finally:
+        handler.close()
+
+
+def test_rotation_by_size(tmp_path):
+    path = str(tmp_path / 'app.log')
+    compressor = RecordingCompressor()
+    handler = RotatingBufferedFileHandler(path, 10, 0, compressor)
+    try:
+        handler.emit(make_record('0123456789'))
+        handler.flush()
+        handler.emit(make_record('next'))
+        handler.flush()
+    finally:
+        handler.close()
+
+    assert len(compressor.segments) == 1
+    assert read_lines(compressor.segments[0]) == ['0123456789']
+    assert read_lines(path) == ['next']
+
+
+def test_rotation_by_time(tmp_path):
+    path = str(tmp_path / 'app.log')
+    compressor = RecordingCompressor()
+    handler = RotatingBufferedFileHandler(path, 0, 3600, compressor)
+    try:
+        handler.emit(make_record('old'))
+        handler.flush()
+        handler.next_rollover = 0
+        handler.emit(make_record('new'))
+        handler.flush()
+        assert handler.next_rollover > 0
+    finally:
+        handler.close()
+
+    assert [read_lines(segment) for segment in compressor.segments] == [['old']]
+    assert read_lines(path) == ['new']
+
+
+def test_writer_follows_rotation_by_other_process(tmp_path):
+    # Два обработчика на одном файле - как воркеры gunicorn
+    path = str(tmp_path / 'app.log')
+    compressor = RecordingCompressor()
+    first = RotatingBufferedFileHandler(path, 10, 0, compressor)
+    second = RotatingBufferedFileHandler(path, 10, 0, compressor)
+    try:
+        second.emit(make_record('second-1 fills the file'))
+        second.flush()
+        first.emit(make_record('first-1'))
+        first.flush()  # ротирует файл, который второй еще держит открытым
+
+        second.emit(make_record('second-2'))
+        second.flush()
+    finally:
+        first.close()
+        second.close()
+
+    # Пачка второго не попала в уже переименованный сегмент
+    assert [read_lines(segment) for segment in compressor.segments] == [['second-1 fills the file']]
+    assert read_lines(path) == ['first-1', 'second-2']
+    assert os.path.exists(path + '.lock')
+
+
+def make_queue_handler(maxsize=10, policy='drop'):
+    stats = LogQueueStats()
+    return BoundedQueueHandler(queue.Queue(maxsize=maxsize), stats, policy=policy, block_timeout=0.01), stats
+
+
+def test_prepare_defers_formatting_for_immutable_args():
+    handler, _ = make_queue_handler()
+    record = logging.makeLogRecord({'msg': 'user %s: %d', 'args': ('alice', 3)})
+    prepared = handler.prepare(record)
+    assert prepared is not record
+    assert (prepared.msg, prepared.args) == ('user %s: %d', ('alice', 3))
+    assert prepared.getMessage() == 'user alice: 3'
+
+
+def test_prepare_formats_mutable_args_immediately():
+    handler, _ = make_queue_handler()
+    items = [1, 2]
+    prepared = handler.prepare(logging.makeLogRecord({'msg': 'items %s', 'args': (items,)}))
+    items.append(3)
+    assert (prepared.msg, prepared.args) == ('items [1, 2]', None)
+
+    prepared = handler.prepare(logging.makeLogRecord({'msg': ValueError('boom')}))
+    assert prepared.msg == 'boom'
+
+
+def test_drop_policy_counts_dropped():
+    handler, stats = make_queue_handler(maxsize=1)
+    handler.emit(make_record('kept'))
+    handler.emit(make_record('dropped'))
+    assert stats.to_dict()['enqueued'] == 1
+    assert stats.to_dict()['dropped'] == 1
+    assert stats.to_dict()['blocked'] == 0
+
+
+def test_block_policy_counts_blocked():
+    handler, stats = make_queue_handler(maxsize=1, policy='block')
+    handler.emit(make_record('kept'))
+    handler.emit(make_record('waited'))
+    # Ждали место в очереди и не дождались - запись все равно отброшена
+    assert stats.to_dict()['blocked'] == 1
+    assert stats.to_dict()['dropped'] == 1
+    assert REGISTRY.get_sample_value('log_queue_events_total', {'event': 'blocked'}) >= 1
+
+
+def test_listener_formats_records_and_tracebacks():
+    queue_handler, stats = make_queue_handler()
+    output = io.StringIO()
+    target = logging.StreamHandler(output)
+    target.setFormatter(logging.Formatter('%(message)s'))
+    listener = BatchingQueueListener(queue_handler.queue, [target], stats, flush_interval=0.01)
+    listener.start()
+    try:
+        queue_handler.emit(logging.makeLogRecord({'msg': 'user %s', 'args': ('alice',), 'levelno': logging.INFO}))
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            queue_handler.emit(logging.makeLogRecord({
+                'msg': 'failed', 'levelno': logging.ERROR, 'exc_info': sys.exc_info()
+            }))
+    finally:
+        listener.stop()
+
+    lines = output.getvalue().splitlines()
+    assert lines[:2] == ['user alice', 'failed']
+    assert lines[-1] == 'ValueError: boom'
+    assert stats.to_dict()['written'] == 2
@@ -0,0 +1,24 @@
+import pytest
+
+
+def get_metrics(client, remote_addr, headers=None):
+    return client.get('/metrics', environ_base={'REMOTE_ADDR': remote_addr}, headers=headers)
+
+
+@pytest.mark.parametrize('remote_addr', ['127.0.0.1', '10.1.2.3', '192.168.0.10'])
+def test_metrics_from_private_network(client, remote_addr):
+    response = get_metrics(client, remote_addr)
+    assert response.status_code == 200
+    assert b'http_requests_total' in response.data
+
+
+def test_metrics_hidden_from_public_network(client):
+    assert get_metrics(client, '203.0.113.5').status_code == 404
+
+
+def test_metrics_token(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'scrape-token')
+    # С токеном адрес не важен, без токена не пускает и внутренняя сеть
+    assert get_metrics(client, '127.0.0.1').status_code == 404
+    assert get_metrics(client, '203.0.113.5', {'Authorization': 'Bearer wrong'}).status_code == 404
+    assert get_metrics(client, '203.0.113.5', {'Authorization': 'Bearer scrape-token'}).status_code == 200
@@ -0,0 +1,50 @@
+import click
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from migrations.runner import (
+    SchemaVersionError, add_column, check_schema_version, get_current_version, latest_version, upgrade
+)
+
+
+def test_upgrade_fresh_database_matches_models(app, tmp_path):
+    from models.imp import db
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    assert get_current_version(engine) is None
+
+    applied = upgrade(engine)
+    assert applied == list(range(1, latest_version() + 1))
+    assert get_current_version(engine) == latest_version()
+    assert upgrade(engine) == []
+
+    inspector = inspect(engine)
+    for table in db.metadata.sorted_tables:
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        assert columns == set(table.columns.keys()), table.name
+
+
+def test_upgrade_to_target(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    assert upgrade(engine, target=1) == [1]
+    assert upgrade(engine) == list(range(2, latest_version() + 1))
+
+
+def test_add_column_is_idempotent(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'columns.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+        add_column(conn, 'items', 'note', 'VARCHAR(20)')
+        add_column(conn, 'items', 'note', 'VARCHAR(20)')
+        assert [column['name'] for column in inspect(conn).get_columns('items')] == ['id', 'note']
+
+
+def test_strict_schema_check(app, monkeypatch):
+    # Тестовая БД создана через create_all, таблицы версий в ней нет
+    monkeypatch.setitem(app.config, 'SCHEMA_CHECK_STRICT', True)
+    with pytest.raises(SchemaVersionError):
+        check_schema_version(app)
+
+    # Команды flask (db-upgrade) загружают приложение на старой схеме
+    with click.Context(click.Command('db-upgrade')):
+        assert check_schema_version(app) is None
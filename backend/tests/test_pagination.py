@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from utils.pagination import InvalidCursorError, decode_cursor, encode_cursor, next_cursor
+
+
+@pytest.fixture
+def app_ctx(app):
+    with app.app_context():
+        yield
+
+
+def test_cursor_round_trip(app_ctx):
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+@pytest.mark.parametrize('token', ['garbage', '', 'WyIyMDI0LTA1LTAxIiwgNDJd.invalid'])
+def test_malformed_cursor(app_ctx, token):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(token)
+
+
+def test_tampered_cursor(app_ctx):
+    token = encode_cursor(datetime(2024, 5, 1), 42)
+    payload, signature = token.rsplit('.', 1)
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(payload + '.' + signature[::-1])
+
+
+def test_cursor_signed_with_other_key(app):
+    with app.app_context():
+        token = encode_cursor(datetime(2024, 5, 1), 42)
+    secret = app.config['SECRET_KEY']
+    app.config['SECRET_KEY'] = 'another-key'
+    try:
+        with app.app_context(), pytest.raises(InvalidCursorError):
+            decode_cursor(token)
+    finally:
+        app.config['SECRET_KEY'] = secret
+
+
+def test_next_cursor(app_ctx):
+    items = [SimpleNamespace(created_at=datetime(2024, 5, 1) - timedelta(minutes=i), id=10 - i) for i in range(3)]
+    assert next_cursor([], 3) is None
+    assert next_cursor(items[:2], 3) is None
+    assert decode_cursor(next_cursor(items, 3)) == (items[-1].created_at, items[-1].id)
+
+
+def test_transactions_keyset_pages(app, make_user, login):
+    from models.imp import db
+    from models.subscription.transaction import Transaction, TransactionStatus, TransactionType
+
+    user_id = make_user()
+    # Несколько строк с одинаковым created_at: порядок внутри них задает id
+    base = datetime(2024, 5, 1, 12, 0, 0)
+    with app.app_context():
+        db.session.execute(Transaction.__table__.insert(), [
+            {
+                'user_id': user_id,
+                'transaction_type': TransactionType.SUBSCRIPTION_PAYMENT,
+                'status': TransactionStatus.COMPLETED if i % 3 else TransactionStatus.REFUNDED,
+                'amount': 10,
+                'total_amount': 10,
+                'created_at': base - timedelta(minutes=i // 2),
+            }
+            for i in range(7)
+        ])
+        db.session.commit()
+
+    client = login(user_id)
+    first = client.get('/api/subscriptions/transactions?limit=3').get_json()
+    assert first['success']
+    assert first['pagination']['total'] == 7
+    assert first['stats']['refunded_transactions'] == 3
+    assert first['stats']['total_refunded'] == 30
+
+    seen = [item['id'] for item in first['data']]
+    cursor = first['pagination']['next_cursor']
+    while cursor:
+        page = client.get(f'/api/subscriptions/transactions?limit=3&cursor={cursor}').get_json()
+        assert 'stats' not in page
+        seen += [item['id'] for item in page['data']]
+        cursor = page['pagination']['next_cursor']
+
+    assert len(seen) == len(set(seen)) == 7
+
+
+def test_transactions_invalid_cursor(make_user, login):
+    client = login(make_user())
+    response = client.get('/api/subscriptions/transactions?cursor=garbage')
+    assert response.status_code == 400
@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from utils.password_hasher import PasswordHasher, PasswordHashingBusy
+
+METHOD = 'pbkdf2:sha256:1000'
+
+
+def test_hash_and_verify_in_thread():
+    hasher = PasswordHasher(METHOD, workers=0, queue_limit=0, timeout=5)
+    password_hash = hasher.hash('secret')
+    assert password_hash.startswith(METHOD + '$')
+    assert hasher.verify(password_hash, 'secret')
+    assert not hasher.verify(password_hash, 'wrong')
+    assert not hasher.verify(None, 'secret')
+    assert not hasher.verify('', 'secret')
+
+
+def test_needs_rehash():
+    hasher = PasswordHasher(METHOD, workers=0, queue_limit=0, timeout=5)
+    assert not hasher.needs_rehash(hasher.hash('secret'))
+    assert hasher.needs_rehash(PasswordHasher('pbkdf2:sha256:2000', 0, 0, 5).hash('secret'))
+    assert hasher.needs_rehash('scrypt:32768:8:1$salt$hash')
+    assert hasher.needs_rehash(None)
+    assert hasher.needs_rehash('')
+
+
+def test_process_pool():
+    hasher = PasswordHasher(METHOD, workers=1, queue_limit=0, timeout=30)
+    try:
+        password_hash = hasher.hash('secret')
+        assert hasher.verify(password_hash, 'secret')
+    finally:
+        hasher.shutdown()
+
+
+def test_busy_when_slots_taken():
+    hasher = PasswordHasher(METHOD, workers=1, queue_limit=0, timeout=5)
+    # Единственный слот занят другим запросом - отказ сразу, без ожидания
+    assert hasher._slots.acquire(blocking=False)
+    try:
+        with pytest.raises(PasswordHashingBusy) as exc:
+            hasher.hash('secret')
+        assert exc.value.code == 503
+        assert exc.value.retry_after == 1
+    finally:
+        hasher._slots.release()
+        hasher.shutdown()
+
+
+def test_timed_out_task_keeps_slot_until_done():
+    hasher = PasswordHasher(METHOD, workers=1, queue_limit=0, timeout=30)
+    try:
+        hasher.hash('warm up')  # процесс пула уже запущен
+        hasher.timeout = 0.2
+        with pytest.raises(PasswordHashingBusy):
+            hasher._run(time.sleep, 1.5)
+
+        # Задача еще выполняется в единственном процессе пула - слот занят
+        assert not hasher._slots.acquire(blocking=False)
+
+        hasher.timeout = 30
+        deadline = time.monotonic() + 10
+        while not hasher._slots.acquire(blocking=False):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        hasher._slots.release()
+        assert hasher.verify(hasher.hash('secret'), 'secret')
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,95 @@
+import pytest
+
+from services.quota_engine import MemoryQuotaStore, RedisQuotaStore, current_cycle
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def store(request):
+    if request.param == 'memory':
+        return MemoryQuotaStore()
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    return RedisQuotaStore(fakeredis.FakeRedis(), prefix='test-quota:')
+
+
+def test_consume_unseeded(store):
+    assert store.consume(1, [1], '202405') is None
+
+
+def test_consume_accepts_events_that_fit(store):
+    store.seed(1, limit=10, used=4, sub=7, cycle='')
+    # Большое событие не проходит, но следующие поменьше - проходят
+    assert store.consume(1, [3, 5, 2, 1], '202405') == (7, [True, False, True, True])
+    assert store.consume(1, [1], '202405') == (7, [False])
+
+
+def test_seed_keeps_existing_state(store):
+    store.seed(1, limit=10, used=0, sub=7, cycle='')
+    store.consume(1, [4], '202405')
+    store.seed(1, limit=10, used=0, sub=7, cycle='')
+    assert store.consume(1, [7], '202405') == (7, [False])
+
+
+def test_free_quota_resets_with_cycle(store):
+    store.seed(1, limit=5, used=5, sub=0, cycle='202404')
+    assert store.consume(1, [1], '202404') == (0, [False])
+    assert store.consume(1, [1], '202405') is None
+    # Бесплатная квота не попадает в сверку с БД
+    assert store.pop_dirty(10) == []
+
+
+def test_take_sync_restore(store):
+    store.seed(1, limit=10, used=2, sub=7, cycle='')
+    store.consume(1, [3], '')
+    assert store.pop_dirty(10) == [1]
+
+    assert store.take(1) == (3, 7)
+    assert store.take(1) == (0, 7)
+
+    # Запись в БД не удалась - разница снова несверенная и пользователь в dirty
+    assert store.restore(1, 3)
+    assert store.pop_dirty(10) == [1]
+    assert store.take(1) == (3, 7)
+
+    # В БД оказалось больше (списание мимо хранилища) и лимит уменьшился
+    assert store.sync(1, db_used=8, limit=9) == 3
+    assert store.consume(1, [1], '') == (7, [True])
+    assert store.consume(1, [1], '') == (7, [False])
+
+
+def test_drain_and_refund(store):
+    store.seed(1, limit=10, used=0, sub=7, cycle='')
+    store.consume(1, [10], '')
+    store.refund(1, 4)
+    assert store.consume(1, [4], '') == (7, [True])
+    assert store.drain(1) == (10, 7)
+    assert store.pop_dirty(10) == []
+    assert store.drain(1) is None
+    assert store.take(1) is None
+    assert not store.restore(1, 1)
+
+
+def test_pop_dirty_count(store):
+    store.mark_dirty([1, 2, 3])
+    popped = store.pop_dirty(2)
+    assert len(popped) == 2
+    assert sorted(popped + store.pop_dirty(10)) == [1, 2, 3]
+
+
+def test_free_quota_seeded_by_quantity(app, make_user):
+    from models.imp import db
+    from models.subscription.usage_tracker import UsageTracker, UsageType
+    from services.quota_engine import quota_engine
+
+    user_id = make_user()
+    with app.app_context():
+        db.session.execute(UsageTracker.__table__.insert(), [
+            {'user_id': user_id, 'usage_type': UsageType.MESSAGE, 'quantity': 60},
+            {'user_id': user_id, 'usage_type': UsageType.MESSAGE, 'quantity': 35},
+            {'user_id': user_id, 'usage_type': UsageType.BOT_CREATION, 'quantity': 50},
+        ])
+        db.session.commit()
+
+        # Лимит бесплатного - 100 сообщений, уже списано 95 (а не 2 строки)
+        assert quota_engine.consume_many(user_id, [10, 5, 1]) == (0, [False, True, False])
+        assert current_cycle() == quota_engine.store._data[user_id]['cycle']
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from utils.rate_limit import SESSION_PLAN_CHECKED, SESSION_PLAN_LIMIT, get_plan_rate_limit, limiter
+
+
+@pytest.fixture(autouse=True)
+def reset_limits():
+    limiter.reset()
+    yield
+    limiter.reset()
+
+
+def test_login_rate_limit(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'LOGIN_RATE_LIMIT', '2/minute')
+    form = {'username': 'nobody', 'password': 'wrong'}
+    assert [client.post('/login', data=form).status_code for _ in range(3)] == [200, 200, 429]
+    # Лимит только на POST - форма входа открывается
+    assert client.get('/login').status_code == 200
+
+
+def test_login_limit_per_client_ip(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'LOGIN_RATE_LIMIT', '1/minute')
+    form = {'username': 'nobody', 'password': 'wrong'}
+    assert client.post('/login', data=form, environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code == 200
+    assert client.post('/login', data=form, environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code == 429
+    assert client.post('/login', data=form, environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+
+
+def test_api_limit_from_session_plan(app, make_user, login):
+    client = login(make_user())
+    with client.session_transaction() as session:
+        session[SESSION_PLAN_LIMIT] = 2
+        session[SESSION_PLAN_CHECKED] = time.time()  # иначе после запроса лимит перечитается из плана
+    statuses = [client.get('/api/subscriptions/transactions').status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+
+    # Лимит считается по пользователю, а не по IP
+    other = app.test_client()
+    with other.session_transaction() as session:
+        session['user_id'] = make_user()
+        session[SESSION_PLAN_LIMIT] = 2
+        session[SESSION_PLAN_CHECKED] = time.time()
+    assert other.get('/api/subscriptions/transactions').status_code == 200
+
+
+def test_plan_rate_limit_lookup(app, make_user, make_subscription):
+    user_id = make_user()
+    with app.app_context():
+        assert get_plan_rate_limit(user_id) is None
+    make_subscription(user_id, api_requests_per_minute=600)
+    with app.app_context():
+        assert get_plan_rate_limit(user_id) == 600
+
+
+def test_plan_limit_refreshed_after_request(app, make_user, make_subscription, login):
+    user_id = make_user()
+    make_subscription(user_id, api_requests_per_minute=600)
+    client = login(user_id)
+    client.get('/api/subscriptions/transactions')
+    with client.session_transaction() as session:
+        assert session[SESSION_PLAN_LIMIT] == 600
@@ -0,0 +1,105 @@
+import click
+import pytest
+
+from utils.rate_limit import limiter
+from utils.user_import import _hash_chunk, read_chunks
+
+METHOD = 'pbkdf2:sha256:1000'
+
+
+@pytest.fixture(autouse=True)
+def reset_limits():
+    limiter.reset()
+    yield
+    limiter.reset()
+
+
+def register(client, username, email):
+    return client.post('/register/', data={'username': username, 'email': email, 'password': 'secret'})
+
+
+def flashes(client):
+    with client.session_transaction() as session:
+        return [message for _, message in session.get('_flashes', [])]
+
+
+def test_register_and_duplicates(app, client):
+    from models.users.main_user_db import User
+
+    response = register(client, 'NewUser', ' New.User@Example.com ')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/login')
+    with app.app_context():
+        user = User.query.filter_by(username='NewUser').one()
+        assert user.email == 'new.user@example.com'
+        assert user.check_password('secret')
+
+    # Уникальность без учета регистра - на уровне индексов lower(username) и lower(email)
+    client.get('/register/')
+    response = register(client, 'newuser', 'other@example.com')
+    assert response.headers['Location'].endswith('/register/')
+    assert flashes(client) == ['Имя пользователя уже занято.']
+
+    client.get('/register/')
+    register(client, 'another', 'NEW.USER@example.com')
+    assert flashes(client) == ['Пользователь с таким email уже зарегистрирован.']
+
+
+def write_csv(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_read_chunks(tmp_path):
+    path = write_csv(tmp_path / 'users.csv', 'username,email,password\n'
+                     + ''.join(f' user{i} ,User{i}@Example.com,pw{i}\n' for i in range(5)))
+    chunks = list(read_chunks(path, chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert chunks[0][0] == ('user0', 'user0@example.com', 'pw0', None)
+
+
+def test_read_chunks_requires_columns(tmp_path):
+    path = write_csv(tmp_path / 'users.csv', 'username,password\nuser,pw\n')
+    with pytest.raises(click.UsageError):
+        list(read_chunks(path, chunk_size=10))
+
+
+def test_read_chunks_rejects_invalid_rows(tmp_path):
+    path = write_csv(tmp_path / 'users.csv', 'username,email,password\n'
+                     'good,good@example.com,pw\n'
+                     ' ,blank@example.com,pw\n'
+                     'noemail,,pw\n'
+                     'short\n'
+                     f'{"x" * 151},long@example.com,pw\n'
+                     'nopassword,nopassword@example.com,\n')
+    rejected = []
+    chunks = list(read_chunks(path, chunk_size=10, rejected=rejected))
+    assert chunks == [[('good', 'good@example.com', 'pw', None)]]
+    assert rejected == [
+        (3, 'empty username'),
+        (4, 'empty email'),
+        (5, 'empty email'),
+        (6, 'username or email longer than 150 characters'),
+        (7, 'empty password'),
+    ]
+
+
+def test_import_requires_postgresql(app, tmp_path):
+    path = write_csv(tmp_path / 'users.csv', 'username,email,password\nuser,user@example.com,pw\n')
+    result = app.test_cli_runner().invoke(args=['import-users', path, '--workers', '1'])
+    assert result.exit_code == 1
+    assert 'needs PostgreSQL' in result.output
+
+
+def test_hash_chunk_keeps_existing_hashes():
+    from werkzeug.security import check_password_hash
+
+    rows = _hash_chunk([
+        ('a', 'a@example.com', 'pw-a', None),
+        ('b', 'b@example.com', None, 'pbkdf2:sha256:1$salt$hash'),
+        ('c', 'c@example.com', 'pw-c', None),
+    ], METHOD)
+    assert [row[:2] for row in rows] == [('a', 'a@example.com'), ('b', 'b@example.com'), ('c', 'c@example.com')]
+    assert check_password_hash(rows[0][2], 'pw-a')
+    assert rows[1][2] == 'pbkdf2:sha256:1$salt$hash'
+    assert check_password_hash(rows[2][2], 'pw-c')
@@ -0,0 +1,128 @@
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils.sampling_profiler import SamplingProfiler, collapse_stack, format_collapsed
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    profiler = SamplingProfiler()
+    profiler.init_app(SimpleNamespace(config={'PROFILE_DIR': str(tmp_path)}))
+    yield profiler
+    profiler.stop()
+
+
+def busy(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_collapse_stack_root_first():
+    stack = collapse_stack(sys._getframe())
+    assert stack.endswith('test_sampling_profiler.py:test_collapse_stack_root_first')
+
+
+def test_format_collapsed_sorted_by_count():
+    assert format_collapsed({'a;b': 2, 'a;c': 5}) == 'a;c 5\na;b 2'
+
+
+def test_session_collects_and_saves_result(profiler):
+    stop = threading.Event()
+    worker = threading.Thread(target=busy, args=(stop,))
+    worker.start()
+    try:
+        assert profiler.start_session(interval=0.005, duration=0.3)
+        # Вторая сессия не стартует, пока идет первая
+        assert not profiler.start_session(interval=0.005, duration=0.3)
+        profiler._thread.join(5)
+    finally:
+        stop.set()
+        worker.join()
+
+    session = profiler.read_control()['session']
+    collapsed, pids = profiler.merged(session)
+    assert pids == [os.getpid()]
+    assert 'test_sampling_profiler.py:busy' in collapsed
+    assert profiler.status()['samples'] > 0
+
+
+def test_stop_session_stops_worker_threads(profiler, monkeypatch):
+    monkeypatch.setattr(SamplingProfiler, 'SYNC_INTERVAL', 0.05)
+    assert profiler.start_session(interval=0.005, duration=60)
+    assert profiler.is_running()
+    profiler.stop_session()
+    profiler._thread.join(5)
+    assert not profiler.is_running()
+    assert profiler.read_control()['until'] <= time.time()
+
+
+def test_sync_joins_new_session(profiler, tmp_path):
+    other = SamplingProfiler()
+    other.init_app(SimpleNamespace(config={'PROFILE_DIR': str(tmp_path)}))
+    # Другой воркер запустил сессию - этот подключается на ближайшем запросе
+    other._write_control({'session': 'shared', 'interval': 0.005, 'until': time.time() + 0.2})
+    profiler.sync()
+    assert profiler.is_running()
+    assert profiler.session == 'shared'
+    profiler._thread.join(5)
+    assert profiler.merged('shared')[1] == [os.getpid()]
+
+
+def test_merged_sums_workers_and_cleanup(profiler, tmp_path):
+    (tmp_path / 's1-101.collapsed').write_text('a;b 2\na;c 1')
+    (tmp_path / 's1-202.collapsed').write_text('a;b 3')
+    (tmp_path / 's0-101.collapsed').write_text('old 1')
+
+    assert profiler.merged('s1') == ('a;b 5\na;c 1', [101, 202])
+
+    profiler.cleanup('s1')
+    assert sorted(os.listdir(tmp_path)) == ['s1-101.collapsed', 's1-202.collapsed']
+
+
+@pytest.fixture
+def profile_client(monkeypatch):
+    from flask import Flask
+
+    import utils.auth
+    from api import debug_profiler
+
+    started = []
+    fake = debug_profiler.sampling_profiler
+    monkeypatch.setattr(fake, 'init_app', lambda app: None)
+    monkeypatch.setattr(fake, 'sync', lambda: None)
+    monkeypatch.setattr(fake, 'start_session', lambda interval, duration: started.append((interval, duration)) or True)
+    monkeypatch.setattr(fake, 'read_control', lambda: {'session': 'test', 'until': 0})
+    monkeypatch.setattr(fake, 'merged', lambda session: ('', []))
+    monkeypatch.setattr(fake, 'cleanup', lambda session: None)
+    monkeypatch.setattr(fake, 'status', lambda: {})
+    monkeypatch.setattr(utils.auth, 'load_user_model', lambda: SimpleNamespace(is_admin=lambda: True))
+
+    app = Flask(__name__)
+    app.config['WORKER_TIMEOUT'] = 30
+    app.register_blueprint(debug_profiler.debug_profiler_bpp)
+    return app.test_client(), started
+
+
+@pytest.mark.parametrize('query, interval', [
+    ('interval_ms=0', 0.001),
+    ('interval_ms=-5', 0.001),
+    ('interval_ms=5000', 1.0),
+    ('interval_ms=20', 0.02),
+])
+def test_start_clamps_interval(profile_client, query, interval):
+    client, started = profile_client
+    assert client.post(f'/debug/profile/start?{query}&seconds=5').status_code == 200
+    assert started == [(interval, 5.0)]
+
+
+@pytest.mark.parametrize('query', ['interval_ms=fast', 'interval_ms=nan', 'seconds=abc', 'seconds=inf'])
+def test_start_rejects_bad_numbers(profile_client, query):
+    client, started = profile_client
+    response = client.post(f'/debug/profile/start?{query}')
+    assert response.status_code == 400
+    assert started == []
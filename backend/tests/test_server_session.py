@@ -0,0 +1,123 @@
+import time
+
+import pytest
+from flask import Flask, session
+
+from utils.server_session import MemorySessionStore, RedisSessionStore, ServerSessionInterface
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def store(request):
+    if request.param == 'memory':
+        return MemorySessionStore()
+    fakeredis = pytest.importorskip('fakeredis')
+    return RedisSessionStore(fakeredis.FakeRedis(), prefix='test-sess:')
+
+
+def test_store_round_trip(store):
+    data = {'user_id': 1, '_flashes': [('info', 'hello')]}
+    store.save('sid-1', data, ttl=60, user_id=1)
+    assert store.load('sid-1', ttl=60) == {'user_id': 1, '_flashes': [['info', 'hello']]}
+    store.delete('sid-1', user_id=1)
+    assert store.load('sid-1', ttl=60) is None
+
+
+def test_store_revoke_user(store):
+    store.save('sid-1', {'user_id': 1}, ttl=60, user_id=1)
+    store.save('sid-2', {'user_id': 1}, ttl=60, user_id=1)
+    store.save('sid-3', {'user_id': 2}, ttl=60, user_id=2)
+    assert store.revoke_user(1) == 2
+    assert store.load('sid-1', ttl=60) is None
+    assert store.load('sid-2', ttl=60) is None
+    assert store.load('sid-3', ttl=60) == {'user_id': 2}
+
+
+def test_memory_store_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    store = MemorySessionStore()
+    store.save('sid', {'a': 1}, ttl=10)
+    now[0] += 9
+    assert store.load('sid', ttl=10) == {'a': 1}  # чтение продлевает TTL
+    now[0] += 9
+    assert store.load('sid', ttl=10) == {'a': 1}
+    now[0] += 11
+    assert store.load('sid', ttl=10) is None
+
+
+@pytest.fixture
+def session_app():
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    store = MemorySessionStore()
+    app.session_interface = ServerSessionInterface(store)
+
+    @app.route('/login/<int:user_id>')
+    def login(user_id):
+        session['user_id'] = user_id
+        return 'ok'
+
+    @app.route('/whoami')
+    def whoami():
+        return str(session.get('user_id'))
+
+    @app.route('/static-page')
+    def static_page():
+        return 'static'
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return 'bye'
+
+    app.store = store
+    return app
+
+
+def session_cookie(client):
+    cookie = client.get_cookie('session')
+    return cookie.value if cookie else None
+
+
+def test_cookie_holds_only_session_id(session_app):
+    client = session_app.test_client()
+    client.get('/login/7')
+    sid = session_cookie(client)
+    # secrets.token_urlsafe(32) - данных сессии в cookie нет
+    assert len(sid) == 43
+    assert session_app.store.load(sid, ttl=60) == {'user_id': 7}
+    assert client.get('/whoami').text == '7'
+
+
+def test_untouched_session_not_saved(session_app):
+    client = session_app.test_client()
+    response = client.get('/static-page')
+    assert 'Set-Cookie' not in response.headers
+    assert session_app.store._data == {}
+
+
+def test_login_rotates_session_id(session_app):
+    client = session_app.test_client()
+    client.get('/login/7')
+    first = session_cookie(client)
+    client.get('/login/8')
+    second = session_cookie(client)
+    assert second != first
+    assert session_app.store.load(first, ttl=60) is None
+    assert client.get('/whoami').text == '8'
+
+
+def test_logout_deletes_session(session_app):
+    client = session_app.test_client()
+    client.get('/login/7')
+    sid = session_cookie(client)
+    client.get('/logout')
+    assert session_cookie(client) is None
+    assert session_app.store.load(sid, ttl=60) is None
+
+
+def test_revoked_user_logged_out(session_app):
+    client = session_app.test_client()
+    client.get('/login/7')
+    assert session_app.store.revoke_user(7) == 1
+    assert client.get('/whoami').text == 'None'
@@ -0,0 +1,78 @@
+import logging
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, text
+
+from utils.sql_profiler import RequestSqlStats, SqlProfiler, fingerprint, logger
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def profiled_app():
+    engine = create_engine('sqlite://')
+    app = Flask(__name__)
+    profiler = SqlProfiler()
+    profiler.repeat_threshold = 3
+    profiler.instrument_engine(engine)
+    app.after_request(profiler._after_request)
+
+    @app.route('/queries/<int:count>')
+    def run_queries(count):
+        with engine.connect() as conn:
+            for i in range(count):
+                conn.execute(text('SELECT :i'), {'i': i})
+        return 'ok'
+
+    return app
+
+
+@pytest.fixture
+def warnings():
+    handler = ListHandler()
+    logger.addHandler(handler)
+    yield handler.records
+    logger.removeHandler(handler)
+
+
+def test_fingerprint():
+    statement = "SELECT *\n  FROM users WHERE name = 'it''s' AND id = 42"
+    assert fingerprint(statement) == 'SELECT * FROM users WHERE name = ? AND id = ?'
+
+
+def test_repeated_statements():
+    stats = RequestSqlStats()
+    stats.statements.update({'a': 6, 'b': 2})
+    assert stats.repeated(5) == [('a', 6)]
+
+
+def test_server_timing_header(profiled_app, warnings):
+    response = profiled_app.test_client().get('/queries/2')
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+    assert response.headers['Server-Timing'].endswith('desc="2 queries"')
+    assert warnings == []
+
+
+def test_no_header_without_queries(profiled_app):
+    response = profiled_app.test_client().get('/queries/0')
+    assert 'Server-Timing' not in response.headers
+
+
+def test_n_plus_one_warning(profiled_app, warnings):
+    profiled_app.test_client().get('/queries/5')
+    assert len(warnings) == 1
+    assert 'ran the same statement 5 times' in warnings[0].getMessage()
+
+
+def test_app_engines_instrumented(app, make_user, login):
+    client = login(make_user())
+    response = client.get('/api/subscriptions/transactions')
+    assert 'queries"' in response.headers['Server-Timing']
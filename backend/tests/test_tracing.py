@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from utils import tracing
+from utils.tracing import clear_spans, get_recent_spans, is_tracing_enabled, set_tracing_enabled, span, traced
+
+
+@pytest.fixture
+def tracing_on():
+    previous = is_tracing_enabled()
+    set_tracing_enabled(True)
+    clear_spans()
+    yield
+    set_tracing_enabled(previous)
+    clear_spans()
+
+
+@traced('sample.work', kind='test')
+def work(fail=False):
+    with span('sample.inner', step=1):
+        if fail:
+            raise ValueError('boom')
+    return 'done'
+
+
+def test_disabled_records_nothing():
+    previous = is_tracing_enabled()
+    set_tracing_enabled(False)
+    clear_spans()
+    try:
+        assert work() == 'done'
+        assert span('anything') is tracing._noop_span
+        assert get_recent_spans() == []
+    finally:
+        set_tracing_enabled(previous)
+
+
+def test_nested_spans(tracing_on):
+    assert work() == 'done'
+    spans = {item['name']: item for item in get_recent_spans()}
+    assert spans['sample.work']['attributes'] == {'kind': 'test'}
+    assert spans['sample.work']['parent_id'] is None
+    assert spans['sample.inner']['parent_id'] == spans['sample.work']['span_id']
+    assert spans['sample.inner']['attributes'] == {'step': 1}
+
+
+def test_error_recorded(tracing_on):
+    with pytest.raises(ValueError):
+        work(fail=True)
+    assert {item['name']: item['error'] for item in get_recent_spans()} == {
+        'sample.work': 'ValueError', 'sample.inner': 'ValueError'
+    }
+
+
+def test_recent_spans_slowest_first(tracing_on):
+    with span('fast'):
+        pass
+    with span('slow') as current:
+        current.set_attribute('sleep', True)
+        time.sleep(0.01)
+    assert [item['name'] for item in get_recent_spans()] == ['slow', 'fast']
+    assert [item['name'] for item in get_recent_spans(min_duration_ms=5)] == ['slow']
+    assert len(get_recent_spans(limit=1)) == 1
@@ -0,0 +1,138 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from utils.usage_batch import MAX_QUANTITY, UsageBatchError, parse_usage_batch, read_body, validate_event
+
+
+def parse(body, mimetype='application/json', content_encoding=None, max_bytes=1024, max_events=10):
+    return parse_usage_batch(io.BytesIO(body), mimetype, content_encoding, max_bytes, max_events)
+
+
+def test_json_array():
+    body = json.dumps([
+        {'usage_type': 'messages', 'quantity': 3},
+        {'usage_type': 'bots', 'resource_id': 7, 'metadata': {'source': 'api'}},
+    ]).encode()
+    assert parse(body) == [
+        ({'usage_type': 'messages', 'quantity': 3, 'resource_id': None, 'metadata': None}, None),
+        ({'usage_type': 'bots', 'quantity': 1, 'resource_id': '7', 'metadata': {'source': 'api'}}, None),
+    ]
+
+
+def test_ndjson_bad_line_does_not_fail_batch():
+    body = b'{"usage_type": "messages"}\n{not json\n\n{"usage_type": "storage", "quantity": 2}\n'
+    results = parse(body, mimetype='application/x-ndjson')
+    assert [error for _, error in results] == [None, 'Invalid JSON', None]
+    assert results[2][0]['quantity'] == 2
+
+
+def test_gzip_body():
+    body = gzip.compress(json.dumps([{'usage_type': 'messages'}]).encode())
+    results = parse(body, content_encoding='gzip')
+    assert results[0][1] is None
+
+
+@pytest.mark.parametrize('body, message', [
+    (b'{"usage_type": "messages"}', 'Expected a JSON array of events'),
+    (b'[not json', 'Invalid JSON body'),
+    (b'[]', 'No events in batch'),
+])
+def test_invalid_batch(body, message):
+    with pytest.raises(UsageBatchError, match=message) as exc:
+        parse(body)
+    assert exc.value.status == 400
+
+
+def test_too_many_events():
+    body = json.dumps([{'usage_type': 'messages'}] * 11).encode()
+    with pytest.raises(UsageBatchError) as exc:
+        parse(body)
+    assert exc.value.status == 413
+
+
+def test_body_too_large():
+    with pytest.raises(UsageBatchError) as exc:
+        read_body(io.BytesIO(b'x' * 101), None, 100)
+    assert exc.value.status == 413
+
+
+def test_gzip_bomb_is_limited():
+    # Сжатое тело маленькое, но распаковывается больше лимита
+    body = gzip.compress(b' ' * 10000)
+    assert len(body) < 100
+    with pytest.raises(UsageBatchError) as exc:
+        read_body(io.BytesIO(body), 'gzip', 100)
+    assert exc.value.status == 413
+
+
+def test_invalid_gzip():
+    with pytest.raises(UsageBatchError, match='Invalid gzip body'):
+        read_body(io.BytesIO(b'not gzip'), 'gzip', 100)
+
+
+def test_truncated_gzip():
+    body = gzip.compress(b'\n'.join(json.dumps({'usage_type': 'messages'}).encode() for _ in range(50)))
+    with pytest.raises(UsageBatchError, match='Truncated gzip body') as exc:
+        read_body(io.BytesIO(body[:len(body) // 2]), 'gzip', 10000)
+    assert exc.value.status == 400
+
+
+def test_unsupported_encoding():
+    with pytest.raises(UsageBatchError) as exc:
+        read_body(io.BytesIO(b'[]'), 'br', 100)
+    assert exc.value.status == 415
+
+
+@pytest.mark.parametrize('item, error', [
+    ([], 'Event must be an object'),
+    ({}, 'Usage type is required'),
+    ({'usage_type': 'minutes'}, 'Invalid usage type. Must be messages, bots, or storage'),
+    ({'usage_type': 'messages', 'quantity': 0}, 'Quantity must be a positive integer'),
+    ({'usage_type': 'messages', 'quantity': True}, 'Quantity must be a positive integer'),
+    ({'usage_type': 'messages', 'quantity': 1.5}, 'Quantity must be a positive integer'),
+    ({'usage_type': 'messages', 'quantity': MAX_QUANTITY + 1}, 'Quantity must be a positive integer'),
+    ({'usage_type': 'messages', 'resource_id': 'x' * 101}, 'Resource id must be a string of at most 100 characters'),
+    ({'usage_type': 'messages', 'resource_id': False}, 'Resource id must be a string of at most 100 characters'),
+    ({'usage_type': 'messages', 'metadata': 'text'}, 'Metadata must be an object'),
+])
+def test_validate_event_errors(item, error):
+    assert validate_event(item) == (None, error)
+
+
+def test_batch_endpoint(make_user, login):
+    client = login(make_user())
+    body = '\n'.join(json.dumps(event) for event in [
+        {'usage_type': 'messages', 'quantity': 2},
+        {'usage_type': 'minutes'},
+    ])
+    response = client.post(
+        '/api/subscriptions/track-usage/batch', data=body, content_type='application/x-ndjson'
+    )
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data['accepted'], data['rejected']) == (1, 1)
+    assert data['results'][0] == {'index': 0, 'success': True}
+    assert data['results'][1]['error'] == 'Invalid usage type. Must be messages, bots, or storage'
+
+
+def test_batch_endpoint_rejects_encoding(make_user, login):
+    client = login(make_user())
+    response = client.post(
+        '/api/subscriptions/track-usage/batch', data=b'[]', content_type='application/json',
+        headers={'Content-Encoding': 'br'}
+    )
+    assert response.status_code == 415
+
+
+def test_batch_endpoint_rejects_truncated_gzip(make_user, login):
+    client = login(make_user())
+    body = gzip.compress(json.dumps([{'usage_type': 'messages'}] * 20).encode())
+    response = client.post(
+        '/api/subscriptions/track-usage/batch', data=body[:-8], content_type='application/json',
+        headers={'Content-Encoding': 'gzip'}
+    )
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Truncated gzip body'
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.subscription_service import subscription_service
+
+
+@pytest.fixture
+def app_ctx(app):
+    with app.app_context():
+        yield
+
+
+def subscription_counters(subscription_id):
+    from models.imp import db
+    from models.subscription.user_subscription import UserSubscription
+
+    db.session.expire_all()
+    subscription = db.session.get(UserSubscription, subscription_id)
+    return subscription.bots_created, subscription.messages_used_this_cycle, subscription.storage_used_mb
+
+
+def tracked(user_id, usage_type):
+    from models.subscription.usage_tracker import UsageTracker
+
+    return [row.quantity for row in UsageTracker.query.filter_by(user_id=user_id, usage_type=usage_type)]
+
+
+def test_bot_limit(app_ctx, make_user, make_subscription):
+    from models.subscription.usage_tracker import UsageType
+
+    user_id = make_user()
+    subscription_id = make_subscription(user_id, max_bots=2)
+    assert subscription_service.track_usage(user_id, 'bots')
+    assert subscription_service.track_usage(user_id, 'bots', metadata={'name': 'bot'})
+    with pytest.raises(ValueError, match='Bot creation limit exceeded'):
+        subscription_service.track_usage(user_id, 'bots')
+
+    assert subscription_counters(subscription_id)[0] == 2
+    assert tracked(user_id, UsageType.BOT_CREATION) == [1, 1]
+
+
+def test_storage_limit_by_quantity(app_ctx, make_user, make_subscription):
+    from models.subscription.usage_tracker import UsageType
+
+    user_id = make_user()
+    subscription_id = make_subscription(user_id, max_storage_mb=10)
+    subscription_service.track_usage(user_id, 'storage', quantity=7)
+    with pytest.raises(ValueError, match='Storage limit exceeded'):
+        subscription_service.track_usage(user_id, 'storage', quantity=4)
+    subscription_service.track_usage(user_id, 'storage', quantity=3)
+
+    assert subscription_counters(subscription_id)[2] == 10
+    assert tracked(user_id, UsageType.STORAGE_UPLOAD) == [7, 3]
+
+
+def test_messages_checked_in_database_without_quota_store(app_ctx, make_user, make_subscription, monkeypatch):
+    from services.quota_engine import quota_engine
+
+    # Хранилище квот недоступно - проверка идет условным UPDATE в БД
+    monkeypatch.setattr(quota_engine, '_down_until', float('inf'))
+    user_id = make_user()
+    subscription_id = make_subscription(user_id, max_messages_per_month=5)
+    subscription_service.track_usage(user_id, 'messages', quantity=4)
+    with pytest.raises(ValueError, match='Monthly message limit exceeded'):
+        subscription_service.track_usage(user_id, 'messages', quantity=2)
+
+    assert subscription_counters(subscription_id)[1] == 4
+
+
+@pytest.mark.parametrize('is_hard, limit_value, allowed', [(True, 3, 3), (False, 10, 11)])
+def test_database_path_applies_user_usage_limit(app_ctx, make_user, make_subscription, monkeypatch,
+                                                 is_hard, limit_value, allowed):
+    from models.imp import db
+    from models.subscription.usage_limit import UsageLimit, LimitType
+    from services.quota_engine import quota_engine
+
+    monkeypatch.setattr(quota_engine, '_down_until', float('inf'))
+    user_id = make_user()
+    subscription_id = make_subscription(user_id, max_messages_per_month=50)
+    now = datetime.utcnow()
+    usage_limit = UsageLimit(user_id=user_id, subscription_id=subscription_id, limit_type=LimitType.MESSAGES_PER_MONTH,
+                             limit_value=limit_value, is_hard_limit=is_hard,
+                             period_start=now, period_end=now + timedelta(days=30))
+    db.session.add(usage_limit)
+    db.session.commit()
+
+    subscription_service.track_usage(user_id, 'messages', quantity=allowed)
+    with pytest.raises(ValueError, match='Monthly message limit exceeded'):
+        subscription_service.track_usage(user_id, 'messages')
+
+    assert subscription_counters(subscription_id)[1] == allowed
+    db.session.expire_all()
+    assert db.session.get(UsageLimit, usage_limit.id).current_usage == allowed
+
+
+def test_user_without_subscription_uses_free_limits(app_ctx, make_user):
+    from models.subscription.usage_tracker import UsageType
+
+    user_id = make_user()
+    subscription_service.track_usage(user_id, 'storage', quantity=5)
+    with pytest.raises(ValueError, match='Free user bot creation limit exceeded'):
+        subscription_service.track_usage(user_id, 'bots')
+
+    assert tracked(user_id, UsageType.STORAGE_UPLOAD) == [5]
+    assert tracked(user_id, UsageType.BOT_CREATION) == []
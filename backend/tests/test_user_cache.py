@@ -0,0 +1,70 @@
+import time
+
+from flask import g, session
+
+from utils.auth import UserIdentityCache, get_current_user, load_user_model, user_cache
+
+
+def test_cache_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = UserIdentityCache(ttl=30, maxsize=10)
+    cache.set(1, 'identity')
+    assert cache.get(1) == 'identity'
+    now[0] += 31
+    assert cache.get(1) is None
+
+
+def test_cache_lru_eviction():
+    cache = UserIdentityCache(ttl=30, maxsize=2)
+    cache.set(1, 'a')
+    cache.set(2, 'b')
+    cache.get(1)  # 1 использован недавно - вытесняется 2
+    cache.set(3, 'c')
+    assert (cache.get(1), cache.get(2), cache.get(3)) == ('a', None, 'c')
+
+
+def test_cache_disabled():
+    assert not UserIdentityCache(ttl=0, maxsize=10).enabled
+    assert not UserIdentityCache(ttl=30, maxsize=0).enabled
+
+
+def test_current_user_loaded_once_and_cached(app, make_user):
+    user_id = make_user(role='admin')
+    user_cache.invalidate(user_id)
+
+    with app.test_request_context():
+        session['user_id'] = user_id
+        identity = get_current_user()
+        assert identity.id == user_id
+        assert identity.is_admin()
+        assert get_current_user() is identity
+        assert g.current_user_model.id == user_id
+
+    # Следующий запрос берет пользователя из кэша, без загрузки модели
+    with app.test_request_context():
+        session['user_id'] = user_id
+        assert get_current_user() is identity
+        assert 'current_user_model' not in g
+
+
+def test_update_invalidates_cache(app, make_user):
+    from models.imp import db
+
+    user_id = make_user()
+    with app.test_request_context():
+        session['user_id'] = user_id
+        assert get_current_user().role == 'user'
+        user = load_user_model()
+        user.role = 'moderator'
+        db.session.commit()
+
+    assert user_cache.get(user_id) is None
+    with app.test_request_context():
+        session['user_id'] = user_id
+        assert get_current_user().role == 'moderator'
+
+
+def test_anonymous(app):
+    with app.test_request_context():
+        assert get_current_user() is None
@@ -0,0 +1,50 @@
+import pytest
+
+from api import user_status
+
+
+def test_status_etag(make_user, login):
+    client = login(make_user())
+    response = client.get('/profile/status')
+    assert response.status_code == 200
+    assert response.get_json()['is_active'] is True
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    cached = client.get('/profile/status', headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+
+
+@pytest.fixture
+def stream_config(app, monkeypatch):
+    monkeypatch.setattr(user_status, '_stream_slots', None)
+    monkeypatch.setitem(app.config, 'USER_STATUS_STREAM_ENABLED', True)
+    monkeypatch.setitem(app.config, 'USER_STATUS_STREAM_HEARTBEAT', 0.05)
+    monkeypatch.setitem(app.config, 'USER_STATUS_STREAM_TIMEOUT', 0.2)
+    return app.config
+
+
+def test_stream_disabled_without_spare_thread(stream_config, make_user, login):
+    stream_config['WORKER_THREADS'] = 1  # sync воркер: поток нельзя занять SSE
+    client = login(make_user())
+    assert client.get('/profile/status/stream').status_code == 204
+
+
+def test_stream_slot_released_on_close(stream_config, make_user, login):
+    stream_config['WORKER_THREADS'] = 2  # один поток под SSE, второй - для остальных запросов
+    client = login(make_user())
+
+    first = client.get('/profile/status/stream', buffered=False)
+    assert first.status_code == 200
+    assert next(first.response).startswith(b'retry: ')
+    assert client.get('/profile/status/stream').status_code == 503
+
+    # Клиент ушел, не дочитав поток - слот освобождается при закрытии ответа
+    first.close()
+    second = client.get('/profile/status/stream', buffered=False)
+    assert second.status_code == 200
+    second.close()
+
+
+def test_stream_anonymous(stream_config, client):
+    stream_config['WORKER_THREADS'] = 4
+    assert client.get('/profile/status/stream').status_code == 204
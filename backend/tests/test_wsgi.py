@@ -0,0 +1,21 @@
+"""Точка входа gunicorn (wsgi:app) импортируется и отдает страницы"""
+
+
+def test_wsgi_app_imports(app):
+    import wsgi
+
+    assert wsgi.app is app
+    rules = {rule.rule for rule in app.url_map.iter_rules()}
+    assert '/login' in rules
+    assert '/metrics' in rules
+    assert '/api/subscriptions/track-usage/batch' in rules
+
+
+def test_debug_endpoints_disabled_by_default(app):
+    rules = {rule.rule for rule in app.url_map.iter_rules()}
+    assert not any(rule.startswith('/debug/') for rule in rules)
+
+
+def test_login_page(client):
+    response = client.get('/login')
+    assert response.status_code == 200
@@ -0,0 +1,101 @@
+import json
+import random
+import time
+import uuid
+from flask import request, g, session
+from utils.logs_service import init_logger
+
+access_logger = init_logger('access')
+
+
+class LazyJsonRecord:
+    """Сообщение для логгера, которое сериализуется в JSON только при записи"""
+
+    __slots__ = ('fields',)
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def __str__(self):
+        return json.dumps(self.fields, ensure_ascii=False, default=str)
+
+
+def _status_class(status_code):
+    return f"{status_code // 100}xx"
+
+
+class AccessLog:
+    """Структурированный access-лог: одна JSON-запись на запрос с семплированием по статусу"""
+
+    def __init__(self, app=None):
+        self.sample_rates = {}
+        self.exclude_prefixes = ()
+        self.request_id_header = 'X-Request-ID'
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.sample_rates = app.config.get('ACCESS_LOG_SAMPLE_RATES', {})
+        self.exclude_prefixes = tuple(app.config.get('ACCESS_LOG_EXCLUDE_PATHS', ()))
+        self.request_id_header = app.config.get('ACCESS_LOG_REQUEST_ID_HEADER', 'X-Request-ID')
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.extensions['access_log'] = self
+
+    def should_log(self, path, status_code):
+        """Решение о записи принимается до сборки записи, чтобы отброшенные запросы ничего не стоили"""
+        if path.startswith(self.exclude_prefixes):
+            return False
+
+        rate = self.sample_rates.get(_status_class(status_code), 1.0)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        return random.random() < rate
+
+    def _before_request(self):
+        g.start_time = time.perf_counter()
+        g.request_id = request.headers.get(self.request_id_header) or uuid.uuid4().hex
+
+    def _after_request(self, response):
+        request_id = getattr(g, 'request_id', None)
+        if request_id:
+            response.headers.setdefault(self.request_id_header, request_id)
+
+        if not self.should_log(request.path, response.status_code):
+            return response
+
+        start_time = getattr(g, 'start_time', None)
+        duration_ms = (time.perf_counter() - start_time) * 1000 if start_time else None
+
+        fields = {
+            'request_id': request_id,
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 3) if duration_ms is not None else None,
+            'bytes': response.calculate_content_length(),
+            'user_id': session.get('user_id'),
+            'remote_addr': request.remote_addr
+        }
+
+        # Другие подсистемы могут дописать свои поля в g.access_log_extra
+        extra = getattr(g, 'access_log_extra', None)
+        if extra:
+            fields.update(extra)
+
+        access_logger.info(LazyJsonRecord(fields))
+        return response
+
+
+def add_access_log_field(name, value):
+    """Добавить поле в access-запись текущего запроса"""
+    if not hasattr(g, 'access_log_extra'):
+        g.access_log_extra = {}
+    g.access_log_extra[name] = value
+
+
+access_log = AccessLog()
@@ -0,0 +1,123 @@
+import atexit
+import os
+import threading
+from datetime import datetime
+from sqlalchemy import text
+from utils.logs_service import init_logger
+
+logger = init_logger('activity_buffer')
+
+# Колонки user, которые можно обновлять отложенно (точность до секунд не нужна)
+ACTIVITY_COLUMNS = ('last_login',)
+
+
+class ActivityBuffer:
+    """Отложенная запись времени входа пользователей.
+
+    Вход только запоминает время в памяти процесса. Фоновый поток раз в
+    flush_interval секунд (граница устаревания) пишет накопленное одним
+    UPDATE ... FROM (VALUES ...), повторные входы одного пользователя схлопываются.
+    Остаток сбрасывается при остановке воркера.
+    """
+
+    def __init__(self, flush_interval=10.0, max_pending=5000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.engine = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app, db):
+        self.flush_interval = app.config['ACTIVITY_FLUSH_INTERVAL']
+        self.max_pending = app.config['ACTIVITY_MAX_PENDING']
+        with app.app_context():
+            self.engine = db.engine
+        atexit.register(self.flush)
+
+    def record(self, user_id, column='last_login', when=None):
+        if column not in ACTIVITY_COLUMNS:
+            raise ValueError(f"Unsupported activity column: {column}")
+        when = when or datetime.utcnow()
+        key = (column, user_id)
+        with self._lock:
+            previous = self._pending.get(key)
+            if previous is None or previous < when:
+                self._pending[key] = when
+            overflow = len(self._pending) >= self.max_pending
+        self._ensure_thread()
+        if overflow:
+            self._wakeup.set()
+
+    def record_login(self, user_id):
+        self.record(user_id, 'last_login')
+
+    def _ensure_thread(self):
+        # Поток запускается лениво в каждом воркере: после fork потоков мастера нет
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='activity-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush user activity: {e}")
+
+    def flush(self):
+        """Записать накопленное. Возвращает число обновленных пользователей"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or self.engine is None:
+            return 0
+
+        by_column = {}
+        for (column, user_id), when in pending.items():
+            by_column.setdefault(column, []).append((user_id, when))
+
+        try:
+            with self.engine.begin() as conn:
+                for column, rows in by_column.items():
+                    self._update(conn, column, rows)
+        except Exception:
+            # Вернуть в буфер, не затирая более свежие значения
+            with self._lock:
+                for key, when in pending.items():
+                    current = self._pending.get(key)
+                    if current is None or current < when:
+                        self._pending[key] = when
+            raise
+        return len(pending)
+
+    def _update(self, conn, column, rows):
+        if conn.dialect.name != 'postgresql':
+            conn.execute(
+                text(f'UPDATE "user" SET {column} = :ts WHERE id = :id AND ({column} IS NULL OR {column} < :ts)'),
+                [{'id': user_id, 'ts': when} for user_id, when in rows]
+            )
+            return
+
+        params = {}
+        values = []
+        for i, (user_id, when) in enumerate(rows):
+            params[f'id{i}'] = user_id
+            params[f'ts{i}'] = when
+            values.append(f'(CAST(:id{i} AS INTEGER), CAST(:ts{i} AS TIMESTAMP))')
+        conn.execute(text(
+            f'UPDATE "user" AS u SET {column} = v.ts '
+            f'FROM (VALUES {", ".join(values)}) AS v(id, ts) '
+            f'WHERE u.id = v.id AND (u.{column} IS NULL OR u.{column} < v.ts)'
+        ), params)
+
+
+activity_buffer = ActivityBuffer()
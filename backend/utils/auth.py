@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import session, abort, g, flash, redirect, url_for, jsonify
+from sqlalchemy import event
+from werkzeug.local import LocalProxy
+from config import Config
+from models.models_all_rout_imp import User
+
+
+class UserIdentity:
+    """Снимок редко меняющихся полей пользователя - без пароля и связей"""
+
+    __slots__ = ('id', 'username', 'email', 'role', 'is_active', 'subscription_type', 'created_at')
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.role = user.role
+        self.is_active = user.is_active
+        self.subscription_type = user.subscription_type
+        self.created_at = user.created_at
+
+    def __repr__(self):
+        return f"<UserIdentity {self.username}>"
+
+    # Проверки ролей те же, что и у модели User
+    is_admin = User.is_admin
+    is_moderator = User.is_moderator
+    is_super_admin = User.is_super_admin
+    can_manage_users = User.can_manage_users
+    can_ban_users = User.can_ban_users
+    can_manage_templates = User.can_manage_templates
+    can_view_admin_panel = User.can_view_admin_panel
+
+
+class UserIdentityCache:
+    """Небольшой LRU кэш UserIdentity с TTL в пределах процесса.
+
+    Изменение или удаление пользователя в этом процессе сразу сбрасывает запись,
+    изменения из других воркеров становятся видны не позже чем через ttl секунд.
+    """
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.maxsize > 0
+
+    def get(self, user_id):
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is None:
+                return None
+            expires_at, identity = item
+            if expires_at < time.monotonic():
+                del self._items[user_id]
+                return None
+            self._items.move_to_end(user_id)
+            return identity
+
+    def set(self, user_id, identity):
+        with self._lock:
+            self._items[user_id] = (time.monotonic() + self.ttl, identity)
+            self._items.move_to_end(user_id)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+user_cache = UserIdentityCache(Config.USER_CACHE_TTL, Config.USER_CACHE_MAXSIZE)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
+
+def get_current_user():
+    """Пользователь текущей сессии (UserIdentity) или None. Загружается не больше раза за запрос"""
+    if 'current_user' in g:
+        return g.current_user
+
+    identity = None
+    user_id = session.get('user_id')
+    if user_id:
+        identity = user_cache.get(user_id) if user_cache.enabled else None
+        if identity is None:
+            user = load_user_model()
+            if user is not None:
+                identity = UserIdentity(user)
+                if user_cache.enabled:
+                    user_cache.set(user_id, identity)
+
+    g.current_user = identity
+    return identity
+
+
+def load_user_model():
+    """ORM объект пользователя сессии - для изменений и проверки пароля. Один запрос за запрос"""
+    if 'current_user_model' not in g:
+        user_id = session.get('user_id')
+        g.current_user_model = User.query.get(user_id) if user_id else None
+    return g.current_user_model
+
+
+current_user = LocalProxy(get_current_user)
+
+
+def login_required(view):
+    """Страницы только для вошедших: иначе редирект на форму входа"""
+
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if get_current_user() is None:
+            flash('Пожалуйста, войдите в систему, чтобы получить доступ к этой странице.', 'danger')
+            return redirect(url_for('oauth_bpp.login'))
+        return view(*args, **kwargs)
+
+    return wrapped
+
+
+def api_login_required(view):
+    """API только для вошедших: иначе JSON 401.
+
+    Проверяет только наличие user_id в сессии, без запроса к БД
+    """
+
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not session.get('user_id'):
+            return jsonify({
+                'success': False,
+                'error': 'User not authenticated'
+            }), 401
+        return view(*args, **kwargs)
+
+    return wrapped
+
+
+def admin_required(view):
+    """Пускать только администраторов, остальным 403.
+
+    Роль читается из БД, а не из кэша, чтобы снятие прав действовало сразу во всех воркерах
+    """
+
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        user = load_user_model()
+        if not user or not user.is_admin():
+            abort(403)
+        return view(*args, **kwargs)
+
+    return wrapped
@@ -0,0 +1,50 @@
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, NullPool
+from utils.metrics import db_pool_checkout_wait_seconds, db_pool_checkout_timeouts_total
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, который меряет ожидание свободного соединения"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            db_pool_checkout_timeouts_total.inc()
+            raise
+        finally:
+            db_pool_checkout_wait_seconds.observe(time.perf_counter() - start)
+
+
+def build_engine_options(config):
+    """Собрать SQLALCHEMY_ENGINE_OPTIONS из настроек DB_POOL_*.
+
+    DB_POOL_MODE:
+      queue     - свой пул в каждом воркере (размер, overflow, recycle, pre-ping)
+      pgbouncer - пулингом занимается PgBouncer в режиме transaction, воркер
+                  не держит соединения между запросами (NullPool)
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    uri = config.get('SQLALCHEMY_DATABASE_URI', '')
+
+    if uri.startswith('sqlite'):
+        return options
+
+    if config.get('DB_POOL_MODE') == 'pgbouncer':
+        # Соединение к PgBouncer дешевое и живет один checkout, поэтому pre-ping не нужен.
+        # psycopg2 не использует серверные prepared statements, так что transaction-режим безопасен
+        options['poolclass'] = NullPool
+        return options
+
+    options.update({
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_POOL_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_use_lifo': True
+    })
+    return options
@@ -0,0 +1,159 @@
+import functools
+import threading
+import time
+from contextvars import ContextVar
+from flask import g, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from config import Config
+from utils.logs_service import init_logger
+
+logger = init_logger('db_routing')
+
+REPLICA_BIND = 'replica'
+
+# Глубина вложенности read_only: >0 - текущий код только читает
+_read_only_depth = ContextVar('read_only_depth', default=0)
+
+
+def read_only(func):
+    """Пометить view или метод сервиса как только читающий - чтения пойдут на реплику"""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _read_only_depth.set(_read_only_depth.get() + 1)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _read_only_depth.reset(token)
+
+    return wrapper
+
+
+# Отставание реплики в секундах. Если все полученное от primary уже применено, отставания
+# нет: иначе при простое primary now() - время последней транзакции растет и все чтения
+# уходили бы на primary как раз в тихие периоды
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaHealth:
+    """Кэшированная проверка реплики: доступна ли и не слишком ли отстает"""
+
+    def __init__(self, max_lag, check_interval):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.healthy = True
+        self.lag = 0.0
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def is_healthy(self, engine):
+        if time.monotonic() - self.checked_at < self.check_interval:
+            return self.healthy
+
+        # Проверяет только один поток, остальные пока используют прошлый результат
+        if not self._lock.acquire(blocking=False):
+            return self.healthy
+        try:
+            self._check(engine)
+        finally:
+            self.checked_at = time.monotonic()
+            self._lock.release()
+        return self.healthy
+
+    def _check(self, engine):
+        try:
+            with engine.connect() as conn:
+                if engine.dialect.name == 'postgresql':
+                    lag = conn.execute(REPLICA_LAG_SQL).scalar()
+                else:
+                    conn.execute(text("SELECT 1"))
+                    lag = 0
+            self.lag = float(lag or 0)
+            healthy = self.lag <= self.max_lag
+            if not healthy:
+                logger.warning(f"Replica lag {self.lag:.1f}s exceeds {self.max_lag}s, reading from primary")
+        except Exception as e:
+            logger.warning(f"Replica is unavailable, reading from primary: {e}")
+            healthy = False
+        self.healthy = healthy
+
+    def mark_failed(self):
+        self.healthy = False
+        self.checked_at = time.monotonic()
+
+
+replica_health = ReplicaHealth(Config.DB_REPLICA_MAX_LAG, Config.DB_REPLICA_HEALTH_INTERVAL)
+
+
+def _wrote_in_this_request():
+    return has_request_context() and g.get('db_wrote', False)
+
+
+def _sticky_to_primary():
+    """После записи пользователь какое-то время читает с primary, чтобы не видеть отставание реплики"""
+    if not has_request_context() or not Config.DB_REPLICA_STICKY_SECONDS:
+        return False
+    until = flask_session.get('_db_primary_until')
+    return until is not None and until > time.time()
+
+
+class RoutingSession(Session):
+    """Сессия, которая отправляет чтения из read_only кода на реплику.
+
+    На primary остается все остальное: записи, flush, чтения после записи
+    в том же запросе, а также все запросы, когда реплика недоступна или отстает.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica():
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self):
+        if _read_only_depth.get() <= 0:
+            return False
+        if REPLICA_BIND not in self._db.engines:
+            return False
+        if self._flushing or self.new or self.dirty or self.deleted:
+            return False
+        if _wrote_in_this_request() or _sticky_to_primary():
+            return False
+        return replica_health.is_healthy(self._db.engines[REPLICA_BIND])
+
+
+def _on_after_flush(session, flush_context):
+    if has_request_context():
+        g.db_wrote = True
+
+
+def _on_do_orm_execute(orm_execute_state):
+    # UPDATE/DELETE/INSERT через session.execute() тоже считаются записью
+    if has_request_context() and not orm_execute_state.is_select:
+        g.db_wrote = True
+
+
+def _on_after_commit(session):
+    if has_request_context() and g.get('db_wrote') and Config.DB_REPLICA_STICKY_SECONDS:
+        flask_session['_db_primary_until'] = time.time() + Config.DB_REPLICA_STICKY_SECONDS
+
+
+event.listen(RoutingSession, 'after_flush', _on_after_flush)
+event.listen(RoutingSession, 'after_commit', _on_after_commit)
+event.listen(RoutingSession, 'do_orm_execute', _on_do_orm_execute)
+
+
+def init_db_routing(app, db):
+    """Ошибка соединения с репликой сразу переключает чтения на primary до следующей проверки"""
+    with app.app_context():
+        if REPLICA_BIND not in db.engines:
+            return
+        replica_engine = db.engines[REPLICA_BIND]
+
+    @event.listens_for(replica_engine, 'handle_error')
+    def _on_replica_error(exception_context):
+        if exception_context.is_disconnect or exception_context.connection is None:
+            replica_health.mark_failed()
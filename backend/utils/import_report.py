@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import click
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(output):
+    """Разобрать вывод python -X importtime в список (модуль, self_us, cumulative_us)"""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return rows
+
+
+def collect_import_times(target='wsgi'):
+    """Импортировать модуль в отдельном процессе с -X importtime и вернуть замеры"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True
+    )
+    return parse_importtime(result.stderr), result.returncode
+
+
+def register_import_report_command(app):
+    """flask import-report - время импорта по модулям при старте воркера"""
+
+    @app.cli.command('import-report')
+    @click.option('--target', default='wsgi', help='Модуль, импорт которого замеряем')
+    @click.option('--top', default=30, help='Сколько самых тяжелых модулей показать')
+    @click.option('--sort', 'sort_by', type=click.Choice(['cumulative', 'self']), default='cumulative')
+    def import_report(target, top, sort_by):
+        rows, returncode = collect_import_times(target)
+        if not rows:
+            click.echo(f"Не удалось получить замеры импорта (код выхода {returncode})")
+            return
+
+        index = 2 if sort_by == 'cumulative' else 1
+        rows.sort(key=lambda row: row[index], reverse=True)
+
+        total_us = max(row[2] for row in rows)
+        click.echo(f"Импорт {target}: {total_us / 1000:.1f} ms, модулей: {len(rows)}")
+        click.echo(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for name, self_us, cumulative_us in rows[:top]:
+            click.echo(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
@@ -0,0 +1,259 @@
+"""Поиск по логам за интервал времени.
+
+Сжатые сегменты (app-*.log.gz) состоят из независимых gzip-блоков, для каждого
+блока в файле .idx хранится минимальное и максимальное время записей и смещение
+в архиве, поэтому поиск через mmap распаковывает только блоки, пересекающие
+интервал. Текущий app.log не сжат, по нему используется бинарный поиск по времени.
+
+Воркеры пишут в общий файл пачками, поэтому строки упорядочены по времени только
+с точностью до ORDER_SKEW_MS: бинарный поиск и ранний выход делаются с этим запасом,
+а каждая строка проверяется на попадание в интервал отдельно.
+
+Пример:
+    python utils/log_search.py --since "2026-10-17 10:00" --until "2026-10-17 10:15" --grep "ERROR"
+"""
+import argparse
+import glob
+import mmap
+import os
+import re
+import sys
+import zlib
+from datetime import datetime
+
+TIMESTAMP_LEN = 23  # '2026-10-17 10:00:00.123'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+INDEX_SUFFIX = '.idx'
+# Насколько строки разных воркеров могут идти не по порядку (пачка + задержка очереди)
+ORDER_SKEW_MS = 60 * 1000
+
+
+def parse_line_timestamp(line):
+    """Время записи из начала строки лога в миллисекундах или None (строки traceback)"""
+    try:
+        ts = datetime.strptime(line[:TIMESTAMP_LEN].decode('ascii'), TIMESTAMP_FORMAT)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return int(ts.timestamp() * 1000)
+
+
+def _line_prefix(line):
+    """Метка времени строки как bytes (формат фиксированной ширины сортируется как строка)"""
+    prefix = line[:TIMESTAMP_LEN]
+    if len(prefix) == TIMESTAMP_LEN and prefix[4:5] == b'-' and prefix[10:11] == b' ' and prefix[19:20] == b'.':
+        return prefix
+    return None
+
+
+def _ms_to_prefix(ms):
+    return datetime.fromtimestamp(ms / 1000).strftime(TIMESTAMP_FORMAT)[:TIMESTAMP_LEN].encode('ascii')
+
+
+def parse_user_time(value):
+    for fmt in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return int(datetime.strptime(value, fmt).timestamp() * 1000)
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"Неверный формат времени: {value}")
+
+
+def _prefix_to_ms(prefix):
+    return parse_line_timestamp(prefix) if prefix is not None else None
+
+
+def _timestamp_range(data):
+    """Минимальное и максимальное время записей блока в мс (None, None - меток нет)"""
+    low = high = None
+    for line in data.split(b'\n'):
+        prefix = _line_prefix(line)
+        if prefix is None:
+            continue
+        if low is None or prefix < low:
+            low = prefix
+        if high is None or prefix > high:
+            high = prefix
+    return _prefix_to_ms(low), _prefix_to_ms(high)
+
+
+def compress_segment(plain_path, chunk_bytes=1024 * 1024):
+    """Сжать сегмент независимыми gzip-блоками и записать разреженный индекс.
+
+    Строка индекса: <мин. время записей блока, мс> <макс. время, мс> <смещение блока в .gz>
+    """
+    gz_path = plain_path + '.gz'
+    idx_path = gz_path + INDEX_SUFFIX
+
+    size = os.path.getsize(plain_path)
+    entries = []
+    with open(plain_path, 'rb') as src, open(gz_path + '.tmp', 'wb') as dst:
+        if size:
+            with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                start = 0
+                last_ts = 0
+                while start < size:
+                    end = data.find(b'\n', min(start + chunk_bytes, size - 1))
+                    end = size if end == -1 else end + 1
+                    # Запись с traceback не разрывается между блоками: строки без метки
+                    # в начале блока не к чему было бы отнести при поиске
+                    while end < size and _line_prefix(data[end:end + TIMESTAMP_LEN]) is None:
+                        end = data.find(b'\n', end)
+                        end = size if end == -1 else end + 1
+                    chunk = data[start:end]
+
+                    # Блок без меток (только traceback) относим ко времени предыдущей записи
+                    low, high = _timestamp_range(chunk)
+                    if low is None:
+                        low = high = last_ts
+                    last_ts = high
+                    entries.append((low, high, dst.tell()))
+
+                    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 = gzip формат
+                    dst.write(compressor.compress(chunk) + compressor.flush())
+                    start = end
+
+    with open(idx_path + '.tmp', 'w') as idx:
+        for low, high, offset in entries:
+            idx.write(f"{low} {high} {offset}\n")
+
+    os.replace(gz_path + '.tmp', gz_path)
+    os.replace(idx_path + '.tmp', idx_path)
+    os.remove(plain_path)
+    return gz_path
+
+
+def read_index(idx_path):
+    """Записи индекса (мин. время, макс. время, смещение)"""
+    with open(idx_path) as idx:
+        return [tuple(int(part) for part in line.split()) for line in idx]
+
+
+def _iter_lines_in_range(lines, since_ms, until_ms, stop_ms=None):
+    """Строки с временем в [since, until]; строки без метки относятся к предыдущей записи.
+
+    Порядок строк не гарантирован, поэтому ранний выход только после записи
+    позже stop_ms (until + запас на перемешивание пачек воркеров).
+    """
+    # Сравниваем префиксы как bytes, без разбора даты на каждой строке
+    since_b = _ms_to_prefix(since_ms)
+    until_b = _ms_to_prefix(until_ms)
+    stop_b = _ms_to_prefix(stop_ms) if stop_ms is not None else None
+    current = None
+    for line in lines:
+        if not line:
+            continue
+        prefix = _line_prefix(line)
+        if prefix is not None:
+            current = prefix
+            if stop_b is not None and current > stop_b:
+                return True  # дальше только более поздние записи
+        if current is None or current < since_b or current > until_b:
+            continue
+        yield line
+    return False
+
+
+def _iter_mmap_lines(data, start):
+    """Строки из mmap начиная со смещения, без копирования всего хвоста файла"""
+    size = len(data)
+    while start < size:
+        end = data.find(b'\n', start)
+        if end == -1:
+            end = size
+        yield data[start:end]
+        start = end + 1
+
+
+def search_compressed(gz_path, since_ms, until_ms):
+    """Строки сжатого сегмента за интервал: mmap + переход к нужному блоку по индексу"""
+    entries = read_index(gz_path + INDEX_SUFFIX)
+    # Блоки, диапазон времени которых пересекает интервал
+    wanted = [i for i, (low, high, _) in enumerate(entries) if low <= until_ms and high >= since_ms]
+    if not wanted:
+        return
+
+    with open(gz_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for i in wanted:
+            start = entries[i][2]
+            end = entries[i + 1][2] if i + 1 < len(entries) else len(data)
+            chunk = zlib.decompress(data[start:end], 31)
+            yield from _iter_lines_in_range(chunk.split(b'\n'), since_ms, until_ms)
+
+
+def _line_start(data, pos):
+    prev = data.rfind(b'\n', 0, pos)
+    return prev + 1
+
+
+def _bisect_plain(data, since_ms):
+    """Бинарный поиск первой строки с временем >= since в несжатом файле"""
+    lo, hi = 0, len(data)
+    while lo < hi:
+        mid = _line_start(data, (lo + hi) // 2)
+        # ищем ближайшую строку с меткой времени начиная с mid
+        pos = mid
+        ts = None
+        while pos < hi:
+            end = data.find(b'\n', pos)
+            end = len(data) if end == -1 else end
+            ts = parse_line_timestamp(data[pos:pos + TIMESTAMP_LEN])
+            if ts is not None:
+                break
+            pos = end + 1
+        if ts is None or ts >= since_ms:
+            hi = mid
+        else:
+            lo = data.find(b'\n', pos)
+            lo = len(data) if lo == -1 else lo + 1
+    return lo
+
+
+def search_plain(path, since_ms, until_ms):
+    """Строки несжатого лога за интервал (mmap + бинарный поиск с запасом)"""
+    if not os.path.getsize(path):
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        # Строки упорядочены только с точностью до ORDER_SKEW_MS - начинаем с запасом
+        start = _bisect_plain(data, since_ms - ORDER_SKEW_MS)
+        yield from _iter_lines_in_range(
+            _iter_mmap_lines(data, start), since_ms, until_ms, stop_ms=until_ms + ORDER_SKEW_MS
+        )
+
+
+def list_segments(log_dir, base_name='app'):
+    """Сжатые сегменты по порядку и текущий файл последним"""
+    segments = sorted(glob.glob(os.path.join(log_dir, f'{base_name}-*.log.gz')))
+    plain_segments = sorted(glob.glob(os.path.join(log_dir, f'{base_name}-*.log')))
+    current = os.path.join(log_dir, f'{base_name}.log')
+    return segments, plain_segments + ([current] if os.path.exists(current) else [])
+
+
+def search(log_dir, since_ms, until_ms, pattern=None, base_name='app'):
+    regex = re.compile(pattern.encode()) if pattern else None
+    compressed, plain = list_segments(log_dir, base_name)
+
+    sources = [search_compressed(path, since_ms, until_ms) for path in compressed]
+    sources += [search_plain(path, since_ms, until_ms) for path in plain]
+
+    for source in sources:
+        for line in source:
+            if regex is None or regex.search(line):
+                yield line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Поиск по логам приложения за интервал времени')
+    parser.add_argument('--dir', default='logs', help='Папка с логами')
+    parser.add_argument('--since', type=parse_user_time, required=True)
+    parser.add_argument('--until', type=parse_user_time, default=None)
+    parser.add_argument('--grep', default=None, help='Регулярное выражение для фильтрации строк')
+    args = parser.parse_args(argv)
+
+    until_ms = args.until if args.until is not None else int(datetime.now().timestamp() * 1000)
+    out = sys.stdout.buffer
+    for line in search(args.dir, args.since, until_ms, args.grep):
+        out.write(line + b'\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,15 @@ import logging
 import time
 from datetime import datetime
 import os
+import queue
+import threading
+import atexit
+import copy
+import fcntl
+import glob
+from config import Config
+from utils.log_search import compress_segment, INDEX_SUFFIX
+from utils.metrics import log_queue_events_total
 
 # Создаем директорию для логов если не существует
 os.makedirs('logs', exist_ok=True)
@@ -17,30 +26,430 @@ class MillisecondFormatter(logging.Formatter):
             s = f"{s}.{int(record.msecs):03d}"
         return s
 
+
+class BufferedFileHandler(logging.FileHandler):
+    """FileHandler без flush на каждую запись - сбрасывает буфер слушатель после пачки"""
+
+    def emit(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class SegmentCompressor:
+    """Фоновый поток: сжимает ротированные сегменты, строит индекс и удаляет старые"""
+
+    def __init__(self, log_dir, base_name, backup_count, chunk_bytes, delay):
+        self.log_dir = log_dir
+        self.base_name = base_name
+        self.backup_count = backup_count
+        self.chunk_bytes = chunk_bytes
+        self.delay = delay
+        self.start()
+
+    def start(self):
+        """Запустить поток (повторно вызывается в дочернем процессе после fork)"""
+        self.queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='log-segment-compressor', daemon=True)
+        self._thread.start()
+
+    def submit(self, path):
+        self.queue.put(path)
+
+    def _run(self):
+        while True:
+            path = self.queue.get()
+            # Запись в сегмент после ротации уже невозможна, пауза только разносит
+            # сжатие и всплеск записи при ротации
+            time.sleep(self.delay)
+            try:
+                compress_segment(path, self.chunk_bytes)
+                self._cleanup()
+            except Exception as e:
+                # Пишем напрямую в stderr, чтобы не зациклиться через сам логгер
+                logging.lastResort.handle(logging.makeLogRecord({
+                    'msg': f"Log segment compression failed for {path}: {e}",
+                    'levelno': logging.ERROR,
+                    'levelname': 'ERROR'
+                }))
+
+    def _cleanup(self):
+        if self.backup_count <= 0:
+            return
+        segments = sorted(glob.glob(os.path.join(self.log_dir, f'{self.base_name}-*.log.gz')))
+        for old in segments[:-self.backup_count]:
+            for path in (old, old + INDEX_SUFFIX):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+class RotatingBufferedFileHandler(BufferedFileHandler):
+    """Буферизованный файл с ротацией по размеру и по времени.
+
+    Записи пачки копятся в памяти и пишутся в flush одним куском под flock.
+    Перед записью под той же блокировкой проверяется inode (не ротировал ли
+    файл другой воркер) и срок ротации, поэтому ни один процесс не допишет
+    пачку в уже переименованный сегмент, который сжимается в фоне.
+    """
+
+    def __init__(self, filename, max_bytes, rotate_interval, compressor):
+        super().__init__(filename)
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.compressor = compressor
+        self.lock_path = filename + '.lock'
+        self.next_rollover = self._compute_next_rollover()
+        self._pending = []
+        self._lock_file = None
+        self._lock_pid = None
+
+    def _compute_next_rollover(self):
+        if self.rotate_interval <= 0:
+            return None
+        now = time.time()
+        return now - (now % self.rotate_interval) + self.rotate_interval
+
+    def emit(self, record):
+        try:
+            self._pending.append(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+    def _get_lock_file(self):
+        # flock привязан к открытому файлу: после fork дескриптор родителя
+        # общий с дочерним процессом и не исключает его, открываем свой
+        if self._lock_pid != os.getpid():
+            self._lock_file = open(self.lock_path, 'a')
+            self._lock_pid = os.getpid()
+        return self._lock_file
+
+    def flush(self):
+        self.acquire()
+        try:
+            if not self._pending:
+                return
+            data = ''.join(self._pending)
+            self._pending = []
+
+            lock_file = self._get_lock_file()
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._ensure_current()
+                self._maybe_rotate()
+                self.stream.write(data)
+                self.stream.flush()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            self.release()
+
+    def close(self):
+        self.acquire()
+        try:
+            super().close()  # FileHandler.close дописывает накопленную пачку через flush
+            if self._lock_file is not None and self._lock_pid == os.getpid():
+                self._lock_file.close()
+            self._lock_file = None
+            self._lock_pid = None
+        finally:
+            self.release()
+
+    def _reopen(self):
+        if self.stream is not None:
+            self.stream.close()
+        self.stream = self._open()
+
+    def _ensure_current(self):
+        """Переоткрыть файл, если его ротировал другой процесс (вызывается под flock)"""
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            path_stat = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            self._reopen()
+            return
+        if path_stat.st_ino != os.fstat(self.stream.fileno()).st_ino:
+            self._reopen()
+            self.next_rollover = self._compute_next_rollover()
+
+    def _maybe_rotate(self):
+        """Ротация по размеру или времени (вызывается под flock после _ensure_current)"""
+        size = os.fstat(self.stream.fileno()).st_size
+        by_size = self.max_bytes > 0 and size >= self.max_bytes
+        by_time = self.next_rollover is not None and time.time() >= self.next_rollover
+        if not (by_size or by_time):
+            return
+
+        if size:
+            root, ext = os.path.splitext(self.baseFilename)
+            # Микросекунды в имени: при частой ротации по размеру один воркер
+            # не перезапишет свой же сегмент, который еще не успели сжать
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            segment = f"{root}-{stamp}-{os.getpid()}{ext}"
+            os.rename(self.baseFilename, segment)
+            self.compressor.submit(segment)
+            self._reopen()
+        self.next_rollover = self._compute_next_rollover()
+
+
+class LogQueueStats:
+    """Счетчики очереди логов (get_log_queue_stats и Prometheus log_queue_events_total)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.written = 0
+        self.batches = 0
+
+    def incr(self, name, value=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+        log_queue_events_total.labels(name).inc(value)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'enqueued': self.enqueued,
+                'dropped': self.dropped,
+                'blocked': self.blocked,
+                'written': self.written,
+                'batches': self.batches
+            }
+
+
+# Аргументы этих типов не меняются после вызова логгера - строку можно собрать в слушателе
+_IMMUTABLE_ARG_TYPES = (str, int, float, bool, type(None))
+
+
+def _args_are_immutable(args):
+    if isinstance(args, tuple):
+        return all(isinstance(arg, _IMMUTABLE_ARG_TYPES) for arg in args)
+    if isinstance(args, dict):
+        return all(isinstance(arg, _IMMUTABLE_ARG_TYPES) for arg in args.values())
+    return False
+
+
+class BoundedQueueHandler(logging.Handler):
+    """Handler, который только кладет запись в ограниченную очередь.
+
+    policy='drop'  - при переполнении запись отбрасывается (счетчик dropped)
+    policy='block' - поток запроса ждет место в очереди не дольше block_timeout
+                     (счетчик blocked - сколько раз пришлось ждать)
+    """
+
+    def __init__(self, log_queue, stats, policy='drop', block_timeout=0.05):
+        super().__init__()
+        self.queue = log_queue
+        self.stats = stats
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+    def prepare(self, record):
+        """Сообщение и traceback форматирует слушатель, в потоке запроса - только copy.
+
+        Сразу собирается лишь сообщение с изменяемыми аргументами (списки, модели ORM):
+        к моменту записи они могут измениться, а ленивая загрузка атрибутов модели
+        из другого потока недопустима. Traceback держит только код и номера строк.
+        """
+        record = copy.copy(record)
+        if not isinstance(record.msg, str) or (record.args and not _args_are_immutable(record.args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def _put(self, item):
+        if self.policy != 'block':
+            self.queue.put_nowait(item)
+            return
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.stats.incr('blocked')
+            self.queue.put(item, timeout=self.block_timeout)
+
+    def emit(self, record):
+        try:
+            self._put(self.prepare(record))
+            self.stats.incr('enqueued')
+        except queue.Full:
+            self.stats.incr('dropped')
+        except Exception:
+            self.handleError(record)
+
+
+class BatchingQueueListener:
+    """Фоновый поток, который забирает записи из очереди и пишет их пачками"""
+
+    _sentinel = None
+
+    def __init__(self, log_queue, handlers, stats, batch_size=256, flush_interval=0.5):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.stats = stats
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='log-queue-listener', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Дописать оставшиеся записи и остановить поток"""
+        if self._thread is None:
+            return
+        self.queue.put(self._sentinel)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        running = True
+        while running:
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = []
+            if first is self._sentinel:
+                running = False
+            else:
+                batch.append(first)
+
+            # Забираем все, что уже накопилось, но не больше batch_size
+            while running and len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is self._sentinel:
+                    running = False
+                    break
+                batch.append(record)
+
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        for handler in self.handlers:
+            for record in batch:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            handler.flush()
+        self.stats.incr('written', len(batch))
+        self.stats.incr('batches')
+
+
+log_queue_stats = LogQueueStats()
+_listener = None
+
+
 # Создаем единый обработчик для всех логов
 def setup_logging():
-    """Настраиваем логирование один раз для всего приложения"""
+    """Настраиваем логирование один раз для всего приложения.
+
+    Поток запроса только кладет запись в очередь, запись на диск делает
+    BatchingQueueListener в фоне.
+    """
+    global _listener
+
     # Очищаем все существующие обработчики
     root_logger = logging.getLogger()
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
-    
-    # Создаем файл handler
-    file_handler = logging.FileHandler('logs/app.log')
+
+    if _listener is not None:
+        _listener.stop()
+
+    # Создаем файл handler с ротацией и фоновым сжатием сегментов
+    compressor = SegmentCompressor(
+        'logs',
+        'app',
+        backup_count=Config.LOG_BACKUP_COUNT,
+        chunk_bytes=Config.LOG_INDEX_CHUNK_BYTES,
+        delay=Config.LOG_COMPRESS_DELAY
+    )
+    file_handler = RotatingBufferedFileHandler(
+        'logs/app.log',
+        max_bytes=Config.LOG_MAX_BYTES,
+        rotate_interval=Config.LOG_ROTATE_INTERVAL,
+        compressor=compressor
+    )
     file_handler.setLevel(logging.DEBUG)
     
     # Форматтер с миллисекундами
     formatter = MillisecondFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     file_handler.setFormatter(formatter)
-    
+
+    log_queue = queue.Queue(maxsize=Config.LOG_QUEUE_MAXSIZE)
+    queue_handler = BoundedQueueHandler(
+        log_queue,
+        log_queue_stats,
+        policy=Config.LOG_QUEUE_POLICY,
+        block_timeout=Config.LOG_QUEUE_BLOCK_TIMEOUT
+    )
+
+    _listener = BatchingQueueListener(
+        log_queue,
+        [file_handler],
+        log_queue_stats,
+        batch_size=Config.LOG_BATCH_SIZE,
+        flush_interval=Config.LOG_FLUSH_INTERVAL
+    )
+    _listener.start()
+
     # Добавляем handler к root logger
-    root_logger.addHandler(file_handler)
+    root_logger.addHandler(queue_handler)
     root_logger.setLevel(logging.DEBUG)
     
     return logging.getLogger(__name__)
 
+
+def shutdown_logging():
+    """Остановить слушатель очереди, дописав все записи на диск"""
+    if _listener is not None:
+        _listener.stop()
+
+
+def get_log_queue_stats():
+    """Получить счетчики очереди логов"""
+    return log_queue_stats.to_dict()
+
+
+def _restart_listener_after_fork():
+    """Поток слушателя не переживает fork (gunicorn preload) - поднимаем новый в дочернем процессе"""
+    global _listener
+    if _listener is None:
+        return
+    old = _listener
+    _listener = BatchingQueueListener(
+        queue.Queue(maxsize=Config.LOG_QUEUE_MAXSIZE),
+        old.handlers,
+        log_queue_stats,
+        batch_size=old.batch_size,
+        flush_interval=old.flush_interval
+    )
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, BoundedQueueHandler):
+            handler.queue = _listener.queue
+    for handler in old.handlers:
+        if isinstance(handler, RotatingBufferedFileHandler):
+            handler._pending = []  # недописанную пачку допишет родитель
+            handler.compressor.start()
+    _listener.start()
+
+
 # Инициализируем логирование один раз
 logger = setup_logging()
+atexit.register(shutdown_logging)
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
 
 def log_info(message: str):
     logger.info(message)
@@ -61,21 +470,25 @@ def log_exception(message: str):
     logger.exception(message)
 
 def log_function_entry(func_name: str, **kwargs):
-    """Логирование входа в функцию с параметрами"""
+    """Логирование входа в функцию с параметрами (для замеров используйте utils.tracing.traced)"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
     params = ', '.join([f"{k}={v}" for k, v in kwargs.items()])
-    logger.debug(f"ENTER: {func_name}({params})")
+    logger.debug("ENTER: %s(%s)", func_name, params)
 
 def log_function_exit(func_name: str, result=None):
     """Логирование выхода из функции с результатом"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
     if result is not None:
-        logger.debug(f"EXIT: {func_name} -> {result}")
+        logger.debug("EXIT: %s -> %s", func_name, result)
     else:
-        logger.debug(f"EXIT: {func_name}")
+        logger.debug("EXIT: %s", func_name)
 
 def log_time_execution(func_name: str, start_time: float):
-    """Логирование времени выполнения функции"""
-    execution_time = (time.time() - start_time) * 1000  # в миллисекундах
-    logger.debug(f"EXECUTION TIME: {func_name} took {execution_time:.3f}ms")
+    """Логирование времени выполнения функции. start_time берется из time.perf_counter()"""
+    execution_time = (time.perf_counter() - start_time) * 1000  # в миллисекундах
+    logger.debug("EXECUTION TIME: %s took %.3fms", func_name, execution_time)
 
 def log_request_details(request, response=None):
     """Детальное логирование HTTP запросов"""
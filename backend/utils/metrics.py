@@ -0,0 +1,179 @@
+import hmac
+import ipaddress
+import os
+import time
+from flask import Blueprint, Response, request, g, abort, current_app
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+# При запуске через несколько воркеров prometheus_client пишет значения в
+# mmap-файлы в PROMETHEUS_MULTIPROC_DIR, а /metrics суммирует их по всем процессам.
+# Путь запроса при этом не берет никаких межпроцессных блокировок.
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# HTTP
+http_requests_total = Counter(
+    'http_requests_total',
+    'Количество HTTP запросов',
+    ['method', 'endpoint', 'status']
+)
+http_request_duration_seconds = Histogram(
+    'http_request_duration_seconds',
+    'Время обработки HTTP запроса',
+    ['method', 'endpoint'],
+    buckets=LATENCY_BUCKETS
+)
+
+# Пул соединений с БД
+db_pool_checked_out = Gauge(
+    'db_pool_checked_out_connections',
+    'Соединения, выданные из пула',
+    multiprocess_mode='livesum'
+)
+db_pool_size = Gauge(
+    'db_pool_size',
+    'Размер пула соединений',
+    multiprocess_mode='livesum'
+)
+db_pool_overflow = Gauge(
+    'db_pool_overflow_connections',
+    'Соединения сверх pool_size (max_overflow)',
+    multiprocess_mode='livesum'
+)
+db_pool_checkout_wait_seconds = Histogram(
+    'db_pool_checkout_wait_seconds',
+    'Ожидание свободного соединения в пуле',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+)
+db_pool_checkout_timeouts_total = Counter(
+    'db_pool_checkout_timeouts_total',
+    'Таймауты ожидания соединения из пула'
+)
+
+# Бизнес-метрики
+usage_tracked_total = Counter(
+    'usage_tracked_total',
+    'Отслеженное использование ресурсов',
+    ['usage_type']
+)
+quota_checks_total = Counter(
+    'quota_checks_total',
+    'Проверки квоты сообщений (allowed, exceeded, fallback - через БД)',
+    ['result']
+)
+transactions_processed_total = Counter(
+    'transactions_processed_total',
+    'Обработанные транзакции',
+    ['status']
+)
+
+# Очередь логов (utils/logs_service.py): enqueued, dropped, blocked, written, batches
+log_queue_events_total = Counter(
+    'log_queue_events_total',
+    'События очереди логов (dropped - потерянные записи, blocked - ожидание места в очереди)',
+    ['event']
+)
+
+metrics_bpp = Blueprint('metrics_bpp', __name__)
+
+
+def _parse_networks(value):
+    return [ipaddress.ip_network(item.strip()) for item in (value or '').split(',') if item.strip()]
+
+
+def _metrics_allowed():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        header = request.headers.get('Authorization', '')
+        return hmac.compare_digest(header.encode(), f"Bearer {token}".encode())
+
+    try:
+        addr = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return False
+    # remote_addr уже исправлен ProxyFix: запрос через nginx несет адрес реального клиента
+    return any(addr in network for network in current_app.extensions['metrics_networks'])
+
+
+@metrics_bpp.route('/metrics', methods=['GET'])
+def metrics():
+    if not _metrics_allowed():
+        abort(404)
+
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+
+
+def _after_request(response):
+    start = getattr(g, 'metrics_start', None)
+    if start is None:
+        return response
+
+    endpoint = request.endpoint or 'unknown'
+    if endpoint == 'metrics_bpp.metrics':
+        return response
+
+    http_requests_total.labels(request.method, endpoint, str(response.status_code)).inc()
+    http_request_duration_seconds.labels(request.method, endpoint).observe(time.perf_counter() - start)
+    return response
+
+
+def instrument_engine_pool(engine):
+    """Подписаться на события пула SQLAlchemy для gauge метрик.
+
+    Размер пула выставляется на первом checkout в каждом процессе: при preload
+    init_metrics выполняется в мастере, и значение, выставленное там, воркеры не видят
+    """
+    pool = engine.pool
+    sized_pid = [None]
+
+    def _update_overflow():
+        if hasattr(pool, 'overflow'):
+            db_pool_overflow.set(max(0, pool.overflow()))
+
+    @event.listens_for(pool, 'checkout')
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        if sized_pid[0] != os.getpid():
+            sized_pid[0] = os.getpid()
+            if hasattr(pool, 'size'):
+                db_pool_size.set(pool.size())
+        db_pool_checked_out.inc()
+        _update_overflow()
+
+    @event.listens_for(pool, 'checkin')
+    def _on_checkin(dbapi_connection, connection_record):
+        db_pool_checked_out.dec()
+        _update_overflow()
+
+
+def mark_process_dead(pid):
+    """Вызывается мастером WSGI сервера при завершении воркера (и для самого мастера при preload)"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+
+def init_metrics(app, db=None):
+    """Подключить сбор метрик и эндпоинт /metrics"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.extensions['metrics_networks'] = _parse_networks(app.config.get('METRICS_ALLOWED_NETWORKS'))
+    app.register_blueprint(metrics_bpp)
+
+    if db is not None:
+        with app.app_context():
+            instrument_engine_pool(db.engine)
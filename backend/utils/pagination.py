@@ -0,0 +1,47 @@
+from datetime import datetime
+from flask import current_app
+from itsdangerous import URLSafeSerializer, BadSignature
+from sqlalchemy import tuple_
+
+CURSOR_SALT = 'keyset-pagination-cursor'
+
+
+class InvalidCursorError(ValueError):
+    """Курсор поврежден или подписан другим ключом"""
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt=CURSOR_SALT)
+
+
+def encode_cursor(created_at, row_id):
+    """Непрозрачный подписанный курсор для позиции (created_at, id)"""
+    return _serializer().dumps([created_at.isoformat(), row_id])
+
+
+def decode_cursor(token):
+    """Разобрать курсор в (created_at, id)"""
+    try:
+        created_at, row_id = _serializer().loads(token)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (BadSignature, ValueError, TypeError) as e:
+        raise InvalidCursorError('Invalid pagination cursor') from e
+
+
+def apply_keyset(query, model, after=None):
+    """Сортировка (created_at, id) по убыванию и продолжение после позиции after.
+
+    В отличие от OFFSET база не читает и не отбрасывает предыдущие страницы -
+    последняя страница стоит столько же, сколько первая.
+    """
+    if after is not None:
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(*after))
+    return query.order_by(model.created_at.desc(), model.id.desc())
+
+
+def next_cursor(items, limit):
+    """Курсор следующей страницы, если страница заполнена целиком"""
+    if len(items) < limit or not items:
+        return None
+    last = items[-1]
+    return encode_cursor(last.created_at, last.id)
@@ -0,0 +1,111 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+import multiprocessing
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import generate_password_hash, check_password_hash
+from config import Config
+
+
+class PasswordHashingBusy(ServiceUnavailable):
+    """Все слоты хеширования заняты - запрос отклоняется сразу (503 + Retry-After)"""
+
+    def __init__(self):
+        super().__init__('Password hashing is saturated, try again later', retry_after=1)
+
+
+def _lower_priority():
+    # Хеширование не должно отнимать CPU у обычных запросов
+    try:
+        os.nice(Config.PASSWORD_HASH_NICE)
+    except (AttributeError, OSError):
+        pass
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def hash_batch(passwords, method):
+    """Захешировать пачку паролей - для массового импорта через пул процессов"""
+    return [generate_password_hash(password, method=method) for password in passwords]
+
+
+def _verify(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """Хеширование паролей в отдельном пуле процессов.
+
+    Одновременно в пуле и в очереди к нему не больше workers + queue_limit операций
+    на процесс приложения, остальные сразу получают PasswordHashingBusy. Так всплеск
+    логинов занимает не больше queue_limit потоков gunicorn, остальные потоки
+    продолжают обслуживать API. workers=0 - хешировать в потоке запроса (разработка).
+    """
+
+    def __init__(self, method, workers, queue_limit, timeout):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, workers + queue_limit))
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Пул создается лениво в каждом воркере: процессы мастера не переживают fork
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_lower_priority
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Слот освобождается, когда задача действительно завершилась (или отменена до старта):
+        # запущенную задачу не отменить, и после таймаута она продолжает занимать процесс пула
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise PasswordHashingBusy()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        if not password_hash:
+            return False
+        return self._run(_verify, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Хеш создан с другими параметрами (метод/итерации), чем текущие"""
+        return not password_hash or password_hash.split('$', 1)[0] != self.method
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+
+password_hasher = PasswordHasher(
+    Config.PASSWORD_HASH_METHOD,
+    Config.PASSWORD_HASH_WORKERS,
+    Config.PASSWORD_HASH_QUEUE_LIMIT,
+    Config.PASSWORD_HASH_TIMEOUT
+)
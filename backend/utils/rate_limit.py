@@ -0,0 +1,73 @@
+import time
+from flask import session, request, current_app
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from werkzeug.middleware.proxy_fix import ProxyFix
+from utils.logs_service import init_logger
+
+logger = init_logger('rate_limit')
+
+# Хранилище, стратегия (moving-window) и заголовки берутся из RATELIMIT_* в конфиге.
+# В тестах достаточно RATELIMIT_STORAGE_URI = 'memory://'
+limiter = Limiter(key_func=get_remote_address)
+
+SESSION_PLAN_LIMIT = '_rate_limit_per_minute'
+SESSION_PLAN_CHECKED = '_rate_limit_checked_at'
+
+
+def user_key():
+    """Ключ лимита: пользователь сессии, для анонимов - IP"""
+    user_id = session.get('user_id')
+    return f"user:{user_id}" if user_id else f"ip:{get_remote_address()}"
+
+
+def plan_rate_limit():
+    """Лимит API для пользователя по его плану подписки.
+
+    Значение лежит в сессии (кладется при входе и при смене подписки), поэтому
+    проверка лимита не обращается к БД даже для запросов, которые будут отклонены.
+    """
+    per_minute = session.get(SESSION_PLAN_LIMIT) or current_app.config['API_RATE_LIMIT_DEFAULT']
+    return f"{per_minute}/minute"
+
+
+def get_plan_rate_limit(user_id):
+    """Запросов в минуту по активной подписке пользователя (None - план без своего лимита)"""
+    from models.models_all_rout_imp import UserSubscription, SubscriptionPlan, SubscriptionStatus
+
+    return SubscriptionPlan.query.with_entities(SubscriptionPlan.api_requests_per_minute)\
+        .join(UserSubscription, UserSubscription.plan_id == SubscriptionPlan.id)\
+        .filter(UserSubscription.user_id == user_id,
+                UserSubscription.status.in_([SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIAL]))\
+        .order_by(UserSubscription.created_at.desc())\
+        .limit(1).scalar()
+
+
+def remember_plan_rate_limit(user_id):
+    """Сохранить лимит плана в сессии: вызывается при входе и после смены подписки"""
+    session[SESSION_PLAN_LIMIT] = get_plan_rate_limit(user_id)
+    session[SESSION_PLAN_CHECKED] = time.time()
+
+
+def _refresh_plan_rate_limit(response):
+    # Подписка может истечь без участия пользователя - изредка перечитываем план.
+    # Делается после обработки запроса, то есть только для пропущенных лимитером запросов
+    user_id = session.get('user_id')
+    if user_id and request.blueprint == 'subscriptions':
+        checked_at = session.get(SESSION_PLAN_CHECKED, 0)
+        if time.time() - checked_at > current_app.config['API_RATE_LIMIT_REFRESH_SECONDS']:
+            try:
+                remember_plan_rate_limit(user_id)
+            except Exception as e:
+                logger.warning(f"Failed to refresh plan rate limit for user {user_id}: {e}")
+    return response
+
+
+def init_rate_limiting(app):
+    """Подключить лимитер. Его before_request должен идти раньше любых обращений к БД"""
+    if app.config['PROXY_FIX_X_FOR']:
+        # За nginx remote_addr - адрес прокси, реальный IP клиента в X-Forwarded-For
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'],
+                                x_proto=app.config['PROXY_FIX_X_FOR'])
+    limiter.init_app(app)
+    app.after_request(_refresh_plan_rate_limit)
@@ -0,0 +1,224 @@
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from utils.logs_service import init_logger
+
+logger = init_logger('sampling_profiler')
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collapse_stack(frame, max_depth=128):
+    """Стек потока в collapsed формате (корень слева): a.py:main;b.py:handler;c.py:query"""
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+class SamplingProfiler:
+    """Семплирующий профайлер внутри процесса.
+
+    Фоновый поток раз в interval снимает стеки всех потоков через
+    sys._current_frames() и считает одинаковые стеки. Не нужны ни внешние
+    утилиты, ни ptrace - результат в collapsed формате для flamegraph.pl/speedscope.
+
+    Под gunicorn запрос попадает в случайный воркер, поэтому сессия профилирования
+    общая: start_session пишет control.json в shared_dir, каждый воркер подключается
+    к сессии на ближайшем запросе (sync) и по окончании пишет свой результат рядом,
+    а merged() складывает результаты всех воркеров.
+    """
+
+    CONTROL_FILE = 'control.json'
+    SYNC_INTERVAL = 1.0  # как часто воркер перечитывает control.json
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.stacks = Counter()
+        self.samples = 0
+        self.interval = 0.01
+        self.started_at = None
+        self.finished_at = None
+        self.session = None
+        self.shared_dir = None
+        self._next_sync = 0
+
+    def init_app(self, app):
+        self.shared_dir = app.config['PROFILE_DIR']
+        os.makedirs(self.shared_dir, exist_ok=True)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=0.01, duration=None, session=None):
+        """Начать сбор. duration в секундах - остановиться автоматически"""
+        with self._lock:
+            if self.is_running():
+                return False
+            self.stacks = Counter()
+            self.samples = 0
+            self.interval = interval
+            self.started_at = time.time()
+            self.finished_at = None
+            self.session = session
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(duration,), name='sampling-profiler', daemon=True
+            )
+            self._thread.start()
+        logger.info(f"Sampling profiler started: interval={interval}s duration={duration} session={session}")
+        return True
+
+    def stop(self):
+        thread = self._thread
+        if thread is None:
+            return False
+        self._stop_event.set()
+        if thread is not threading.current_thread():
+            thread.join()
+        return True
+
+    def _run(self, duration):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + duration if duration else None
+        next_check = time.monotonic() + self.SYNC_INTERVAL
+
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self.stacks[collapse_stack(frame)] += 1
+            self.samples += 1
+
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+            # Общую сессию могли остановить из другого воркера, а запросов в этот может и не быть
+            if self.session and now >= next_check:
+                next_check = now + self.SYNC_INTERVAL
+                if not self._session_active():
+                    break
+
+        self.finished_at = time.time()
+        logger.info(f"Sampling profiler stopped: {self.samples} samples, {len(self.stacks)} unique stacks")
+        if self.session and self.shared_dir:
+            self._save_result()
+
+    def _save_result(self):
+        path = os.path.join(self.shared_dir, f"{self.session}-{os.getpid()}.collapsed")
+        try:
+            with open(path + '.tmp', 'w') as f:
+                f.write(self.collapsed())
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            logger.error(f"Failed to save profile {path}: {e}")
+
+    def collapsed(self):
+        """Результат в collapsed формате: '<стек> <количество>' построчно"""
+        return format_collapsed(dict(self.stacks))
+
+    def status(self):
+        return {
+            'running': self.is_running(),
+            'samples': self.samples,
+            'unique_stacks': len(self.stacks),
+            'interval': self.interval,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'session': self.session,
+            'pid': os.getpid()
+        }
+
+    # --- общая сессия для всех воркеров ---
+
+    def _control_path(self):
+        return os.path.join(self.shared_dir, self.CONTROL_FILE)
+
+    def read_control(self):
+        try:
+            with open(self._control_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_control(self, control):
+        path = self._control_path()
+        with open(path + f'.{os.getpid()}.tmp', 'w') as f:
+            json.dump(control, f)
+        os.replace(path + f'.{os.getpid()}.tmp', path)
+
+    def start_session(self, interval, duration):
+        """Запустить профилирование во всех воркерах. False - предыдущая сессия еще идет"""
+        control = self.read_control()
+        if control and control['until'] > time.time():
+            return False
+        session = f"{int(time.time() * 1000)}-{os.getpid()}"
+        self._write_control({'session': session, 'interval': interval, 'until': time.time() + duration})
+        self._next_sync = 0
+        self.sync()
+        return True
+
+    def stop_session(self):
+        """Остановить сессию: поток профайлера каждого воркера заметит это за SYNC_INTERVAL"""
+        control = self.read_control()
+        if control and control['until'] > time.time():
+            control['until'] = time.time()
+            self._write_control(control)
+
+    def _session_active(self):
+        control = self.read_control()
+        return control is not None and control['session'] == self.session and control['until'] > time.time()
+
+    def sync(self):
+        """Подключиться к новой общей сессии (раз в SYNC_INTERVAL, вызывается на запросе)"""
+        now = time.monotonic()
+        if self.shared_dir is None or now < self._next_sync:
+            return
+        self._next_sync = now + self.SYNC_INTERVAL
+
+        control = self.read_control()
+        if control is None or control['session'] == self.session:
+            return
+        remaining = control['until'] - time.time()
+        if remaining > 0:
+            self.start(interval=control['interval'], duration=remaining, session=control['session'])
+
+    def merged(self, session):
+        """Профиль сессии, сложенный по всем воркерам, и pid воркеров, приславших результат"""
+        stacks = Counter()
+        pids = []
+        for path in glob.glob(os.path.join(self.shared_dir, f"{session}-*.collapsed")):
+            pids.append(int(path.rsplit('-', 1)[1].split('.')[0]))
+            with open(path) as f:
+                for line in f:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack:
+                        stacks[stack] += int(count)
+        return format_collapsed(stacks), sorted(pids)
+
+    def cleanup(self, keep_session):
+        """Удалить результаты прошлых сессий"""
+        for path in glob.glob(os.path.join(self.shared_dir, '*.collapsed')):
+            if not os.path.basename(path).startswith(f"{keep_session}-"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def format_collapsed(stacks):
+    return '\n'.join(f"{stack} {count}" for stack, count in sorted(stacks.items(), key=lambda item: -item[1]))
+
+
+sampling_profiler = SamplingProfiler()
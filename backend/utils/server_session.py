@@ -0,0 +1,223 @@
+import secrets
+import threading
+import time
+import msgpack
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+from utils.logs_service import init_logger
+
+logger = init_logger('server_session')
+
+USER_INDEX_PREFIX = 'user:'
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Сессия, данные которой лежат на сервере, а в cookie - только ее id"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.user_id = (initial or {}).get('user_id')
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+def pack_session(data):
+    return msgpack.packb(data, use_bin_type=True)
+
+
+def unpack_session(payload):
+    # Кортежи (flash-сообщения) восстанавливаются списками - Flask разбирает их одинаково
+    return msgpack.unpackb(payload, raw=False)
+
+
+class RedisSessionStore:
+    """Сессии в Redis: sess:<sid> -> msgpack, sess:user:<id> -> множество sid пользователя"""
+
+    def __init__(self, client, prefix='sess:'):
+        self.client = client
+        self.prefix = prefix
+
+    def load(self, sid, ttl):
+        # GETEX продлевает TTL тем же запросом - скользящее время жизни без отдельной записи
+        payload = self.client.getex(self.prefix + sid, ex=ttl)
+        return None if payload is None else unpack_session(payload)
+
+    def save(self, sid, data, ttl, user_id=None):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(self.prefix + sid, pack_session(data), ex=ttl)
+        if user_id is not None:
+            index_key = self.prefix + USER_INDEX_PREFIX + str(user_id)
+            pipe.sadd(index_key, sid)
+            pipe.expire(index_key, ttl)
+        pipe.execute()
+
+    def delete(self, sid, user_id=None):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.delete(self.prefix + sid)
+        if user_id is not None:
+            pipe.srem(self.prefix + USER_INDEX_PREFIX + str(user_id), sid)
+        pipe.execute()
+
+    def revoke_user(self, user_id):
+        """Завершить все сессии пользователя (смена пароля, удаление, блокировка)"""
+        index_key = self.prefix + USER_INDEX_PREFIX + str(user_id)
+        sids = self.client.smembers(index_key)
+        keys = [self.prefix + (sid.decode() if isinstance(sid, bytes) else sid) for sid in sids]
+        self.client.delete(index_key, *keys)
+        return len(keys)
+
+
+class MemorySessionStore:
+    """Хранилище сессий в памяти процесса - для тестов и локального запуска"""
+
+    def __init__(self):
+        self._data = {}
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid, ttl):
+        with self._lock:
+            item = self._data.get(sid)
+            if item is None:
+                return None
+            expires_at, payload = item
+            if expires_at < time.monotonic():
+                del self._data[sid]
+                return None
+            self._data[sid] = (time.monotonic() + ttl, payload)
+        return unpack_session(payload)
+
+    def save(self, sid, data, ttl, user_id=None):
+        with self._lock:
+            self._data[sid] = (time.monotonic() + ttl, pack_session(data))
+            if user_id is not None:
+                self._users.setdefault(user_id, set()).add(sid)
+
+    def delete(self, sid, user_id=None):
+        with self._lock:
+            self._data.pop(sid, None)
+            if user_id is not None:
+                self._users.get(user_id, set()).discard(sid)
+
+    def revoke_user(self, user_id):
+        with self._lock:
+            sids = self._users.pop(user_id, set())
+            for sid in sids:
+                self._data.pop(sid, None)
+        return len(sids)
+
+
+class ServerSessionInterface(SessionInterface):
+    """Серверные сессии: в cookie только случайный id, данные в хранилище.
+
+    Запись в хранилище только если сессия изменилась, TTL продлевается при чтении.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def _ttl(self, app):
+        return int(app.permanent_session_lifetime.total_seconds())
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            try:
+                data = self.store.load(sid, self._ttl(app))
+            except Exception as e:
+                logger.error(f"Failed to load session: {e}")
+                data = None
+            if data is not None:
+                return ServerSession(data, sid=sid)
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        user_id = session.get('user_id')
+
+        if not session:
+            if session.modified and not session.new:
+                # session.clear(): выход из аккаунта - удаляем и данные, и cookie
+                try:
+                    self.store.delete(session.sid, session.user_id)
+                except Exception as e:
+                    logger.error(f"Failed to delete session: {e}")
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add('Cookie')
+            return
+
+        if session.modified:
+            if user_id != session.user_id and not session.new:
+                # Вход или смена пользователя - выдаем новый id (защита от фиксации сессии)
+                try:
+                    self.store.delete(session.sid, session.user_id)
+                except Exception as e:
+                    logger.error(f"Failed to delete session: {e}")
+                session.sid = secrets.token_urlsafe(32)
+                session.new = True
+            try:
+                self.store.save(session.sid, dict(session), self._ttl(app), user_id)
+            except Exception as e:
+                logger.error(f"Failed to save session: {e}")
+                return
+
+        if session.new or self.should_set_cookie(app, session):
+            response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                                httponly=httponly, domain=domain, path=path, secure=secure,
+                                samesite=samesite)
+            response.vary.add('Cookie')
+
+
+session_store = None
+
+
+def init_server_sessions(app):
+    """SESSION_BACKEND: redis, memory или cookie (стандартная подписанная cookie Flask)"""
+    global session_store
+    backend = app.config['SESSION_BACKEND']
+    if backend == 'cookie':
+        return
+    if backend == 'redis':
+        import redis
+        session_store = RedisSessionStore(redis.Redis.from_url(app.config['SESSION_REDIS_URL']),
+                                          app.config['SESSION_KEY_PREFIX'])
+    elif backend == 'memory':
+        session_store = MemorySessionStore()
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+    app.session_interface = ServerSessionInterface(session_store)
+
+
+def revoke_user_sessions(user_id):
+    """Завершить все сессии пользователя. Для cookie-сессий это невозможно - возвращает 0"""
+    if session_store is None:
+        return 0
+    return session_store.revoke_user(user_id)
@@ -0,0 +1,102 @@
+import re
+import time
+from collections import Counter
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from utils.logs_service import init_logger
+from utils.access_log import add_access_log_field
+
+logger = init_logger('sql_profiler')
+
+_whitespace_re = re.compile(r'\s+')
+_literal_re = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def fingerprint(statement):
+    """Нормализовать SQL: схлопнуть пробелы и заменить литералы на ?"""
+    statement = _whitespace_re.sub(' ', statement).strip()
+    return _literal_re.sub('?', statement)
+
+
+class RequestSqlStats:
+    """Статистика запросов к БД в рамках одного HTTP запроса"""
+
+    __slots__ = ('count', 'total_time', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.statements = Counter()
+
+    def repeated(self, threshold):
+        return [(stmt, n) for stmt, n in self.statements.items() if n > threshold]
+
+
+class SqlProfiler:
+    """Счетчик SQL запросов на запрос: Server-Timing, access-лог и предупреждения о N+1"""
+
+    def __init__(self, app=None, db=None):
+        self.repeat_threshold = 5
+        if app is not None and db is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        if not app.config.get('SQL_PROFILER_ENABLED', True):
+            return
+
+        self.repeat_threshold = app.config.get('SQL_PROFILER_REPEAT_THRESHOLD', 5)
+
+        # Все engine, включая реплику (SQLALCHEMY_BINDS): чтения @read_only тоже должны попадать
+        # в Server-Timing и поиск N+1
+        with app.app_context():
+            for engine in db.engines.values():
+                self.instrument_engine(engine)
+
+        app.after_request(self._after_request)
+        app.extensions['sql_profiler'] = self
+
+    def instrument_engine(self, engine):
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if has_request_context():
+                conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if not has_request_context():
+                return
+            starts = conn.info.get('query_start_time')
+            if not starts:
+                return
+
+            elapsed = time.perf_counter() - starts.pop()
+            stats = g.get('sql_stats')
+            if stats is None:
+                stats = g.sql_stats = RequestSqlStats()
+            stats.count += 1
+            stats.total_time += elapsed
+            stats.statements[statement] += 1
+
+    def _after_request(self, response):
+        stats = g.get('sql_stats')
+        if stats is None:
+            return response
+
+        db_ms = stats.total_time * 1000
+        response.headers.add('Server-Timing', f'db;dur={db_ms:.2f};desc="{stats.count} queries"')
+        add_access_log_field('db_queries', stats.count)
+        add_access_log_field('db_ms', round(db_ms, 3))
+
+        repeated = stats.repeated(self.repeat_threshold)
+        if repeated:
+            add_access_log_field('db_repeated', len(repeated))
+            for statement, count in repeated:
+                logger.warning(
+                    "Possible N+1: %s %s ran the same statement %d times: %s",
+                    request.method, request.endpoint, count, fingerprint(statement)
+                )
+
+        return response
+
+
+sql_profiler = SqlProfiler()
@@ -0,0 +1,127 @@
+import json
+import os
+import queue
+import threading
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+from models.models_all_rout_imp import User
+from utils.db_routing import RoutingSession
+from utils.logs_service import init_logger
+
+logger = init_logger('status_events')
+
+CHANNEL_PREFIX = 'user-status:'
+STATUS_FIELDS = ('is_active', 'subscription_type')
+
+
+def status_payload(user):
+    """Статус пользователя для /profile/status (User или UserIdentity)"""
+    if user is None:
+        return {'is_active': False}
+    return {'is_active': bool(user.is_active), 'subscription_type': user.subscription_type}
+
+
+class StatusBroker:
+    """Рассылка изменений статуса подписчикам SSE.
+
+    С Redis - один PSUBSCRIBE на процесс, сообщения доходят до потоков всех воркеров
+    и машин. Без Redis - только в пределах процесса (локальный запуск, тесты).
+    """
+
+    def __init__(self):
+        self.redis = None
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self._pid = None
+
+    def init_app(self, app):
+        if app.config['USER_STATUS_STREAM_ENABLED'] and app.config['USER_STATUS_STREAM_BACKEND'] == 'redis':
+            import redis
+            self.redis = redis.Redis.from_url(app.config['REDIS_URL'])
+
+    def publish(self, user_id, payload):
+        if self.redis is None:
+            self._dispatch(user_id, payload)
+            return
+        try:
+            self.redis.publish(f"{CHANNEL_PREFIX}{user_id}", json.dumps(payload))
+        except Exception as e:
+            logger.warning(f"Failed to publish status for user {user_id}: {e}")
+
+    def subscribe(self, user_id):
+        """Очередь, в которую будут приходить новые статусы пользователя"""
+        if self.redis is not None:
+            self._ensure_listener()
+        q = queue.Queue(maxsize=16)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def _dispatch(self, user_id, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for q in subscribers:
+            try:
+                q.put_nowait(payload)
+            except queue.Full:
+                pass  # медленный клиент - достаточно последних статусов
+
+    def _ensure_listener(self):
+        # Поток слушателя свой в каждом воркере (после fork его нет)
+        if self._pid == os.getpid() and self._listener is not None and self._listener.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._listener is not None and self._listener.is_alive():
+                return
+            self._pid = os.getpid()
+            self._listener = threading.Thread(target=self._listen, name='status-events', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                for message in pubsub.listen():
+                    channel = message['channel']
+                    channel = channel.decode() if isinstance(channel, bytes) else channel
+                    user_id = int(channel[len(CHANNEL_PREFIX):])
+                    self._dispatch(user_id, json.loads(message['data']))
+            except Exception as e:
+                logger.warning(f"Status events listener reconnecting: {e}")
+                threading.Event().wait(1)
+
+
+status_broker = StatusBroker()
+
+
+# Статус публикуется после коммита, чтобы подписчики не увидели откатившееся изменение
+@event.listens_for(User, 'after_update')
+def _collect_status_change(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in STATUS_FIELDS):
+        return
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('status_changed', {})[target.id] = status_payload(target)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _publish_status_changes(session):
+    changed = session.info.pop('status_changed', None)
+    for user_id, payload in (changed or {}).items():
+        status_broker.publish(user_id, payload)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _drop_status_changes(session):
+    session.info.pop('status_changed', None)
@@ -0,0 +1,127 @@
+import functools
+import itertools
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from config import Config
+
+# Глобальный флаг: при выключенной трассировке обертка делает одну проверку и зовет функцию
+_enabled = Config.TRACING_ENABLED
+
+# Кольцевой буфер последних завершенных спанов этого процесса (deque.append потокобезопасен)
+_spans = deque(maxlen=Config.TRACE_BUFFER_SIZE)
+_span_ids = itertools.count(1)
+_current_span = ContextVar('current_span', default=None)
+
+
+class Span:
+    """Один замер: имя, родитель, длительность (perf_counter_ns) и атрибуты"""
+
+    __slots__ = ('span_id', 'name', 'parent_id', 'start_ns', 'duration_ns', 'attributes', 'error', '_token')
+
+    def __init__(self, name, attributes=None):
+        self.span_id = next(_span_ids)
+        self.name = name
+        self.parent_id = None
+        self.start_ns = 0
+        self.duration_ns = 0
+        self.attributes = attributes
+        self.error = None
+        self._token = None
+
+    def __enter__(self):
+        parent = _current_span.get()
+        if parent is not None:
+            self.parent_id = parent.span_id
+        self._token = _current_span.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ns = time.perf_counter_ns() - self.start_ns
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        _spans.append(self)
+        return False
+
+    def set_attribute(self, key, value):
+        if self.attributes is None:
+            self.attributes = {}
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'duration_ms': self.duration_ns / 1_000_000,
+            'attributes': self.attributes,
+            'error': self.error,
+            'pid': os.getpid()
+        }
+
+
+class _NoopSpan:
+    """Заглушка для выключенной трассировки"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+_noop_span = _NoopSpan()
+
+
+def span(name, **attributes):
+    """Контекстный менеджер: with span('db.load_user', user_id=1): ..."""
+    if not _enabled:
+        return _noop_span
+    return Span(name, attributes or None)
+
+
+def traced(name=None, **attributes):
+    """Декоратор трассировки: @traced() или @traced('subscription.track_usage')"""
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(span_name, dict(attributes) if attributes else None):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def set_tracing_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_tracing_enabled():
+    return _enabled
+
+
+def get_recent_spans(min_duration_ms=0, limit=100):
+    """Последние спаны процесса, самые медленные первыми"""
+    min_ns = int(min_duration_ms * 1_000_000)
+    spans = [s for s in list(_spans) if s.duration_ns >= min_ns]
+    spans.sort(key=lambda s: s.duration_ns, reverse=True)
+    return [s.to_dict() for s in spans[:limit]]
+
+
+def clear_spans():
+    _spans.clear()
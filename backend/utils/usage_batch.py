@@ -0,0 +1,103 @@
+import json
+import zlib
+
+USAGE_TYPES = ('messages', 'bots', 'storage')
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines')
+MAX_QUANTITY = 2 ** 31 - 1  # usage_trackers.quantity - INTEGER
+
+_INVALID_JSON = object()
+
+
+class UsageBatchError(ValueError):
+    """Тело пачки не разобрать целиком - отказ всей пачке"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def read_body(stream, content_encoding, max_bytes):
+    """Тело запроса не больше max_bytes, gzip распаковывается с тем же ограничением"""
+    raw = stream.read(max_bytes + 1)
+    if len(raw) > max_bytes:
+        raise UsageBatchError("Request body too large", 413)
+
+    encoding = (content_encoding or 'identity').lower()
+    if encoding == 'identity':
+        return raw
+    if encoding != 'gzip':
+        raise UsageBatchError(f"Unsupported Content-Encoding: {content_encoding}", 415)
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        body = decompressor.decompress(raw, max_bytes + 1)
+    except zlib.error as e:
+        raise UsageBatchError("Invalid gzip body") from e
+    if len(body) > max_bytes or decompressor.unconsumed_tail:
+        raise UsageBatchError("Request body too large", 413)
+    if not decompressor.eof:
+        # Обрезанный поток распаковался бы в короткую, но валидную пачку
+        raise UsageBatchError("Truncated gzip body")
+    return body
+
+
+def validate_event(item):
+    """(событие, None) или (None, ошибка) для одного элемента пачки"""
+    if item is _INVALID_JSON:
+        return None, 'Invalid JSON'
+    if not isinstance(item, dict):
+        return None, 'Event must be an object'
+
+    usage_type = item.get('usage_type')
+    if not usage_type:
+        return None, 'Usage type is required'
+    if usage_type not in USAGE_TYPES:
+        return None, 'Invalid usage type. Must be messages, bots, or storage'
+
+    quantity = item.get('quantity', 1)
+    if isinstance(quantity, bool) or not isinstance(quantity, int) or not 0 < quantity <= MAX_QUANTITY:
+        return None, 'Quantity must be a positive integer'
+
+    resource_id = item.get('resource_id')
+    if resource_id is not None:
+        if isinstance(resource_id, bool) or not isinstance(resource_id, (str, int)) or len(str(resource_id)) > 100:
+            return None, 'Resource id must be a string of at most 100 characters'
+        resource_id = str(resource_id)
+
+    metadata = item.get('metadata')
+    if metadata is not None and not isinstance(metadata, dict):
+        return None, 'Metadata must be an object'
+
+    return {'usage_type': usage_type, 'quantity': quantity, 'resource_id': resource_id, 'metadata': metadata}, None
+
+
+def parse_usage_batch(stream, mimetype, content_encoding, max_bytes, max_events):
+    """Разобрать пачку событий: JSON массив или NDJSON (по строке на событие).
+
+    Возвращает список (событие, ошибка) в порядке пачки. Ошибка в одном событии
+    (включая битую строку NDJSON) не мешает остальным.
+    """
+    body = read_body(stream, content_encoding, max_bytes)
+
+    if mimetype in NDJSON_MIMETYPES:
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(_INVALID_JSON)
+    else:
+        try:
+            items = json.loads(body)
+        except ValueError as e:
+            raise UsageBatchError("Invalid JSON body") from e
+        if not isinstance(items, list):
+            raise UsageBatchError("Expected a JSON array of events")
+
+    if not items:
+        raise UsageBatchError("No events in batch")
+    if len(items) > max_events:
+        raise UsageBatchError(f"Too many events in batch (max {max_events})", 413)
+    return [validate_event(item) for item in items]
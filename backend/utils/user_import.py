@@ -0,0 +1,159 @@
+"""Массовый импорт пользователей из CSV.
+
+    flask import-users users.csv --workers 8 --chunk-size 5000
+
+CSV с заголовком: username,email и password (открытый пароль) или password_hash
+(уже посчитанный хеш werkzeug). Пароли хешируются параллельно в пуле процессов,
+пачки загружаются через COPY во временную таблицу и переносятся в "user" одним
+INSERT ... ON CONFLICT DO NOTHING. Каждая пачка коммитится отдельно, поэтому
+прерванный импорт можно просто запустить снова - существующие записи пропустятся.
+Строки без имени, email или пароля отбрасываются до COPY и выводятся в отчете.
+Нужен PostgreSQL (COPY через psycopg2).
+"""
+import csv
+import io
+import itertools
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import click
+from config import Config
+from utils.password_hasher import hash_batch
+
+STAGING_TABLE = 'user_import_staging'
+MAX_FIELD_LENGTH = 150  # username и email в "user" - VARCHAR(150)
+MAX_REPORTED_REJECTS = 20
+
+
+def validate_row(username, email, password, password_hash):
+    """Причина отказа для строки CSV или None. Такие строки не попадают в COPY,
+    иначе одна строка роняла бы всю пачку на ограничении таблицы"""
+    if not username:
+        return 'empty username'
+    if not email:
+        return 'empty email'
+    if '@' not in email:
+        return 'invalid email'
+    if len(username) > MAX_FIELD_LENGTH or len(email) > MAX_FIELD_LENGTH:
+        return f'username or email longer than {MAX_FIELD_LENGTH} characters'
+    if not password and not password_hash:
+        return 'empty password'
+    return None
+
+
+def read_chunks(path, chunk_size, rejected=None):
+    """Пачки строк CSV как списки (username, email, password, password_hash).
+
+    Невалидные строки пропускаются, в rejected добавляется (номер строки, причина)
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        missing = {'username', 'email'} - set(reader.fieldnames or [])
+        if missing or not {'password', 'password_hash'} & set(reader.fieldnames):
+            raise click.UsageError("CSV must have username, email and password or password_hash columns")
+
+        def valid_rows():
+            for row in reader:
+                fields = ((row['username'] or '').strip(), (row['email'] or '').strip().lower(),
+                          row.get('password') or None, row.get('password_hash') or None)
+                error = validate_row(*fields)
+                if error is None:
+                    yield fields
+                elif rejected is not None:
+                    rejected.append((reader.line_num, error))
+
+        rows = valid_rows()
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+
+def _hash_chunk(chunk, method):
+    plain = [password for _, _, password, password_hash in chunk if not password_hash]
+    hashed = iter(hash_batch(plain, method))
+    return [
+        (username, email, password_hash or next(hashed))
+        for username, email, password, password_hash in chunk
+    ]
+
+
+def copy_chunk(cursor, rows):
+    """COPY пачки во временную таблицу и перенос в user без дубликатов. Возвращает число вставленных"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+
+    cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+    cursor.copy_expert(f"COPY {STAGING_TABLE} (username, email, password_hash) FROM STDIN WITH (FORMAT csv)", buffer)
+    # ON CONFLICT без цели учитывает все уникальные индексы, включая lower(username) и lower(email)
+    cursor.execute(f"""
+        INSERT INTO "user" (username, email, password_hash, created_at, is_active, role, subscription_type)
+        SELECT username, email, password_hash, now() AT TIME ZONE 'utc', true, 'user', 'free'
+        FROM {STAGING_TABLE}
+        ON CONFLICT DO NOTHING
+    """)
+    return cursor.rowcount
+
+
+def import_users(engine, path, workers, chunk_size, method, rejected=None):
+    """Импорт файла. Возвращает (строк загружено в COPY, вставлено); отброшенные строки - в rejected"""
+    if engine.dialect.name != 'postgresql':
+        raise click.ClickException(
+            f"flask import-users needs PostgreSQL (COPY), the database is {engine.dialect.name}"
+        )
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} "
+            "(username VARCHAR(150), email VARCHAR(150), password_hash VARCHAR(256))"
+        )
+        raw.commit()
+
+        total = inserted = 0
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            # Следующие пачки хешируются, пока текущая загружается в БД. Окно ограничено,
+            # чтобы не держать в памяти весь файл
+            pending = deque()
+            chunks = read_chunks(path, chunk_size, rejected)
+            for chunk in itertools.islice(chunks, workers * 2):
+                pending.append(pool.submit(_hash_chunk, chunk, method))
+            while pending:
+                rows = pending.popleft().result()
+                for chunk in itertools.islice(chunks, 1):
+                    pending.append(pool.submit(_hash_chunk, chunk, method))
+                inserted += copy_chunk(cursor, rows)
+                raw.commit()
+                total += len(rows)
+                elapsed = time.perf_counter() - started
+                click.echo(f"{total} rows processed, {inserted} inserted ({total / elapsed:.0f} rows/s)")
+        return total, inserted
+    finally:
+        raw.close()
+
+
+def register_user_import_command(app):
+    """flask import-users - массовый импорт пользователей из CSV"""
+
+    @app.cli.command('import-users')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--workers', type=int, default=os.cpu_count(), help='Процессов для хеширования паролей')
+    @click.option('--chunk-size', type=int, default=5000, help='Строк в одной пачке COPY')
+    @click.option('--method', default=Config.PASSWORD_HASH_METHOD, help='Метод хеширования werkzeug')
+    def import_users_command(path, workers, chunk_size, method):
+        from models.imp import db
+
+        rejected = []
+        total, inserted = import_users(db.engine, path, workers, chunk_size, method, rejected)
+        for line, error in rejected[:MAX_REPORTED_REJECTS]:
+            click.echo(f"Rejected line {line}: {error}", err=True)
+        if len(rejected) > MAX_REPORTED_REJECTS:
+            click.echo(f"... and {len(rejected) - MAX_REPORTED_REJECTS} more rejected lines", err=True)
+        click.echo(f"Done: {inserted} of {total} users imported, {total - inserted} skipped as duplicates, "
+                   f"{len(rejected)} rejected")
@@ -1,18 +1,28 @@
-fetch('/profile/status')
+function renderStatus(data) {
+    const statusElement = document.getElementById('user-status');
+    if (data.is_active) {
+        statusElement.textContent = 'Активен';
+        statusElement.classList.remove('status-disabled');
+        statusElement.classList.add('status-enabled');
+    } else {
+        statusElement.textContent = 'Неактивен';
+        statusElement.classList.remove('status-enabled');
+        statusElement.classList.add('status-disabled');
+    }
+}
+
+// Ответ кэшируется браузером по ETag: если статус не менялся, сервер отвечает 304
+fetch('/profile/status', { credentials: 'same-origin' })
     .then(response => response.json())
-    .then(data => {
-        const statusElement = document.getElementById('user-status');
-        if (data.is_active) {
-            statusElement.textContent = 'Активен';
-            statusElement.classList.remove('status-disabled');
-            statusElement.classList.add('status-enabled');
-        } else {
-            statusElement.textContent = 'Неактивен';
-            statusElement.classList.remove('status-enabled');
-            statusElement.classList.add('status-disabled');
-        }
-    })
+    .then(renderStatus)
     .catch(error => {
         console.error('Error fetching user status:', error);
         document.getElementById('user-status').textContent = 'Ошибка загрузки';
-    });
\ No newline at end of file
+    });
+
+// Изменения статуса приходят через SSE. Если поток выключен, сервер отвечает 204
+// и EventSource больше не переподключается
+if (window.EventSource) {
+    const statusStream = new EventSource('/profile/status/stream');
+    statusStream.addEventListener('status', event => renderStatus(JSON.parse(event.data)));
+}
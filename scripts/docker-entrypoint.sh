@@ -0,0 +1,30 @@
+#!/bin/sh
+# Точка входа контейнера: сначала миграции схемы, потом команда (по умолчанию gunicorn).
+#   RUN_MIGRATIONS=false   - миграции выполняет отдельный шаг деплоя (docker-compose run --rm backend migrate)
+#   <образ> migrate        - только применить миграции и выйти
+# Параллельный запуск с нескольких контейнеров безопасен: flask db-upgrade берет advisory lock.
+set -e
+
+migrate() {
+    attempt=1
+    # База может еще подниматься вместе с контейнером приложения
+    until flask db-upgrade; do
+        if [ "$attempt" -ge "${MIGRATION_RETRIES:-10}" ]; then
+            echo "Database migrations failed after $attempt attempts" >&2
+            return 1
+        fi
+        attempt=$((attempt + 1))
+        sleep "${MIGRATION_RETRY_DELAY:-3}"
+    done
+}
+
+if [ "$1" = "migrate" ]; then
+    migrate
+    exit 0
+fi
+
+if [ "${RUN_MIGRATIONS:-true}" = "true" ]; then
+    migrate
+fi
+
+exec "$@"
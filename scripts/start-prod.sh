@@ -36,6 +36,15 @@ chmod +x scripts/*.sh 2>/dev/null || true
 echo "🏗️  Building and starting all services..."
 docker-compose -f docker-compose-prod.yml down --remove-orphans
 docker-compose -f docker-compose-prod.yml build --no-cache
+
+# Apply database migrations before the application starts serving
+echo "🗄️  Applying database migrations..."
+docker-compose -f docker-compose-prod.yml up -d db
+if ! docker-compose -f docker-compose-prod.yml run --rm app migrate; then
+    echo "❌ Database migrations failed. The application was not started."
+    exit 1
+fi
+
 docker-compose -f docker-compose-prod.yml up -d
 
 # Wait for services to be ready